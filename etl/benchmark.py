@@ -0,0 +1,102 @@
+"""Benchmark de tempo e memória por etapa do pipeline.
+
+Lê os arquivos de input/ como o pipeline e roda cada etapa da
+transformação isoladamente, medindo com tracemalloc o pico de memória
+alocado durante a etapa e o tamanho do DataFrame que ela devolve.
+
+Para comparar com o comportamento anterior ao copy-on-write, cada etapa
+roda também no modo com cópias, em que recebe uma cópia profunda da
+entrada (o `df.copy()` defensivo que as etapas faziam). A tabela traz o
+pico das duas variantes lado a lado.
+
+Uso: `task bench` (ou `python -m etl.benchmark`).
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from etl import main
+from etl.extract.extract import load_all_files
+
+_MB = 1024 * 1024
+
+
+def _measure(
+    name: str, stage: Callable[[pd.DataFrame], pd.DataFrame], df: pd.DataFrame
+) -> Dict[str, object]:
+    tracemalloc.reset_peak()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    out = stage(df)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - start_mem
+    return {
+        'ETAPA': name,
+        'SEGUNDOS': round(elapsed, 3),
+        'PICO_MB': round(peak / _MB, 1),
+        'SAIDA_MB': round(out.memory_usage(deep=True).sum() / _MB, 1),
+        '_out': out,
+    }
+
+
+def _copying(
+    stage: Callable[[pd.DataFrame], pd.DataFrame],
+) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    """Etapa que começa com uma cópia profunda da entrada."""
+    return lambda df: stage(df.copy(deep=True))
+
+
+def measure_stages(
+    df: pd.DataFrame,
+    data: Dict[str, object],
+    lookups: List[main.Lookup],
+    copying: bool = False,
+) -> pd.DataFrame:
+    """Roda as etapas em sequência e devolve uma linha de medição por etapa.
+
+    PICO_MB é o pico alocado durante a etapa, acima do que já estava em uso
+    quando ela começou; SAIDA_MB é o tamanho do DataFrame devolvido. Com
+    `copying` cada etapa recebe uma cópia profunda da entrada.
+    """
+    stages = main._stages(data, lookups, prune=main._prune()) + [
+        ('saida', 'Selecionando colunas de saída...', main._select_output),
+        ('ordenacao', 'Ordenando relatório...', main._sort_output),
+    ]
+
+    rows = []
+    tracemalloc.start()
+    try:
+        for name, _, stage in stages:
+            if copying:
+                stage = _copying(stage)
+            row = _measure(name, stage, df)
+            df = row.pop('_out')
+            rows.append(row)
+    finally:
+        tracemalloc.stop()
+    return pd.DataFrame(rows)
+
+
+def run_benchmark() -> pd.DataFrame:
+    """Mede todas as etapas com os arquivos de input/, com e sem cópias."""
+    data = load_all_files(parallel=False, use_cache=main.USE_EXTRACT_CACHE)
+    lookups = main._prepare_lookups(data)
+    df = data['cadastro_consumo']
+    copying = measure_stages(df, data, lookups, copying=True)
+    current = measure_stages(df, data, lookups)
+    return current.merge(
+        copying[['ETAPA', 'SEGUNDOS', 'PICO_MB']],
+        on='ETAPA',
+        suffixes=('', '_COPIA'),
+    )
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.WARNING)
+    print(run_benchmark().to_string(index=False))
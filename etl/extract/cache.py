@@ -0,0 +1,189 @@
+"""Cache local dos arquivos de entrada já convertidos em DataFrame.
+
+Cada fonte é guardada em pickle junto de um JSON com a impressão digital
+do arquivo de origem: caminho, tamanho, mtime e hash do conteúdo.
+
+O formato é pickle, não Parquet/Feather: o pyarrow não é dependência do
+projeto, e o pickle devolve o DataFrame exatamente como a leitura o
+montou (dtypes `str`, `category`, Int64 e datetime64[us] inclusive), sem
+uma conversão de ida e volta que poderia mudar a saída entre uma execução
+com cache e outra sem.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+CACHE_DIR = Path('cache') / 'extract'
+
+_HASH_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Identifica uma versão exata de um arquivo de entrada."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+
+    def digest(self) -> str:
+        """Resumo curto da impressão digital (útil como chave de cache)."""
+        raw = json.dumps(asdict(self), sort_keys=True).encode('utf-8')
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _hash_file(path: Path) -> str:
+    """Hash do conteúdo do arquivo, lido em blocos de 1 MB."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(_HASH_CHUNK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint(
+    path: Path, previous: Optional[Fingerprint] = None
+) -> Fingerprint:
+    """Calcula a impressão digital de `path`.
+
+    Se `previous` aponta para o mesmo caminho, tamanho e mtime, o hash do
+    conteúdo é reaproveitado e o arquivo não precisa ser lido de novo.
+    """
+    stat = path.stat()
+    resolved = str(path.resolve())
+
+    if (
+        previous is not None
+        and previous.path == resolved
+        and previous.size == stat.st_size
+        and previous.mtime_ns == stat.st_mtime_ns
+    ):
+        return previous
+
+    return Fingerprint(
+        path=resolved,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        content_hash=_hash_file(path),
+    )
+
+
+def _entry_paths(key: str, cache_dir: Path) -> Tuple[Path, Path]:
+    return cache_dir / f'{key}.json', cache_dir / f'{key}.pkl'
+
+
+def _read_meta(meta_file: Path) -> Tuple[Optional[Fingerprint], str]:
+    if not meta_file.exists():
+        return None, ''
+    try:
+        meta = json.loads(meta_file.read_text(encoding='utf-8'))
+        return Fingerprint(**meta['fingerprint']), meta.get('tag', '')
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, ''
+
+
+def evict(key: str, cache_dir: Path = CACHE_DIR) -> None:
+    """Remove a entrada de cache de uma fonte (se existir)."""
+    for p in _entry_paths(key, cache_dir):
+        p.unlink(missing_ok=True)
+    # Entradas em Parquet gravadas por versões anteriores
+    (cache_dir / f'{key}.parquet').unlink(missing_ok=True)
+
+
+def load_cached(
+    key: str, path: Path, cache_dir: Path = CACHE_DIR, tag: str = ''
+) -> Tuple[Optional[pd.DataFrame], Fingerprint]:
+    """Busca a fonte `key` no cache.
+
+    Retorna (DataFrame, impressão digital) quando a entrada bate com o
+    arquivo atual e com `tag` (identifica a forma de leitura, ex.: o
+    contrato da fonte). Entradas desatualizadas são removidas e o retorno
+    é (None, impressão digital atual).
+    """
+    meta_file, pickle_file = _entry_paths(key, cache_dir)
+    stored, stored_tag = _read_meta(meta_file)
+    current = fingerprint(path, previous=stored)
+
+    if stored is None or stored != current or stored_tag != tag:
+        if stored is not None:
+            logging.info('Cache desatualizado para %s, removendo.', key)
+        evict(key, cache_dir)
+        return None, current
+
+    try:
+        if pickle_file.exists():
+            return pd.read_pickle(pickle_file), current
+    except Exception as exc:
+        logging.warning('Cache corrompido para %s: %s', key, exc)
+
+    evict(key, cache_dir)
+    return None, current
+
+
+def store(
+    key: str,
+    fp: Fingerprint,
+    df: pd.DataFrame,
+    cache_dir: Path = CACHE_DIR,
+    tag: str = '',
+) -> None:
+    """Grava o DataFrame da fonte `key` no cache, associado a `fp`."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    meta_file, pickle_file = _entry_paths(key, cache_dir)
+    evict(key, cache_dir)
+
+    df.to_pickle(pickle_file)
+
+    # O JSON é gravado por último: uma entrada sem metadado é ignorada
+    meta_file.write_text(
+        json.dumps(
+            {'fingerprint': asdict(fp), 'format': 'pickle', 'tag': tag}
+        ),
+        encoding='utf-8',
+    )
+
+
+def load_dialect(
+    fp: Fingerprint, cache_dir: Path = CACHE_DIR
+) -> Optional[Dict[str, str]]:
+    """Dialeto CSV (sep/encoding) já detectado para esta versão do arquivo."""
+    dialect_file = cache_dir / 'dialects' / f'{fp.digest()}.json'
+    if not dialect_file.exists():
+        return None
+    try:
+        return json.loads(dialect_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def store_dialect(
+    fp: Fingerprint, dialect: Dict[str, str], cache_dir: Path = CACHE_DIR
+) -> None:
+    """Guarda o dialeto detectado, um arquivo por impressão digital."""
+    dialect_dir = cache_dir / 'dialects'
+    dialect_dir.mkdir(parents=True, exist_ok=True)
+    (dialect_dir / f'{fp.digest()}.json').write_text(
+        json.dumps(dialect), encoding='utf-8'
+    )
+
+
+def clear_cache(cache_dir: Path = CACHE_DIR) -> None:
+    """Apaga todo o cache de extração."""
+    if cache_dir.exists():
+        shutil.rmtree(cache_dir)
+    logging.info('Cache de extração removido: %s', cache_dir)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    clear_cache()
@@ -0,0 +1,97 @@
+"""Conversão de colunas de data com formatos explícitos.
+
+Cada coluna de data tem um `DateSpec`: a cadeia de formatos que a fonte
+costuma usar, tentados em ordem. O que nenhum formato reconhece cai num
+último parse por valor (`format='mixed'`), com o `dayfirst` da fonte. A
+conversão roda só sobre os valores distintos da coluna (as mesmas datas se
+repetem em milhões de linhas) e o resultado volta para as linhas por
+posição. Colunas que já são datetime64 passam direto, então cada coluna é
+convertida uma única vez no pipeline.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Resolução única para todas as datas convertidas aqui
+_UNIT = 'datetime64[us]'
+
+
+@dataclass(frozen=True)
+class DateSpec:
+    """Formatos de uma coluna de data.
+
+    - formats: formatos strptime tentados em ordem (o primeiro que
+      reconhecer o valor vence).
+    - dayfirst: usado só no último recurso, para valores fora da cadeia.
+    """
+
+    formats: Tuple[str, ...]
+    dayfirst: bool = False
+
+    def parse(self, values: pd.Series) -> pd.Series:
+        """Atalho para `parse_dates(values, self)`."""
+        return parse_dates(values, self)
+
+
+# aaaa-mm-dd (com ou sem hora), depois dd/mm/aaaa
+ISO = DateSpec(
+    ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%d/%m/%Y %H:%M:%S')
+)
+# Timestamp completo primeiro (Sinergia grava data e hora)
+ISO_HORA = DateSpec(
+    ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+)
+# dd/mm/aaaa primeiro (planilhas e relatórios PT-BR)
+DIA_PRIMEIRO = DateSpec(
+    ('%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S'),
+    dayfirst=True,
+)
+
+
+def _parse_unique(uniques: np.ndarray, spec: DateSpec) -> np.ndarray:
+    """Interpreta os valores distintos (sem nulos) pela cadeia de formatos."""
+    result = np.full(len(uniques), np.datetime64('NaT', 'us'), dtype=_UNIT)
+    texts = pd.Series(uniques, dtype=object)
+    is_text = texts.map(type).eq(str).to_numpy()
+
+    pending = is_text.copy()
+    for fmt in spec.formats:
+        if not pending.any():
+            break
+        parsed = pd.to_datetime(texts[pending], format=fmt, errors='coerce')
+        ok = parsed.notna().to_numpy()
+        rows = np.flatnonzero(pending)[ok]
+        result[rows] = parsed[ok].to_numpy(dtype=_UNIT)
+        pending[rows] = False
+
+    # Último recurso: texto fora da cadeia e objetos date/datetime
+    rest = pending | ~is_text
+    if rest.any():
+        parsed = pd.to_datetime(
+            texts[rest],
+            format='mixed',
+            dayfirst=spec.dayfirst,
+            errors='coerce',
+        )
+        result[rest] = parsed.to_numpy(dtype=_UNIT)
+    return result
+
+
+def parse_dates(values: pd.Series, spec: DateSpec) -> pd.Series:
+    """Interpreta `values` como datetime64 (NaT no que não for data).
+
+    Já datetime64: devolve a própria série, sem nova conversão.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    codes, uniques = pd.factorize(values)
+    parsed = _parse_unique(np.asarray(uniques, dtype=object), spec)
+    # Posição -1 (nulo) aponta para o NaT acrescentado no fim
+    dates = np.append(parsed, np.datetime64('NaT', 'us')).take(codes)
+    return pd.Series(dates, index=values.index, name=values.name)
@@ -1,75 +1,231 @@
 """Módulo para extração de dados de arquivos locais."""
+import codecs
 import logging
+import time
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import pandas as pd
 
+from etl.extract.cache import (
+    Fingerprint,
+    load_cached,
+    load_dialect,
+    store,
+    store_dialect,
+)
+from etl.extract.schemas import SCHEMAS, SourceSchema
 
-def load_all_files() -> Dict[str, object]:
-    """Carrega todos os arquivos necessários para o pipeline.
+_DATA_PATH = Path('input')
 
-    Atenção: o arquivo do Faro Certo (SQLite) é obrigatório.
-    Retorna loaded_data com a chave 'faro_sqlite' contendo o caminho absoluto.
+_FILES = {
+    'cadastro_consumo': 'CADASTRO E CONSUMO POR UC.csv',
+    'medidores': 'MEDIDORES.xlsx',
+    'inspecoes': 'INSPECOES.xlsx',
+    'ocorrencias': 'OCORRENCIA POR UC.csv',
+    'apontamento': 'APONTAMENTO DE LEITURA.csv',
+    'codigos_leitura': 'CODIGOS DA LEITURA.xls',
+    'sinergia': 'SINERGIA.csv',
+    'seccional': 'SECCIONAL.csv',
+    'localizacao': 'LOCALIZACAO E TIPO CLIENTE.csv',
+    'alvos': 'CESTA BT.xlsx',
+    'prospeccao': 'PROSPECCAO DE ALVOS.xlsx',  # <-- Nova base
+}
+
+# Tamanho da amostra usada para detectar separador e encoding dos CSVs
+_SNIFF_BYTES = 64 * 1024
+
+# Fontes sem contrato no registro são lidas por inteiro
+_DEFAULT_SCHEMA = SourceSchema(project=False)
+
+
+def _sniff_csv(path: Path) -> Dict[str, str]:
+    """Descobre separador e encoding olhando só o início do arquivo.
+
+    - encoding: 'utf-8-sig' com BOM, 'utf-8' se a amostra tiver acentos
+      válidos em UTF-8 e 'latin-1' nos demais casos (padrão histórico).
+    - sep: ';' se o cabeçalho tiver ';', senão ','.
     """
-    data_path = Path('input')
-
-    files = {
-        'cadastro_consumo': 'CADASTRO E CONSUMO POR UC.csv',
-        'medidores': 'MEDIDORES.xlsx',
-        'inspecoes': 'INSPECOES.xlsx',
-        'ocorrencias': 'OCORRENCIA POR UC.csv',
-        'apontamento': 'APONTAMENTO DE LEITURA.csv',
-        'codigos_leitura': 'CODIGOS DA LEITURA.xls',
-        'sinergia': 'SINERGIA.csv',
-        'seccional': 'SECCIONAL.csv',
-        'localizacao': 'LOCALIZACAO E TIPO CLIENTE.csv',
-        'alvos': 'CESTA BT.xlsx',
-        'prospeccao': 'PROSPECCAO DE ALVOS.xlsx',  # <-- Nova base
+    with open(path, 'rb') as fh:
+        sample = fh.read(_SNIFF_BYTES)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    elif sample.isascii():
+        encoding = 'latin-1'
+    else:
+        # final=False: tolera um caractere multibyte cortado no fim da amostra
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'latin-1'
+
+    text = sample.decode(encoding, errors='ignore').lstrip('\ufeff')
+    header_line = text.splitlines()[0] if text else ''
+    sep = ';' if ';' in header_line else ','
+
+    return {'sep': sep, 'encoding': encoding}
+
+
+def _csv_dialect(path: Path, fp: Optional[Fingerprint]) -> Dict[str, str]:
+    """Dialeto do CSV, reaproveitado do cache quando o arquivo não mudou."""
+    dialect = load_dialect(fp) if fp is not None else None
+    if dialect is None:
+        dialect = _sniff_csv(path)
+        if fp is not None:
+            store_dialect(fp, dialect)
+
+    logging.info(
+        'Dialeto de %s: sep=%r, encoding=%s',
+        path.name,
+        dialect['sep'],
+        dialect['encoding'],
+    )
+    return dialect
+
+
+def _check_header(path: Path, header: List[str], schema: SourceSchema) -> None:
+    """Falha antes do parse completo se faltar coluna obrigatória."""
+    missing = schema.missing_columns(header)
+    if missing:
+        logging.error(
+            'Colunas obrigatórias ausentes em %s: %s', path.name, missing
+        )
+        raise KeyError(
+            f'O arquivo {path.name} precisa ter as colunas: '
+            f"{', '.join(missing)}."
+        )
+
+
+def _parse_schema_dates(
+    df: pd.DataFrame, schema: SourceSchema
+) -> pd.DataFrame:
+    """Interpreta as colunas de data declaradas no contrato da fonte."""
+    for col, spec in schema.date_columns(list(df.columns)).items():
+        df[col] = spec.parse(df[col])
+    return df
+
+
+def _csv_read_args(
+    path: Path, schema: SourceSchema, fp: Optional[Fingerprint]
+) -> Dict[str, object]:
+    """Argumentos do read_csv (dialeto + contrato), validando o cabeçalho."""
+    dialect = _csv_dialect(path, fp)
+    header = pd.read_csv(path, nrows=0, **dialect)
+    _check_header(path, list(header.columns), schema)
+    return {
+        'usecols': schema.usecols(),
+        'dtype': dict(schema.dtypes) or None,
+        **dialect,
     }
 
-    loaded_data: Dict[str, object] = {}
 
-    for key, filename in files.items():
-        path = data_path / filename
+def _read_source(
+    key: str, path: Path, fp: Optional[Fingerprint] = None
+) -> pd.DataFrame:
+    """Lê um único arquivo de entrada de acordo com a extensão e o contrato."""
+    schema = SCHEMAS.get(key, _DEFAULT_SCHEMA)
+
+    if path.suffix.lower() == '.csv':
+        loaded = pd.read_csv(path, **_csv_read_args(path, schema, fp))
+        return _parse_schema_dates(loaded, schema)
+
+    if path.suffix.lower() in ['.xlsx', '.xls']:
+        sheet = schema.sheet_name if schema.sheet_name is not None else 0
+        header = pd.read_excel(path, sheet_name=sheet, nrows=0)
+        _check_header(path, list(header.columns), schema)
+        loaded = pd.read_excel(
+            path,
+            sheet_name=sheet,
+            usecols=schema.usecols(),
+            dtype=dict(schema.dtypes) or None,
+        )
+        return _parse_schema_dates(loaded, schema)
+
+    logging.warning('Formato inesperado para %s: %s', path.name, path.suffix)
+    return pd.read_csv(path, encoding='latin-1', sep=',')
+
+
+def _timed_read(
+    key: str, path: Path, use_cache: bool = False
+) -> Tuple[pd.DataFrame, float, bool]:
+    """Lê o arquivo e devolve também o tempo gasto e se veio do cache."""
+    start = time.perf_counter()
+    fp: Optional[Fingerprint] = None
+    # O contrato da fonte entra na chave: mudou o schema, relê o arquivo
+    tag = repr(SCHEMAS.get(key, _DEFAULT_SCHEMA))
+    if use_cache:
+        cached, fp = load_cached(key, path, tag=tag)
+        if cached is not None:
+            return cached, time.perf_counter() - start, True
+
+    loaded = _read_source(key, path, fp)
+    if fp is not None:
+        store(key, fp, loaded, tag=tag)
+    return loaded, time.perf_counter() - start, False
+
+
+def source_paths(keys: Iterable[str]) -> Dict[str, Path]:
+    """Caminho em input/ de cada fonte (sem validar se o arquivo existe)."""
+    return {key: _DATA_PATH / _FILES[key] for key in keys}
+
+
+def _resolve_paths(skip: Iterable[str] = ()) -> Dict[str, Path]:
+    """Valida que todos os arquivos existem antes de iniciar qualquer leitura."""
+    paths: Dict[str, Path] = {}
+    for key, filename in _FILES.items():
+        if key in skip:
+            continue
+        path = _DATA_PATH / filename
         if not path.exists():
             logging.error('Arquivo não encontrado: %s', filename)
             raise FileNotFoundError(f'Arquivo essencial faltando: {filename}')
+        paths[key] = path
+    return paths
 
-        logging.info('Carregando %s...', filename)
-
-        if path.suffix.lower() == '.csv':
-            try:
-                loaded = pd.read_csv(path, sep=';', encoding='latin-1')
-                if len(loaded.columns) <= 1:
-                    raise ValueError("Leitura com ';' devolveu 1 coluna")
-                loaded_data[key] = loaded
-            except Exception:
-                loaded_data[key] = pd.read_csv(
-                    path, sep=',', encoding='latin-1'
-                )
-        elif path.suffix.lower() in ['.xlsx', '.xls']:
-            if key == 'alvos':
-                loaded_data[key] = pd.read_excel(path, sheet_name='PENDENTE')
-            else:
-                loaded_data[key] = pd.read_excel(path)
-        else:
-            logging.warning(
-                'Formato inesperado para %s: %s', filename, path.suffix
+
+def _load_parallel(
+    paths: Dict[str, Path], executor: Executor, use_cache: bool
+) -> Dict[str, Tuple[pd.DataFrame, float, bool]]:
+    """Submete as leituras ao pool e interrompe tudo no primeiro erro."""
+    futures = {
+        executor.submit(_timed_read, key, path, use_cache): key
+        for key, path in paths.items()
+    }
+    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+
+    for future in done:
+        exc = future.exception()
+        if exc is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            logging.error(
+                'Falha ao carregar %s: %s', paths[futures[future]].name, exc
             )
-            loaded_data[key] = pd.read_csv(path, encoding='latin-1', sep=',')
+            raise exc
 
-    # --- Faro Certo (SQLite) — obrigatório ---
+    return {futures[f]: f.result() for f in done}
+
+
+def _find_faro_sqlite() -> str:
+    """Localiza o arquivo SQLite do Faro Certo (obrigatório)."""
     faro_sqlite_path = None
     candidates = ['bot_interactions.sqlite', 'bot_interactions.db']
     for c in candidates:
-        p = data_path / c
+        p = _DATA_PATH / c
         if p.exists():
             faro_sqlite_path = p
             break
 
-    if faro_sqlite_path is None and data_path.exists():
-        for p in data_path.iterdir():
+    if faro_sqlite_path is None and _DATA_PATH.exists():
+        for p in _DATA_PATH.iterdir():
             if p.suffix.lower() in ['.sqlite', '.db']:
                 faro_sqlite_path = p
                 logging.info(
@@ -85,7 +241,110 @@ def load_all_files() -> Dict[str, object]:
             "Arquivo SQLite do Faro Certo (bot_interactions) é obrigatório e não foi encontrado em 'input/'."
         )
 
-    loaded_data['faro_sqlite'] = str(faro_sqlite_path.resolve())
+    return str(faro_sqlite_path.resolve())
+
+
+def load_all_files(
+    parallel: bool = True,
+    use_processes: bool = True,
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+    skip: Iterable[str] = (),
+) -> Dict[str, object]:
+    """Carrega todos os arquivos necessários para o pipeline.
+
+    Com `parallel=True` as fontes são lidas ao mesmo tempo, em um pool de
+    processos (padrão, pois o parse de Excel prende o GIL) ou de threads
+    (`use_processes=False`). Todos os arquivos são validados antes de
+    qualquer leitura e o primeiro erro interrompe a carga.
+
+    Com `use_cache=True` cada fonte já convertida fica guardada em
+    `cache/extract/` e é reaproveitada enquanto o arquivo não mudar
+    (ver `etl.extract.cache`).
+
+    As chaves em `skip` não são carregadas (ex.: o cadastro, quando ele é
+    lido em pedaços com `iter_csv_chunks`).
+
+    Atenção: o arquivo do Faro Certo (SQLite) é obrigatório.
+    Retorna loaded_data com a chave 'faro_sqlite' contendo o caminho absoluto.
+    """
+    paths = _resolve_paths(skip)
+    faro_sqlite = _find_faro_sqlite()
+
+    for path in paths.values():
+        logging.info('Carregando %s...', path.name)
+
+    start = time.perf_counter()
+    if parallel:
+        pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with pool_cls(max_workers=max_workers) as executor:
+            results = _load_parallel(paths, executor, use_cache)
+    else:
+        results = {
+            key: _timed_read(key, path, use_cache)
+            for key, path in paths.items()
+        }
+
+    # Mantém a ordem original das chaves, independente da ordem de término
+    loaded_data: Dict[str, object] = {}
+    for key, path in paths.items():
+        loaded, elapsed, from_cache = results[key]
+        logging.info(
+            '%s carregado em %.2fs (%d linhas%s)',
+            path.name,
+            elapsed,
+            len(loaded),
+            ', cache' if from_cache else '',
+        )
+        loaded_data[key] = loaded
+
+    logging.info(
+        'Extração concluída em %.2fs (%s)',
+        time.perf_counter() - start,
+        'paralela' if parallel else 'sequencial',
+    )
+
+    loaded_data['faro_sqlite'] = faro_sqlite
     logging.info('Faro Certo SQLite detectado: %s', loaded_data['faro_sqlite'])
 
     return loaded_data
+
+
+def estimate_chunk_rows(
+    key: str, memory_mb: float, expansion: float = 1.0, sample_rows: int = 2000
+) -> int:
+    """Quantas linhas de um CSV cabem em `memory_mb` durante o processamento.
+
+    Mede o tamanho em memória de uma amostra das primeiras linhas e aplica
+    `expansion` (quanto cada linha cresce ao longo das transformações).
+    """
+    path = _resolve_paths(skip=set(_FILES) - {key})[key]
+    schema = SCHEMAS.get(key, _DEFAULT_SCHEMA)
+    sample = pd.read_csv(
+        path, nrows=sample_rows, **_csv_read_args(path, schema, None)
+    )
+    if sample.empty:
+        return sample_rows
+
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    rows = int(memory_mb * 1024 * 1024 / (bytes_per_row * expansion))
+    return max(rows, 1)
+
+
+def iter_csv_chunks(key: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Lê um CSV de entrada em pedaços de `chunksize` linhas.
+
+    Usa o mesmo dialeto e contrato de `load_all_files`, então cada pedaço tem
+    as mesmas colunas e dtypes que a leitura completa teria.
+    """
+    path = _resolve_paths(skip=set(_FILES) - {key})[key]
+    schema = SCHEMAS.get(key, _DEFAULT_SCHEMA)
+    if path.suffix.lower() != '.csv':
+        raise ValueError(f'Leitura em pedaços só suporta CSV: {path.name}')
+
+    logging.info('Lendo %s em pedaços de %d linhas...', path.name, chunksize)
+    with pd.read_csv(
+        path, chunksize=chunksize, **_csv_read_args(path, schema, None)
+    ) as reader:
+        for chunk in reader:
+            yield _parse_schema_dates(chunk, schema)
@@ -0,0 +1,138 @@
+"""Registro declarativo do que o pipeline lê de cada fonte de entrada.
+
+Cada chave de `load_all_files` tem um `SourceSchema` com as colunas
+obrigatórias, os dtypes de destino e o formato de cada coluna de data. O
+extrator usa o contrato para ler só as colunas necessárias (usecols/dtype
+na leitura) e para validar o cabeçalho antes do parse completo do arquivo.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+from etl.extract.datas import DIA_PRIMEIRO, ISO, ISO_HORA, DateSpec
+
+
+@dataclass(frozen=True)
+class SourceSchema:
+    """Contrato de leitura de uma fonte.
+
+    - required: colunas que precisam existir no cabeçalho.
+    - dtypes: dtype de destino por coluna (aplicado na leitura).
+    - dates: colunas convertidas para datetime logo após a leitura, com os
+      formatos de cada uma (ver `etl.extract.datas`).
+    - sheet_name: aba do Excel (None = primeira aba).
+    - project: se True, lê apenas as colunas de `required`.
+    - normalize_header: compara nomes com strip/upper (planilhas manuais).
+    """
+
+    required: Tuple[str, ...] = ()
+    dtypes: Mapping[str, str] = field(default_factory=dict)
+    dates: Mapping[str, DateSpec] = field(default_factory=dict)
+    sheet_name: Optional[str] = None
+    project: bool = True
+    normalize_header: bool = False
+
+    def _norm(self, col: object) -> str:
+        if self.normalize_header:
+            return str(col).strip().upper()
+        return str(col)
+
+    def missing_columns(self, header: List[object]) -> List[str]:
+        """Colunas obrigatórias ausentes em `header`."""
+        present = {self._norm(c) for c in header}
+        return [c for c in self.required if self._norm(c) not in present]
+
+    def usecols(self) -> Union[None, List[str], Callable[[object], bool]]:
+        """Argumento `usecols` para o pandas (None = todas as colunas)."""
+        if not self.project:
+            return None
+        if self.normalize_header:
+            wanted = {self._norm(c) for c in self.required}
+            return lambda col: self._norm(col) in wanted
+        return list(self.required)
+
+    def date_columns(self, columns: List[object]) -> Dict[object, DateSpec]:
+        """Colunas de `columns` que são datas no contrato, com o formato."""
+        specs = {self._norm(c): spec for c, spec in self.dates.items()}
+        return {
+            col: specs[self._norm(col)]
+            for col in columns
+            if self._norm(col) in specs
+        }
+
+
+# Colunas de texto do cadastro: lidas sempre como str para que a leitura em
+# pedaços não infira tipos diferentes de um pedaço para outro (ex.: NUMERO
+# int em um pedaço e float em outro muda a chave do prédio no P3-5).
+_CADASTRO_TEXT = (
+    'STATUS_COMERCIAL',
+    'MOVE_IN',
+    'MOVE_OUT',
+    'GRUPO_TENSAO',
+    'CLASSE_PRINCIPAL',
+    'CLASSE_CONSUMO',
+    'PERIMETRO',
+    'SE_AL_NORM',
+    'MEDIDOR',
+    'FASE',
+    'INST_MED_FISCAL',
+    'ENDERECO',
+    'LOGRADOURO',
+    'NUMERO',
+    'CONDOMINIO',
+    'BAIRRO',
+    'MUNICIPIO',
+)
+
+SCHEMAS: Dict[str, SourceSchema] = {
+    # Base principal: as colunas de saída e os meses de consumo variam,
+    # então não há projeção — só a validação das chaves usadas nos joins.
+    'cadastro_consumo': SourceSchema(
+        required=('UC', 'MEDIDOR', 'MUNICIPIO'),
+        # MICRO_GERADOR continua numérico, como na leitura original (sai
+        # '0,0' no CSV), mas com dtype fixo para valer igual em todo pedaço
+        dtypes={
+            **{col: 'str' for col in _CADASTRO_TEXT},
+            'MICRO_GERADOR': 'float64',
+        },
+        dates={'MOVE_IN': ISO, 'MOVE_OUT': ISO},
+        project=False,
+    ),
+    'medidores': SourceSchema(
+        required=('medidor', 'ANO', 'FABRICANTE'),
+        dtypes={'FABRICANTE': 'str'},
+    ),
+    'inspecoes': SourceSchema(
+        required=('UC / MD', 'DATA_EXECUCAO', 'COD'),
+        dates={'DATA_EXECUCAO': ISO},
+    ),
+    'ocorrencias': SourceSchema(
+        required=('CR_NUMERO', 'DT_OCO_INCLUSAO'),
+        dates={'DT_OCO_INCLUSAO': DIA_PRIMEIRO},
+    ),
+    'apontamento': SourceSchema(required=('INSTALACAO', 'COD_MENS_LEF')),
+    'codigos_leitura': SourceSchema(
+        required=('Apontamento', 'Descricao'),
+        dtypes={'Descricao': 'str'},
+    ),
+    'sinergia': SourceSchema(
+        required=('number', 'timestamp'),
+        dates={'timestamp': ISO_HORA},
+    ),
+    'seccional': SourceSchema(
+        required=('MUNICIPIO', 'SECCCIONAL'),
+        dtypes={'MUNICIPIO': 'str', 'SECCCIONAL': 'str'},
+    ),
+    'localizacao': SourceSchema(
+        required=('uc', 'classe_consumo', 'latitude', 'longitude'),
+        dtypes={'classe_consumo': 'str'},
+    ),
+    'alvos': SourceSchema(required=('UC',), sheet_name='PENDENTE'),
+    'prospeccao': SourceSchema(
+        required=('UC', 'DATA', 'CONCLUSAO'),
+        dates={'DATA': DIA_PRIMEIRO},
+        normalize_header=True,
+    ),
+}
@@ -2,8 +2,58 @@
 
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+# O pipeline carrega datas como datetime64 e números como float até aqui;
+# a apresentação PT-BR (dd/mm/aaaa e vírgula decimal) é feita só na saída.
+_FORMATO_DATA = '%d/%m/%Y'
+
+# Colunas com número fixo de casas decimais (as demais saem como o pandas
+# escreve o float, com decimal=',')
+_CASAS_DECIMAIS = {'CONSUMO_MEDIO': 2}
+
+
+def _format_dates(values: pd.Series) -> pd.Series:
+    """Datas como 'dd/mm/aaaa' ('' para NaT), formatando só as distintas."""
+    codes, uniques = pd.factorize(values)
+    text = pd.DatetimeIndex(uniques).strftime(_FORMATO_DATA)
+    # Posição -1 (NaT) aponta para o '' acrescentado no fim
+    text = np.append(np.asarray(text, dtype=object), '')
+    return pd.Series(text.take(codes), index=values.index, name=values.name)
+
+
+def _format_decimal(values: pd.Series, casas: int) -> pd.Series:
+    """Número com `casas` decimais fixas e vírgula ('' para nulo)."""
+    rounded = np.round(pd.to_numeric(values).to_numpy(dtype=float), casas)
+    valid = ~np.isnan(rounded)
+    scaled = np.rint(np.abs(rounded[valid]) * 10**casas).astype(np.int64)
+
+    inteiro = (scaled // 10**casas).astype(str)
+    fracao = np.char.zfill((scaled % 10**casas).astype(str), casas)
+    sinal = np.where(np.signbit(rounded[valid]), '-', '')
+    text = np.full(len(rounded), '', dtype=object)
+    text[valid] = np.char.add(
+        np.char.add(sinal, inteiro), np.char.add(',', fracao)
+    )
+    return pd.Series(text, index=values.index, name=values.name)
+
+
+def format_ptbr(df: pd.DataFrame) -> pd.DataFrame:
+    """Formata datas (dd/mm/aaaa) e decimais fixos para o Excel PT-BR.
+
+    Toda coluna datetime64 vira texto dd/mm/aaaa; as colunas de
+    `_CASAS_DECIMAIS` viram texto com vírgula e casas fixas. As demais
+    ficam como estão (floats saem com a vírgula do `to_csv`).
+    """
+    out = df.copy(deep=False)
+    for col in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = _format_dates(out[col])
+        elif col in _CASAS_DECIMAIS:
+            out[col] = _format_decimal(out[col], _CASAS_DECIMAIS[col])
+    return out
+
 
 def save_to_csv(df: pd.DataFrame, output_path: str = 'output'):
     """Salva o CSV formatado para Excel PT-BR (separador ; e decimal ,)."""
@@ -14,7 +64,7 @@ def save_to_csv(df: pd.DataFrame, output_path: str = 'output'):
 
     # decimal=',' faz o 0.106 virar 0,106
     # sep=';' é o padrão que o Excel BR reconhece para abrir colunas direto
-    df.to_csv(
+    format_ptbr(df).to_csv(
         file_name, index=False, sep=';', decimal=',', encoding='utf-8-sig'
     )
 
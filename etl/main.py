@@ -2,30 +2,73 @@
 
 import logging
 import re
-import unicodedata
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from tempfile import TemporaryDirectory
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
+import numpy as np
+import pandas as pd
 from tqdm import tqdm
 
-from etl.extract.extract import load_all_files
+from etl.extract.extract import (
+    estimate_chunk_rows,
+    iter_csv_chunks,
+    load_all_files,
+    source_paths,
+)
 from etl.load.load import save_to_csv
 from etl.transform.alvos import filter_out_pendentes
-from etl.transform.apontamento import (
-    enrich_with_apontamento,
-    treat_apontamento_codes,
+from etl.transform.apontamento import apontamento_codes_lookup
+from etl.transform.categorias import (
+    CATEGORICAL_COLUMNS,
+    categorize_lookup,
+    compact_categories,
+    to_categorical,
+)
+from etl.transform.chaves import (
+    MEDIDOR_KEY,
+    Lookup,
+    add_join_keys,
+    enrich_with_lookups,
+    project_lookup,
+)
+from etl.transform.colacao import collation_codes, load_memo, store_memo
+from etl.transform.consumo import (
+    ConsumptionMatrix,
+    reference_date,
+    treat_monthly_consumption,
 )
-from etl.transform.consumo import treat_monthly_consumption
-from etl.transform.enriquecimento import enrich_with_new_bases
-from etl.transform.faro_certo import enrich_with_faro_certo
-from etl.transform.inspecoes import enrich_with_inspections
-from etl.transform.medidores import enrich_with_medidores
-from etl.transform.ocorrencias import enrich_with_occurrences
-from etl.transform.prospeccao import enrich_with_prospeccao
+from etl.transform.enriquecimento import (
+    localizacao_lookup,
+    seccional_lookup,
+    sinergia_lookup,
+)
+from etl.transform.faro_certo import faro_certo_lookup, read_faro_certo
+from etl.transform.features import FeatureSource, FeatureStore
+from etl.transform.inspecoes import inspections_lookup
+from etl.transform.medidores import medidores_lookup
+from etl.transform.ocorrencias import occurrences_lookup
+from etl.transform.prospeccao import prospeccao_lookup
 from etl.transform.regras_negocio import (
+    RULE_COLUMNS,
+    add_last_effort,
     apply_priority_rules,
+    building_stats,
     calculate_yoy,
+    condominio_candidates,
+    critical_buildings,
+    export_candidates,
+    flag_condominio_alto_ds,
     flag_minimum_by_phase,
 )
 
@@ -50,165 +93,555 @@ _MONTH_RE = re.compile(r"^'?(\d{2})/(\d{4})'?$")
 REMOVE_CONSUMO = True
 REMOVE_YOY = True
 EXPORT_ONLY_PRIORITY = True
+PARALLEL_EXTRACTION = True
+USE_EXTRACT_CACHE = True
+# Consulta o Faro Certo numa cópia local indexada (cache/faro_certo/)
+FARO_CERTO_INDEX = False
+# Lê só as interações novas do bot (rowid acima da última execução)
+FARO_CERTO_INCREMENTAL = True
+# Reaproveita as chaves sem acento de execuções anteriores (cache/colacao.pkl)
+USE_COLLATION_CACHE = True
+# Reaproveita as bases de consulta das fontes que não mudaram
+# (cache/features/); os arquivos dessas fontes nem são carregados
+USE_FEATURE_STORE = True
 
 # -----------------------------------------------------------------------------
 # Pipeline
 # -----------------------------------------------------------------------------
-def run_pipeline() -> None:
-    """Executa todo o fluxo de ETL com logs e barra de progresso."""
-    logging.info('Iniciando Pipeline de ETL...')
+# Com EXPORT_ONLY_PRIORITY, descarta antes das junções as UCs que não têm
+# como ser priorizadas (só no modo em memória)
+PUSHDOWN_EXPORT_FILTER = True
+
+# Modo em pedaços: lê o cadastro/consumo em blocos de linhas e mantém em
+# memória só as bases de consulta, um bloco por vez e as UCs candidatas ao
+# P3-5 (que dependem de contagens da base inteira).
+CHUNKED_PIPELINE = False
+CHUNK_MEMORY_MB = 512
+# Quanto uma linha do cadastro cresce ao longo das transformações (cópias
+# intermediárias + colunas novas); usado para converter MB em linhas.
+_CHUNK_EXPANSION = 6.0
+# Ordem original da linha, para remontar a saída igual ao modo em memória
+_ORDER_COL = '_ORDEM_ORIGINAL'
+
+_ORDEM_INICIAL = [
+    'UC',
+    'STATUS_COMERCIAL',
+    'MOVE_IN',
+    'MOVE_OUT',
+    'GRUPO_TENSAO',
+    'CLASSE_PRINCIPAL',
+    'CLASSE_CONSUMO',
+    'PERIMETRO',
+    'SE_AL_NORM',
+    'MEDIDOR',
+    'ANO',
+    'FABRICANTE',
+    'FASE',
+    'MICRO_GERADOR',
+    'INST_MED_FISCAL',
+    'ENDERECO',
+    'CONDOMINIO',
+    'BAIRRO',
+    'MUNICIPIO',
+    'SECCIONAL',
+]
+_ORDEM_FINAL = [
+    'BATE_CAIXA',
+    'FARO_CERTO',
+    'DATA_PROSPECTOR',
+    'CONCLUSAO_PROSPECTOR',
+    'FISCALIZACAO',
+    'COD',
+    'NOTA DE RECLAMACAO',
+    'LEITURISTA',
+    'CONSUMO_MEDIO',
+    'MEDIA_YOY',
+    'NO_MINIMO_4M',
+    'PRIORIDADE',
+    'MOTIVO_PRIORIDADE',
+    'LATITUDE',
+    'LONGITUDE',
+]
+
+# Colunas que as etapas leem além das que vão para o relatório: chaves de
+# junção, endereço do P3-5 e entradas das regras
+_COLUNAS_DE_TRABALHO = [
+    'UC',
+    'MEDIDOR',
+    MEDIDOR_KEY,
+    'MUNICIPIO',
+    'LOGRADOURO',
+    'NUMERO',
+    'CONDOMINIO',
+    'FASE',
+    *RULE_COLUMNS,
+    _ORDER_COL,
+]
+
+
+def _projection() -> Set[str]:
+    """Colunas usadas pelo relatório ou pelas regras (fora os meses).
+
+    As colunas de meses são tratadas à parte: servem para montar a matriz de
+    consumo e só seguem até a saída com REMOVE_CONSUMO=False.
+    """
+    return set(_ORDEM_INICIAL + _ORDEM_FINAL + _COLUNAS_DE_TRABALHO)
+
+
+def _frame_mb(df: pd.DataFrame) -> float:
+    """Tamanho do DataFrame em MB (com o conteúdo das strings)."""
+    return df.memory_usage(deep=True, index=False).sum() / (1024 * 1024)
+
+
+def _project_cadastro(df: pd.DataFrame) -> pd.DataFrame:
+    """Descarta do cadastro as colunas que nem a saída nem as regras usam.
+
+    As colunas de texto do plano de dtypes (`CATEGORICAL_COLUMNS`) que
+    ficam passam a `category`.
+    """
+    needed = _projection()
+    drop = [
+        c
+        for c in df.columns
+        if c not in needed and not _MONTH_RE.match(str(c).strip())
+    ]
+    if drop:
+        logging.info(
+            f'Projeção: {len(drop)} colunas do cadastro descartadas '
+            f'({_frame_mb(df[drop]):.1f} MB).'
+        )
+    df = df.drop(columns=drop)
+
+    texto = [c for c in CATEGORICAL_COLUMNS if c in df.columns]
+    antes = _frame_mb(df[texto])
+    df = to_categorical(df, texto)
+    logging.info(
+        f'Categorias: {len(texto)} colunas de texto de {antes:.1f} MB '
+        f'para {_frame_mb(df[texto]):.1f} MB.'
+    )
+    return df
+
+
+# Bases de consulta guardadas na base de features, com os arquivos de input/
+# de que cada uma depende. O Faro Certo fica de fora: lê só o que é novo.
+_FEATURE_SOURCES = (
+    FeatureSource(
+        'medidores',
+        ('medidores',),
+        lambda data: medidores_lookup(data['medidores']),
+    ),
+    FeatureSource(
+        'inspecoes',
+        ('inspecoes',),
+        lambda data: inspections_lookup(data['inspecoes']),
+    ),
+    FeatureSource(
+        'ocorrencias',
+        ('ocorrencias',),
+        lambda data: occurrences_lookup(data['ocorrencias']),
+    ),
+    FeatureSource(
+        'prospeccao',
+        ('prospeccao',),
+        lambda data: prospeccao_lookup(data.get('prospeccao')),
+    ),
+    FeatureSource(
+        'sinergia',
+        ('sinergia',),
+        lambda data: sinergia_lookup(data['sinergia']),
+    ),
+    FeatureSource(
+        'seccional',
+        ('seccional',),
+        lambda data: seccional_lookup(data['seccional']),
+    ),
+    FeatureSource(
+        'localizacao',
+        ('localizacao',),
+        lambda data: localizacao_lookup(data['localizacao']),
+    ),
+    FeatureSource(
+        'apontamento',
+        ('apontamento', 'codigos_leitura'),
+        lambda data: apontamento_codes_lookup(
+            data['apontamento'], data['codigos_leitura']
+        ),
+    ),
+)
 
-    steps = ['Extração', 'Transformação', 'Carga']
-    pbar = tqdm(total=len(steps), desc='Progresso Geral')
 
-    try:
-        # 1. EXTRAÇÃO
-        logging.info('Etapa 1: Extraindo arquivos...')
-        data: Dict[str, object] = load_all_files()
-        pbar.update(1)
-
-        # 2. TRANSFORMAÇÃO
-        logging.info('Etapa 2: Iniciando transformações...')
-        df = data['cadastro_consumo']
+def _open_feature_store() -> FeatureStore:
+    """Confere a base de features contra os arquivos atuais de input/."""
+    inputs = {key for source in _FEATURE_SOURCES for key in source.inputs}
+    # Mudou a projeção, mudam as tabelas guardadas
+    store = FeatureStore(
+        _FEATURE_SOURCES,
+        source_paths(inputs),
+        tag=repr(sorted(_projection())),
+    )
+    logging.info(
+        'Base de features: %d de %d bases reaproveitadas%s.',
+        len(_FEATURE_SOURCES) - len(store.stale),
+        len(_FEATURE_SOURCES),
+        f" (refazendo: {', '.join(store.stale)})" if store.stale else '',
+    )
+    return store
+
+
+def _prepare_lookups(
+    data: Dict[str, object], store: Optional[FeatureStore] = None
+) -> List[Lookup]:
+    """Reduz cada base de consulta a uma tabela sem duplicatas, uma única vez.
+
+    As tabelas não dependem do cadastro: no modo em pedaços elas são
+    preparadas antes do primeiro pedaço e reaproveitadas em todos. Com
+    `store`, as bases das fontes que não mudaram vêm prontas da base de
+    features e só as demais são montadas (e gravadas nela).
+    """
+    faro_path = data['faro_sqlite']
+    logging.info('Lendo Faro Certo (SQLite): %s', faro_path)
+    faro_last = read_faro_certo(
+        faro_path,
+        use_index=FARO_CERTO_INDEX,
+        incremental=FARO_CERTO_INCREMENTAL,
+    )
+
+    # Cada tabela fica só com a chave e as colunas que a saída/regras usam,
+    # com as colunas de texto do plano de dtypes já em `category`
+    needed = _projection()
+    saved: List[float] = []
+
+    def _prepare(lookup: Optional[Lookup]) -> Optional[Lookup]:
+        projected = (
+            project_lookup(lookup, needed) if lookup is not None else None
+        )
+        if projected is None:
+            return None
+        saved.append(_frame_mb(lookup.table) - _frame_mb(projected.table))
+        return categorize_lookup(projected)
+
+    logging.info('Preparando bases de consulta (PROCV)...')
+    if store is not None:
+        lookups = store.lookups(data, _prepare)
+    else:
+        lookups = [_prepare(source.build(data)) for source in _FEATURE_SOURCES]
+    lookups.append(_prepare(faro_certo_lookup(faro_last)))
+    logging.info(
+        f'Projeção: {sum(saved):.1f} MB a menos nas bases de consulta.'
+    )
+    return [lookup for lookup in lookups if lookup is not None]
+
+
+Stage = Tuple[str, str, Callable[[pd.DataFrame], pd.DataFrame]]
+
+
+def _prune() -> bool:
+    """Se a poda antes das junções vale para a execução em memória."""
+    return EXPORT_ONLY_PRIORITY and PUSHDOWN_EXPORT_FILTER
+
+
+def _prospected_ucs(lookups: List[Lookup]) -> pd.Series:
+    """Lista das UCs com alguma conclusão de prospecção (base de consulta)."""
+    for lookup in lookups:
+        if 'CONCLUSAO_PROSPECTOR' in lookup.columns.values():
+            table = lookup.table
+            return table.loc[table['CONCLUSAO_PROSPECTOR'] != '', lookup.key]
+    return pd.Series(dtype='Int64')
+
+
+def _stages(
+    data: Dict[str, object],
+    lookups: List[Lookup],
+    condominio: bool = True,
+    prune: bool = False,
+) -> List[Stage]:
+    """Etapas por UC, em ordem: (nome, mensagem de log, função).
+
+    Toda etapa segue o contrato da camada de transformação: não altera o
+    DataFrame recebido e devolve um novo que compartilha (copy-on-write)
+    as colunas que ela não mexeu.
+
+    Com `prune=True` (só faz sentido exportando apenas UCs priorizadas e
+    com a base inteira em memória) as UCs que não têm como ser priorizadas
+    saem antes das junções.
+    """
+    # Montada uma vez e reaproveitada pelas etapas de consumo, YoY e mínimo
+    consumo: Dict[str, ConsumptionMatrix] = {}
+
+    def _poda(df: pd.DataFrame) -> pd.DataFrame:
+        matriz = ConsumptionMatrix.from_frame(df)
+        keep = np.flatnonzero(
+            export_candidates(df, matriz, _prospected_ucs(lookups))
+        )
+        logging.info(
+            f'Poda antes das junções: {len(keep)} de {len(df)} UCs seguem.'
+        )
+        consumo['matriz'] = matriz.take(keep)
+        return df.take(keep)
 
-        logging.info('Removendo UCs com alvo pendente (CESTA BT)...')
-        df = filter_out_pendentes(df, data['alvos'])
+    def _consumo(df: pd.DataFrame) -> pd.DataFrame:
+        consumo['matriz'] = ConsumptionMatrix.for_frame(
+            df, consumo.get('matriz')
+        )
+        if not REMOVE_CONSUMO:
+            return treat_monthly_consumption(df, consumo['matriz'])
+        # Os meses não vão para a saída: depois da matriz, saem do DataFrame
+        months = [c for c in consumo['matriz'].columns if c in df.columns]
+        logging.info(
+            f'Projeção: {len(months)} colunas de meses descartadas '
+            f'({_frame_mb(df[months]):.1f} MB).'
+        )
+        return treat_monthly_consumption(
+            df, consumo['matriz'], keep_months=False
+        )
 
-        logging.info('Enriquecendo com dados de medidores...')
-        df = enrich_with_medidores(df, data['medidores'])
+    def _ref_date() -> Optional[datetime]:
+        matriz = consumo.get('matriz')
+        return matriz.reference_date() if matriz is not None else None
 
-        faro_path = data['faro_sqlite']
-        logging.info('Enriquecendo com Faro Certo (SQLite): %s', faro_path)
-        df = enrich_with_faro_certo(df, faro_path)
+    poda: List[Stage] = [
+        (
+            'poda',
+            'Descartando UCs que não têm como ser priorizadas...',
+            _poda,
+        )
+    ]
+    return [
+        (
+            'projecao',
+            'Descartando colunas sem uso na saída e nas regras...',
+            _project_cadastro,
+        ),
+        (
+            'chaves',
+            'Calculando chaves de junção (UC e MEDIDOR)...',
+            add_join_keys,
+        ),
+        (
+            'alvos',
+            'Removendo UCs com alvo pendente (CESTA BT)...',
+            lambda df: filter_out_pendentes(df, data['alvos']),
+        ),
+        *(poda if prune else []),
+        # Medidores, Faro Certo, inspeções, ocorrências, prospecção (motoca),
+        # Sinergia, Seccional, Localização e apontamento num único passo
+        (
+            'enriquecimento',
+            'Enriquecendo com todas as bases de consulta...',
+            lambda df: enrich_with_lookups(df, lookups),
+        ),
+        (
+            'consumo',
+            'Tratando consumo mensal...',
+            _consumo,
+        ),
+        (
+            'yoy',
+            'Calculando YoY...',
+            lambda df: calculate_yoy(
+                df, consumo.get('matriz'), monthly_columns=not REMOVE_YOY
+            ),
+        ),
+        (
+            'minimo',
+            'Identificando consumo no mínimo da fase...',
+            lambda df: flag_minimum_by_phase(df, consumo.get('matriz')),
+        ),
+        (
+            'esforco',
+            'Calculando a data do último esforço...',
+            add_last_effort,
+        ),
+        (
+            'prioridade',
+            'Aplicando priorização...',
+            lambda df: apply_priority_rules(
+                df, condominio=condominio, ref_date=_ref_date()
+            ),
+        ),
+    ]
+
+
+def _transform(
+    df: pd.DataFrame,
+    data: Dict[str, object],
+    lookups: List[Lookup],
+    condominio: bool = True,
+    log: Callable[..., None] = logging.info,
+    prune: bool = False,
+) -> pd.DataFrame:
+    """Enriquecimentos e regras por UC (sem o filtro e a ordenação finais)."""
+    for _, message, stage in _stages(data, lookups, condominio, prune):
+        log(message)
+        df = stage(df)
+    return df
+
+
+def _select_output(
+    df: pd.DataFrame, extra: Sequence[str] = ()
+) -> pd.DataFrame:
+    """Filtro de prioridade e colunas de saída, na ordem do relatório."""
+    if EXPORT_ONLY_PRIORITY:
+        df = df[df['PRIORIDADE'].notna()]
+
+    # Limpeza de colunas de consumo mensal
+    consumo_cols = sorted(
+        [c for c in df.columns if _MONTH_RE.match(str(c).strip())]
+    )
+    if REMOVE_CONSUMO:
+        df = df.drop(columns=consumo_cols)
+        consumo_cols = []
+
+    # YoY por mês (só existe com REMOVE_YOY=False) logo após os meses
+    yoy_cols = (
+        [] if REMOVE_YOY else [c for c in df.columns if c.startswith('yoy_')]
+    )
+
+    ordem_final = (
+        _ORDEM_INICIAL + consumo_cols + yoy_cols + _ORDEM_FINAL + list(extra)
+    )
+    colunas_existentes = [c for c in ordem_final if c in df.columns]
+    return compact_categories(df[colunas_existentes])
+
+
+def _sort_output(df: pd.DataFrame) -> pd.DataFrame:
+    """Ordenação final: Município A-Z, Bairro A-Z, Endereço A-Z."""
+    _sort_keys = ['MUNICIPIO', 'BAIRRO', 'ENDERECO']
+    present_sort_keys = [k for k in _sort_keys if k in df.columns]
+
+    if not present_sort_keys:
+        logging.info(
+            'Nenhuma das colunas de ordenação (MUNICIPIO/BAIRRO/ENDERECO) encontrada para ordenar.'
+        )
+        return df
+
+    # Chaves sem acento/caixa alta como códigos inteiros em ordem alfabética;
+    # lexsort é estável e a última chave da lista é a principal
+    order = np.lexsort(
+        [collation_codes(df[k]) for k in reversed(present_sort_keys)]
+    )
+    return df.take(order).reset_index(drop=True)
+
+
+def _run_chunked(
+    data: Dict[str, object],
+    lookups: List[Lookup],
+    chunks: Iterable[pd.DataFrame],
+) -> pd.DataFrame:
+    """Processa o cadastro pedaço a pedaço e remonta a saída final.
+
+    Primeira passada: cada pedaço passa por todas as regras por UC; a parte
+    já definitiva vai para disco e só as candidatas ao P3-5 ficam em memória,
+    junto das contagens por prédio. Segunda passada: aplica o P3-5 com as
+    contagens da base inteira e restaura a ordem original das linhas.
+    """
+    ds_counts = pd.Series(dtype='int64')
+    predios_com_esforco: Set[str] = set()
+    candidatas: List[pd.DataFrame] = []
+
+    with TemporaryDirectory(prefix='etl_chunks_') as tmp_dir:
+        spool: List[Path] = []
+        offset = 0
+        for i, chunk in enumerate(chunks):
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            chunk[_ORDER_COL] = chunk.index
+            offset += len(chunk)
+
+            # Referência do P3-5: os meses saem do pedaço na projeção
+            ref_date = reference_date(chunk)
+            out = _transform(chunk, data, lookups, False, logging.debug)
+            counts, esforco = building_stats(out, ref_date)
+            ds_counts = ds_counts.add(counts, fill_value=0)
+            predios_com_esforco |= esforco
+
+            mask = condominio_candidates(out)
+            candidatas.append(out[mask])
+
+            part_file = Path(tmp_dir) / f'{i:05d}.pkl'
+            _select_output(out[~mask], extra=[_ORDER_COL]).to_pickle(part_file)
+            spool.append(part_file)
+            logging.info('Pedaço %d processado (%d linhas).', i + 1, offset)
+
+        logging.info('Aplicando P3-5 (condomínio com alto DS) na base toda...')
+        crit_builds = critical_buildings(ds_counts, predios_com_esforco)
+        parts = [pd.read_pickle(p) for p in spool]
+
+    if candidatas:
+        condominio = flag_condominio_alto_ds(
+            pd.concat(candidatas), crit_builds
+        )
+        parts.append(_select_output(condominio, extra=[_ORDER_COL]))
 
-        logging.info('Enriquecendo com dados de inspeções...')
-        df = enrich_with_inspections(df, data['inspecoes'])
+    if not parts:
+        raise ValueError('Base de cadastro/consumo vazia.')
 
-        logging.info('Enriquecendo com dados de ocorrências...')
-        df = enrich_with_occurrences(df, data['ocorrencias'])
+    # Colunas de consumo só existem quando REMOVE_CONSUMO=False; pedaços sem
+    # linhas de saída ainda têm o mesmo cabeçalho, então o concat é estável.
+    # Pedaços com categorias diferentes voltam do concat como texto
+    df = compact_categories(pd.concat(parts))
+    df = df.sort_values(_ORDER_COL, kind='stable')
+    return df.drop(columns=_ORDER_COL).reset_index(drop=True)
 
-        # ----- NOVO: Enriquecimento com Prospeccao -----
-        logging.info('Enriquecendo com Prospeccao de Alvos (motoca)...')
-        df = enrich_with_prospeccao(df, data.get('prospeccao'))
-        # ------------------------------------------------
 
-        logging.info('Enriquecendo com Sinergia, Seccional e Localização...')
-        df = enrich_with_new_bases(df, data)
+def run_pipeline(
+    chunked: Optional[bool] = None, memory_mb: Optional[float] = None
+) -> None:
+    """Executa todo o fluxo de ETL com logs e barra de progresso.
 
-        logging.info('Tratando códigos de apontamento...')
-        apontamento_treated = treat_apontamento_codes(
-            data['apontamento'], data['codigos_leitura']
-        )
-        df = enrich_with_apontamento(df, apontamento_treated)
+    `chunked`/`memory_mb` sobrepõem CHUNKED_PIPELINE/CHUNK_MEMORY_MB.
+    """
+    chunked = CHUNKED_PIPELINE if chunked is None else chunked
+    memory_mb = CHUNK_MEMORY_MB if memory_mb is None else memory_mb
+    logging.info('Iniciando Pipeline de ETL...')
 
-        logging.info('Tratando consumo mensal e calculando YoY...')
-        df = treat_monthly_consumption(df)
-        df = calculate_yoy(df)
+    steps = ['Extração', 'Transformação', 'Carga']
+    pbar = tqdm(total=len(steps), desc='Progresso Geral')
 
-        logging.info(
-            'Identificando consumo no mínimo e aplicando priorização...'
+    try:
+        # 1. EXTRAÇÃO
+        logging.info('Etapa 1: Extraindo arquivos...')
+        store = _open_feature_store() if USE_FEATURE_STORE else None
+        skip = store.skip() if store is not None else set()
+        if chunked:
+            skip.add('cadastro_consumo')
+        data: Dict[str, object] = load_all_files(
+            parallel=PARALLEL_EXTRACTION,
+            use_cache=USE_EXTRACT_CACHE,
+            skip=skip,
         )
-        df = flag_minimum_by_phase(df)
-        df = apply_priority_rules(df)
-
-        if REMOVE_YOY:
-            yoy_cols = [c for c in df.columns if c.startswith('yoy_')]
-            df = df.drop(columns=yoy_cols)
+        pbar.update(1)
 
-        if EXPORT_ONLY_PRIORITY:
-            df = df[df['PRIORIDADE'].notna()].copy()
+        # 2. TRANSFORMAÇÃO
+        logging.info('Etapa 2: Iniciando transformações...')
+        if USE_COLLATION_CACHE:
+            logging.info(f'Chaves de colação reaproveitadas: {load_memo()}')
+        lookups = _prepare_lookups(data, store)
 
-        # Limpeza de colunas de consumo mensal
-        consumo_cols = sorted(
-            [c for c in df.columns if _MONTH_RE.match(str(c).strip())]
-        )
-        if REMOVE_CONSUMO:
-            df = df.drop(columns=consumo_cols)
-            consumo_cols = []
-
-        # Reordenação de colunas
-        logging.info('Reordenando colunas para o formato final...')
-        ordem_final = [
-            'UC',
-            'STATUS_COMERCIAL',
-            'MOVE_IN',
-            'MOVE_OUT',
-            'GRUPO_TENSAO',
-            'CLASSE_PRINCIPAL',
-            'CLASSE_CONSUMO',
-            'PERIMETRO',
-            'SE_AL_NORM',
-            'MEDIDOR',
-            'ANO',
-            'FABRICANTE',
-            'FASE',
-            'MICRO_GERADOR',
-            'INST_MED_FISCAL',
-            'ENDERECO',
-            'CONDOMINIO',
-            'BAIRRO',
-            'MUNICIPIO',
-            'SECCIONAL',
-        ]
-        ordem_final += consumo_cols
-        ordem_final += [
-            'BATE_CAIXA',
-            'FARO_CERTO',
-            'DATA_PROSPECTOR',
-            'CONCLUSAO_PROSPECTOR',
-            'FISCALIZACAO',
-            'COD',
-            'NOTA DE RECLAMACAO',
-            'LEITURISTA',
-            'CONSUMO_MEDIO',
-            'MEDIA_YOY',
-            'NO_MINIMO_4M',
-            'PRIORIDADE',
-            'MOTIVO_PRIORIDADE',
-            'LATITUDE',
-            'LONGITUDE',
-        ]
-
-        colunas_existentes = [c for c in ordem_final if c in df.columns]
-        df = df[colunas_existentes]
+        if chunked:
+            rows = estimate_chunk_rows(
+                'cadastro_consumo', memory_mb, expansion=_CHUNK_EXPANSION
+            )
+            logging.info(
+                'Modo em pedaços: até %s MB por pedaço (%d linhas).',
+                memory_mb,
+                rows,
+            )
+            df = _run_chunked(
+                data, lookups, iter_csv_chunks('cadastro_consumo', rows)
+            )
+        else:
+            df = _transform(
+                data['cadastro_consumo'], data, lookups, prune=_prune()
+            )
+            logging.info('Reordenando colunas para o formato final...')
+            df = _select_output(df)
 
         pbar.update(1)
 
         # --> Ordenação final: Município A-Z, Bairro A-Z, Endereço A-Z
-        _sort_keys = ['MUNICIPIO', 'BAIRRO', 'ENDERECO']
-        present_sort_keys = [k for k in _sort_keys if k in df.columns]
-
-        if present_sort_keys:
-            # cria colunas temporárias normalizadas (remove acento, uppercase, strip)
-            tmp_cols = []
-            for k in present_sort_keys:
-                tmp = f'_SORT_{k}'
-                tmp_cols.append(tmp)
-                df[tmp] = (
-                    df[k]
-                    .fillna('')
-                    .astype(str)
-                    .str.strip()
-                    .apply(lambda x: unicodedata.normalize('NFKD', x))
-                    .apply(
-                        lambda x: ''.join(
-                            ch for ch in x if not unicodedata.combining(ch)
-                        )
-                    )
-                    .str.upper()
-                )
-
-            # ordena pelos campos temporários
-            df = df.sort_values(
-                by=tmp_cols, ascending=True, na_position='last'
-            ).reset_index(drop=True)
-
-            # remove colunas temporárias
-            df.drop(columns=tmp_cols, inplace=True)
-        else:
-            logging.info(
-                'Nenhuma das colunas de ordenação (MUNICIPIO/BAIRRO/ENDERECO) encontrada para ordenar.'
-            )
+        df = _sort_output(df)
+        if USE_COLLATION_CACHE:
+            store_memo()
 
         # 3. CARGA
         logging.info('Etapa 3: Exportando para CSV...')
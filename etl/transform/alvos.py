@@ -9,6 +9,8 @@ from typing import Optional
 
 import pandas as pd
 
+from etl.transform.chaves import uc_key
+
 
 def filter_out_pendentes(
     base_df: pd.DataFrame, alvos_pendentes_df: Optional[pd.DataFrame]
@@ -19,12 +21,13 @@ def filter_out_pendentes(
     A coluna AREA pode existir só como apoio, mas não precisa ir pro output.
 
     Regras principais:
-    - Se `alvos_pendentes_df` for None ou vazio, retorna cópia de base_df.
+    - Se `alvos_pendentes_df` for None ou vazio, retorna base_df inteira
+      (novo DataFrame, sem duplicar os dados).
     - Se a aba não tiver a coluna 'UC', lança KeyError com mensagem esperada
       pelos testes.
     - Não modifica as colunas originais de base_df — só filtra as linhas.
     """
-    out = base_df.copy()
+    out = base_df.copy(deep=False)
 
     # Validações mínimas
     if 'UC' not in out.columns:
@@ -34,20 +37,20 @@ def filter_out_pendentes(
     if alvos_pendentes_df is None or alvos_pendentes_df.empty:
         return out
 
-    alvos = alvos_pendentes_df.copy()
+    alvos = alvos_pendentes_df
     if 'UC' not in alvos.columns:
         raise KeyError(
             "A aba PENDENTES da CESTA BT.xlsx precisa ter a coluna 'UC'."
         )
 
-    # Normaliza UC nos dois lados: tenta converter para numérico (Int64)
-    # Valores inválidos viram <NA> e não fazem match.
-    base_uc = pd.to_numeric(out['UC'], errors='coerce').astype('Int64')
-    alvos_uc = pd.to_numeric(alvos['UC'], errors='coerce').astype('Int64')
+    # UC canônica nos dois lados (Int64); valores inválidos viram <NA> e não
+    # fazem match. Se a base já vem com a chave pronta, nada é recalculado.
+    base_uc = uc_key(out['UC'])
+    alvos_uc = uc_key(alvos['UC'])
 
     # Set de UCs pendentes (descarta NA)
     pendentes_set = set(alvos_uc.dropna().tolist())
 
     # Filtra fora (mantém o que NÃO está no conjunto de pendentes)
     mask_keep = ~base_uc.isin(pendentes_set)
-    return out.loc[mask_keep].copy()
+    return out.loc[mask_keep]
@@ -1,9 +1,83 @@
-"""Módulo para enriquecimento de dados de apontamento de leitura."""
+"""Módulo para enriquecimento de dados de apontamento de leitura.
+
+O dicionário de códigos (CODIGOS DA LEITURA.xls) tem poucas dezenas de
+códigos inteiros e pequenos; ele vira um array em que a posição é o código
+e o valor é a descrição. O apontamento é reduzido a uma linha por
+INSTALACAO antes de resolver o código, que vira um `take` nesse array. Se
+algum código for grande demais para o array valer a pena, o dicionário
+vira uma Series indexada pelo código e a posição sai de `get_indexer`. A
+planilha quase nunca muda e chega aqui pelo cache de extração
+(cache/extract), então não é relida a cada execução.
+"""
 
 from __future__ import annotations
 
+from typing import Union
+
+import numpy as np
 import pandas as pd
 
+from etl.transform.chaves import (
+    Lookup,
+    enrich_with_lookups,
+    latest_per_key,
+    uc_key,
+)
+
+
+def _codes(values: pd.Series) -> pd.Series:
+    """Códigos como Int64 (NA no que não for número)."""
+    return pd.to_numeric(values, errors='coerce').astype('Int64')
+
+
+# Tamanho máximo do array posicional, em posições por código do dicionário
+CODE_TABLE_DENSITY = 8
+
+CodeTable = Union[np.ndarray, pd.Series]
+
+
+def code_descriptions(codigos_df: pd.DataFrame) -> CodeTable:
+    """Tabela código -> descrição para `resolve_codes`.
+
+    Normalmente um array posicional (None nas posições sem código). Se o
+    maior código passar de `CODE_TABLE_DENSITY` posições por código, devolve
+    uma Series de descrições indexada pelo código, sem alocar o array.
+    Códigos repetidos ficam com a primeira descrição, como no merge.
+    """
+    if 'Apontamento' not in codigos_df.columns:
+        raise KeyError("Coluna 'Apontamento' não encontrada no codigos_df")
+
+    codes = _codes(codigos_df['Apontamento'])
+    valid = codes.notna() & (codes >= 0)
+    codes = codes[valid].to_numpy(dtype=np.int64)
+    descriptions = codigos_df['Descricao'][valid].to_numpy(dtype=object)
+
+    size = codes.max() + 1 if len(codes) else 0
+    if size > CODE_TABLE_DENSITY * len(codes):
+        sparse = pd.Series(descriptions, index=codes, dtype=object)
+        return sparse[~sparse.index.duplicated(keep='first')]
+
+    table = np.full(size, None, dtype=object)
+    # Atribuição de trás para frente: a primeira ocorrência vence
+    table[codes[::-1]] = descriptions[::-1]
+    return table
+
+
+def resolve_codes(codes: pd.Series, table: CodeTable) -> pd.Series:
+    """Descrição de cada código via `take` (None fora do dicionário)."""
+    codes = _codes(codes)
+    positions = codes.fillna(-1).to_numpy(dtype=np.int64)
+    if isinstance(table, pd.Series):
+        positions = table.index.get_indexer(positions)
+        table = table.to_numpy(dtype=object)
+    # Nulos, negativos e códigos fora do dicionário apontam para o None extra
+    positions[(positions < 0) | (positions >= len(table))] = len(table)
+    return pd.Series(
+        np.append(table, None).take(positions),
+        index=codes.index,
+        name='Descricao',
+    )
+
 
 def treat_apontamento_codes(
     apontamento_df: pd.DataFrame, codigos_df: pd.DataFrame
@@ -16,53 +90,63 @@ def treat_apontamento_codes(
     - codigos_df: DataFrame com códigos e descrições, deve ter coluna 'Apontamento'.
 
     Retorna:
-    - DataFrame apontamento com coluna 'Descricao' adicionada via merge.
+    - DataFrame apontamento com coluna 'Descricao' resolvida pelo código.
     """
-    apontamento = apontamento_df.copy()
-    codigos = codigos_df.copy()
+    apontamento = apontamento_df.copy(deep=False)
 
     if 'COD_MENS_LEF' not in apontamento.columns:
         raise KeyError(
             "Coluna 'COD_MENS_LEF' não encontrada no apontamento_df"
         )
-    if 'Apontamento' not in codigos.columns:
-        raise KeyError("Coluna 'Apontamento' não encontrada no codigos_df")
-
-    # Renomear coluna de código para match
-    codigos = codigos.rename(columns={'Apontamento': 'COD_MENS_LEF'})
 
     # Garantir tipo numérico (Int64 para permitir NA)
-    apontamento['COD_MENS_LEF'] = pd.to_numeric(
-        apontamento['COD_MENS_LEF'], errors='coerce'
-    ).astype('Int64')
-    codigos['COD_MENS_LEF'] = pd.to_numeric(
-        codigos['COD_MENS_LEF'], errors='coerce'
-    ).astype('Int64')
-
-    # Merge para trazer a descrição
-    apontamento = apontamento.merge(
-        codigos[['COD_MENS_LEF', 'Descricao']],
-        on='COD_MENS_LEF',
-        how='left',
+    apontamento['COD_MENS_LEF'] = _codes(apontamento['COD_MENS_LEF'])
+    apontamento['Descricao'] = resolve_codes(
+        apontamento['COD_MENS_LEF'], code_descriptions(codigos_df)
     )
 
     return apontamento
 
 
-def enrich_with_apontamento(
-    base_df: pd.DataFrame, apontamento_treated_df: pd.DataFrame
-) -> pd.DataFrame:
+def apontamento_codes_lookup(
+    apontamento_df: pd.DataFrame, codigos_df: pd.DataFrame
+) -> Lookup:
+    """Monta a base de consulta do LEITURISTA direto do apontamento bruto.
+
+    Reduz o histórico a uma linha por INSTALACAO (a primeira, na ordem do
+    arquivo) e só então resolve o código dessas linhas. Mesmo resultado de
+    `apontamento_lookup(treat_apontamento_codes(...))`.
     """
-    Enriquecer base principal com descrição do apontamento (LEITURISTA).
+    if 'INSTALACAO' not in apontamento_df.columns:
+        raise KeyError("Coluna 'INSTALACAO' não encontrada no apontamento_df")
+    if 'COD_MENS_LEF' not in apontamento_df.columns:
+        raise KeyError(
+            "Coluna 'COD_MENS_LEF' não encontrada no apontamento_df"
+        )
+
+    apontamento = pd.DataFrame(
+        {
+            'UC': uc_key(apontamento_df['INSTALACAO']),
+            'COD_MENS_LEF': apontamento_df['COD_MENS_LEF'],
+        }
+    )
+    apontamento = latest_per_key(apontamento, 'UC', keep='first')
+    apontamento['LEITURISTA'] = resolve_codes(
+        apontamento['COD_MENS_LEF'], code_descriptions(codigos_df)
+    )
+
+    return Lookup(
+        key='UC', table=apontamento, columns={'LEITURISTA': 'LEITURISTA'}
+    )
+
+
+def apontamento_lookup(apontamento_treated_df: pd.DataFrame) -> Lookup:
+    """Monta a base de consulta do apontamento: primeiro LEITURISTA por UC.
 
     Parâmetros:
-    - base_df: DataFrame principal com coluna 'UC'.
     - apontamento_treated_df: DataFrame tratado com colunas 'INSTALACAO' e 'Descricao'.
-
-    Retorna:
-    - DataFrame base_df enriquecido com coluna 'LEITURISTA'.
     """
-    apontamento = apontamento_treated_df.copy()
+    apontamento = apontamento_treated_df.copy(deep=False)
 
     if 'INSTALACAO' not in apontamento.columns:
         raise KeyError(
@@ -72,28 +156,39 @@ def enrich_with_apontamento(
         raise KeyError(
             "Coluna 'Descricao' não encontrada no apontamento_treated_df"
         )
-    if 'UC' not in base_df.columns:
-        raise KeyError("Coluna 'UC' não encontrada no base_df")
 
     # Renomear para padronizar
     apontamento = apontamento.rename(
         columns={'INSTALACAO': 'UC', 'Descricao': 'LEITURISTA'}
     )
 
-    # Pega apenas a primeira ocorrência por UC (PROCV)
-    apontamento = apontamento.drop_duplicates(subset=['UC'], keep='first')
-
-    # Garantir tipo numérico para merge
-    apontamento['UC'] = pd.to_numeric(
-        apontamento['UC'], errors='coerce'
-    ).astype('Int64')
-    base_df_copy = base_df.copy()
-    base_df_copy['UC'] = pd.to_numeric(
-        base_df_copy['UC'], errors='coerce'
-    ).astype('Int64')
-
-    # Merge com validação m:1
-    df = base_df_copy.merge(
-        apontamento[['UC', 'LEITURISTA']], on='UC', how='left', validate='m:1'
+    # UC canônica e apenas a primeira ocorrência por UC (PROCV); o contrato
+    # do apontamento não tem data, então vale a ordem do arquivo
+    apontamento['UC'] = uc_key(apontamento['UC'])
+    apontamento = latest_per_key(apontamento, 'UC', keep='first')
+
+    # m:1 pela UC canônica
+    return Lookup(
+        key='UC', table=apontamento, columns={'LEITURISTA': 'LEITURISTA'}
+    )
+
+
+def enrich_with_apontamento(
+    base_df: pd.DataFrame, apontamento_treated_df: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Enriquecer base principal com descrição do apontamento (LEITURISTA).
+
+    Parâmetros:
+    - base_df: DataFrame principal com coluna 'UC'.
+    - apontamento_treated_df: DataFrame tratado com colunas 'INSTALACAO' e 'Descricao'.
+
+    Retorna:
+    - DataFrame base_df enriquecido com coluna 'LEITURISTA'.
+    """
+    if 'UC' not in base_df.columns:
+        raise KeyError("Coluna 'UC' não encontrada no base_df")
+
+    return enrich_with_lookups(
+        base_df, [apontamento_lookup(apontamento_treated_df)]
     )
-    return df
@@ -0,0 +1,117 @@
+"""Plano de dtypes das colunas de texto com poucos valores distintos.
+
+Status, fase, classe, município, bairro, seccional, fabricante, leiturista
+e conclusão do prospector se repetem em milhões de linhas. Elas são
+guardadas como `category` (um código inteiro por linha + a lista de
+valores distintos) desde a entrada no pipeline, e a normalização usada
+pelas regras (strip + upper) roda só sobre as categorias: as comparações
+com 'LG', 'DS', fases etc. viram comparações de códigos. Os valores
+originais continuam os mesmos, então a saída não muda.
+"""
+
+from __future__ import annotations
+
+from typing import Collection, Sequence
+
+import numpy as np
+import pandas as pd
+
+from etl.transform.chaves import Lookup
+
+CATEGORICAL_COLUMNS = (
+    'STATUS_COMERCIAL',
+    'FASE',
+    'GRUPO_TENSAO',
+    'CLASSE_PRINCIPAL',
+    'CLASSE_CONSUMO',
+    'MUNICIPIO',
+    'BAIRRO',
+    'SECCIONAL',
+    'FABRICANTE',
+    'LEITURISTA',
+    'CONCLUSAO_PROSPECTOR',
+)
+
+
+def is_categorical(values: pd.Series) -> bool:
+    """Se a série já é `category`."""
+    return isinstance(values.dtype, pd.CategoricalDtype)
+
+
+def as_category(values: pd.Series) -> pd.Series:
+    """Devolve a série como `category` (sem cópia se já for)."""
+    return values if is_categorical(values) else values.astype('category')
+
+
+def to_categorical(
+    df: pd.DataFrame, columns: Sequence[str] = CATEGORICAL_COLUMNS
+) -> pd.DataFrame:
+    """Passa para `category` as colunas do plano presentes em `df`."""
+    out = df.copy(deep=False)
+    for col in columns:
+        if col in out.columns and not is_categorical(out[col]):
+            out[col] = out[col].astype('category')
+    return out
+
+
+def compact_categories(
+    df: pd.DataFrame, columns: Sequence[str] = CATEGORICAL_COLUMNS
+) -> pd.DataFrame:
+    """Colunas do plano em `category` só com as categorias em uso.
+
+    Depois de filtros e junções sobram categorias sem nenhuma linha; e o
+    concat de pedaços com categorias diferentes volta a ser texto. Aqui as
+    duas situações terminam no mesmo dtype.
+    """
+    out = df.copy(deep=False)
+    for col in columns:
+        if col not in out.columns:
+            continue
+        if is_categorical(out[col]):
+            out[col] = out[col].cat.remove_unused_categories()
+        else:
+            out[col] = out[col].astype('category')
+    return out
+
+
+def categorize_lookup(
+    lookup: Lookup, columns: Collection[str] = CATEGORICAL_COLUMNS
+) -> Lookup:
+    """Passa para `category` as colunas de destino do plano no `lookup`.
+
+    O valor de preenchimento das linhas sem match entra nas categorias,
+    para o take posicional de `attach_columns` continuar categórico.
+    """
+    table = lookup.table.copy(deep=False)
+    for src, dst in lookup.columns.items():
+        if dst not in columns or src == lookup.key:
+            continue
+        values = as_category(table[src])
+        fill = lookup.fill.get(dst)
+        if fill is not None and fill not in values.cat.categories:
+            values = values.cat.add_categories([fill])
+        table[src] = values
+    return Lookup(
+        key=lookup.key, table=table, columns=lookup.columns, fill=lookup.fill
+    )
+
+
+def normalized(values: pd.Series, strip: bool = True) -> pd.Series:
+    """Valores com strip (opcional) + upper, calculados só nas categorias.
+
+    Devolve uma série `category`; categorias que ficam iguais depois da
+    normalização (' lg ' e 'LG') viram uma só. Nulos continuam nulos.
+    """
+    values = as_category(values)
+    categories = pd.Series(values.cat.categories).astype(str)
+    if strip:
+        categories = categories.str.strip()
+    key_codes, keys = pd.factorize(categories.str.upper())
+    codes = values.cat.codes.to_numpy()
+    # Código -1 (nulo) continua -1
+    new_codes = np.append(key_codes, -1).take(codes)
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes, categories=keys),
+        index=values.index,
+        name=values.name,
+    )
@@ -0,0 +1,230 @@
+"""Chaves canônicas de junção (UC e MEDIDOR) usadas por todos os enriquecimentos.
+
+Cada base externa identifica a UC e o medidor do seu jeito (int, float,
+texto com '.0', espaços, minúsculas). Aqui a normalização é feita uma vez
+por coluna e as junções viram busca posicional num índice hash montado
+sobre a base de consulta (já sem duplicatas), sem merge e sem ida e volta
+entre texto e número. `enrich_with_lookups` anexa as colunas de várias
+bases de consulta (`Lookup`) de uma vez, sem reconstruir a base principal.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Collection, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+# Chave normalizada do medidor (str + strip + upper) na base principal
+MEDIDOR_KEY = 'MEDIDOR_KEY'
+
+
+def uc_key(values: pd.Series) -> pd.Series:
+    """UC canônica: inteiro (Int64), <NA> quando o valor não é uma UC válida.
+
+    Aceita int, float ('123.0' e 123.0 viram 123) e texto com espaços.
+    """
+    if values.dtype == 'Int64':
+        return values
+    num = pd.to_numeric(values, errors='coerce')
+    if num.dtype.kind == 'f':
+        # Valores fracionários não são UC: viram <NA> em vez de erro no cast
+        num = num.where(num == np.floor(num))
+    return num.astype('Int64')
+
+
+def medidor_key(values: pd.Series) -> pd.Series:
+    """Medidor canônico: texto sem espaços nas pontas e em caixa alta."""
+    return values.astype(str).str.strip().str.upper()
+
+
+def with_join_keys(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """Garante UC canônica e MEDIDOR_KEY na base, calculando só o que falta.
+
+    Retorna (base, colunas criadas aqui). Quem chamou sem as chaves prontas
+    pode remover as colunas criadas no fim, deixando a saída como antes.
+    """
+    added: List[str] = []
+    if 'UC' in df.columns and df['UC'].dtype != 'Int64':
+        df['UC'] = uc_key(df['UC'])
+    if MEDIDOR_KEY not in df.columns and 'MEDIDOR' in df.columns:
+        df[MEDIDOR_KEY] = medidor_key(df['MEDIDOR'])
+        added.append(MEDIDOR_KEY)
+    return df, added
+
+
+def add_join_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """Calcula uma única vez as chaves canônicas de junção da base principal."""
+    out = df.copy(deep=False)
+    with_join_keys(out)
+    return out
+
+
+def latest_per_key(
+    df: pd.DataFrame,
+    key: str,
+    date: Optional[str] = None,
+    keep: str = 'last',
+) -> pd.DataFrame:
+    """Uma linha por chave: a de `date` mais recente, em tempo linear.
+
+    As chaves são fatoradas uma vez e a data máxima de cada chave sai de
+    uma redução numpy (`np.maximum.at`), sem ordenar o histórico. NaT/NaN
+    contam como a data mais antiga: só vencem se a chave não tiver outra.
+    Empates (mesma data, ou todas as linhas sem `date`) são resolvidos
+    pela ordem do arquivo: `keep='last'` fica com a última linha e
+    `keep='first'` com a primeira. Linhas com chave nula saem (nunca casam
+    no PROCV). As linhas mantidas preservam a ordem original.
+    """
+    if keep not in ('first', 'last'):
+        raise ValueError("keep precisa ser 'first' ou 'last'.")
+    codes, uniques = pd.factorize(df[key])
+    rows = np.arange(len(df))
+    valid = codes >= 0
+
+    if date is not None:
+        values = df[date]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # NaT vira o menor int64
+            ts = values.to_numpy().view(np.int64)
+        else:
+            ts = values.to_numpy(dtype=np.float64, na_value=-np.inf)
+        best = np.full(len(uniques), np.iinfo(np.int64).min, dtype=ts.dtype)
+        if ts.dtype.kind == 'f':
+            best[:] = -np.inf
+        np.maximum.at(best, codes[valid], ts[valid])
+        valid &= ts == best[codes]
+
+    if keep == 'last':
+        chosen = np.full(len(uniques), -1, dtype=np.int64)
+        np.maximum.at(chosen, codes[valid], rows[valid])
+    else:
+        chosen = np.full(len(uniques), len(df), dtype=np.int64)
+        np.minimum.at(chosen, codes[valid], rows[valid])
+    return df.take(np.sort(chosen))
+
+
+def lookup_positions(base_key: pd.Series, lookup_key: pd.Series) -> np.ndarray:
+    """Posição, na base de consulta, da linha de cada chave da base principal.
+
+    `lookup_key` precisa ser única (PROCV); -1 indica que não houve match.
+    Chaves ausentes (<NA>) nunca casam. Com a chave da base principal em
+    `category` (MUNICIPIO) só as categorias são sondadas no índice, e as
+    posições chegam às linhas pelos códigos.
+    """
+    index = pd.Index(lookup_key)
+    if not index.is_unique:
+        raise ValueError('A chave da base de consulta precisa ser única.')
+    if isinstance(base_key.dtype, pd.CategoricalDtype):
+        by_category = index.get_indexer(base_key.cat.categories)
+        # Código -1 (nulo) vira -1 (sem match)
+        return np.append(by_category, -1).take(base_key.cat.codes.to_numpy())
+    positions = index.get_indexer(base_key)
+    if index.hasnans:
+        positions[base_key.isna().to_numpy()] = -1
+    return positions
+
+
+def _keep_existing(
+    attached: pd.Series, existing: pd.Series, matched: np.ndarray
+) -> pd.Series:
+    """Valor da consulta onde houve match; o que a base já tinha no resto."""
+    if isinstance(attached.dtype, pd.CategoricalDtype) or isinstance(
+        existing.dtype, pd.CategoricalDtype
+    ):
+        # Mesmas categorias dos dois lados para o `where` não recusar valores
+        attached = attached.astype('category')
+        existing = existing.astype('category')
+        categories = attached.cat.categories.union(existing.cat.categories)
+        attached = attached.cat.set_categories(categories)
+        existing = existing.cat.set_categories(categories)
+    return attached.where(matched, existing)
+
+
+def attach_columns(
+    base: pd.DataFrame,
+    positions: np.ndarray,
+    lookup: pd.DataFrame,
+    columns: Mapping[str, str],
+    fill: Optional[Mapping[str, object]] = None,
+) -> pd.DataFrame:
+    """Copia colunas da base de consulta para a base principal, por posição.
+
+    `columns` mapeia coluna de origem -> coluna de destino. Linhas sem match
+    (-1) recebem `fill[destino]` ou, na falta dele, nulo (como num merge left).
+    Se o destino já existe na base (ex.: CLASSE_CONSUMO do cadastro e da
+    localização), as linhas com match recebem o valor da consulta e as sem
+    match mantêm o valor que já tinham, no lugar de `fill`.
+    """
+    fill = fill or {}
+    matched = positions >= 0
+    for src, dst in columns.items():
+        values = take(
+            lookup[src].array,
+            positions,
+            allow_fill=True,
+            fill_value=fill.get(dst),
+        )
+        if dst in base.columns and not matched.all():
+            values = _keep_existing(
+                pd.Series(values, index=base.index), base[dst], matched
+            )
+        base[dst] = values
+    return base
+
+
+@dataclass(frozen=True)
+class Lookup:
+    """Base de consulta já sem duplicatas, pronta para o PROCV posicional.
+
+    - key: coluna-chave, com o mesmo nome na base principal e em `table`
+      ('UC', MEDIDOR_KEY ou 'MUNICIPIO').
+    - table: uma linha por chave.
+    - columns: coluna de origem em `table` -> coluna de destino na base.
+    - fill: valor das linhas sem match por coluna de destino (padrão: nulo).
+    """
+
+    key: str
+    table: pd.DataFrame
+    columns: Mapping[str, str]
+    fill: Mapping[str, object] = field(default_factory=dict)
+
+
+def project_lookup(
+    lookup: Lookup, needed: Collection[str]
+) -> Optional[Lookup]:
+    """Mantém só as colunas de destino em `needed` (None se não sobrar nada).
+
+    A tabela de consulta também é reduzida à chave e às colunas de origem
+    que continuam em uso, liberando as demais colunas da fonte.
+    """
+    columns = {
+        src: dst for src, dst in lookup.columns.items() if dst in needed
+    }
+    if not columns:
+        return None
+    table = lookup.table[
+        [lookup.key, *(c for c in columns if c != lookup.key)]
+    ]
+    fill = {dst: v for dst, v in lookup.fill.items() if dst in needed}
+    return Lookup(key=lookup.key, table=table, columns=columns, fill=fill)
+
+
+def enrich_with_lookups(
+    base: pd.DataFrame, lookups: Sequence[Lookup]
+) -> pd.DataFrame:
+    """Anexa as colunas de todas as bases de consulta num único passo.
+
+    A base principal não é reconstruída: para cada base de consulta a chave
+    é sondada uma vez no índice hash e cada coluna nova é uma única alocação
+    (take posicional). Nenhuma linha é duplicada ou removida.
+    """
+    out, added = with_join_keys(base.copy(deep=False))
+    for lookup in lookups:
+        positions = lookup_positions(out[lookup.key], lookup.table[lookup.key])
+        attach_columns(
+            out, positions, lookup.table, lookup.columns, lookup.fill
+        )
+    return out.drop(columns=added)
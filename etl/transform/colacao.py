@@ -0,0 +1,89 @@
+"""Chaves de colação para ordenar e comparar texto sem acento.
+
+A chave de um texto é o próprio texto sem espaços nas pontas, sem acentos
+(NFKD sem os caracteres combinantes) e em caixa alta. Município, bairro,
+endereço e conclusão do prospector têm poucos valores distintos perto do
+número de linhas, então a normalização roda só uma vez por valor distinto:
+o resultado fica num memo (que pode ser salvo em disco e reaproveitado na
+próxima execução) e volta para as linhas como códigos de um Categorical
+cujas categorias estão em ordem alfabética. Ordenar pelos códigos inteiros
+é o mesmo que ordenar pelas chaves.
+"""
+
+from __future__ import annotations
+
+import logging
+import unicodedata
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Memo salvo entre execuções (texto original -> chave)
+COLLATION_CACHE = Path('cache') / 'colacao.pkl'
+
+_MEMO: Dict[str, str] = {}
+
+
+def collation_key(text: str) -> str:
+    """Chave de colação de um texto (memoizada)."""
+    key = _MEMO.get(text)
+    if key is None:
+        decomposed = unicodedata.normalize('NFKD', text.strip())
+        key = ''.join(
+            ch for ch in decomposed if not unicodedata.combining(ch)
+        ).upper()
+        _MEMO[text] = key
+    return key
+
+
+def collation_keys(values: pd.Series) -> pd.Series:
+    """Chaves de colação de `values` como Series categórica ordenada.
+
+    Nulos viram ''. As categorias são as chaves distintas em ordem
+    alfabética, então `.cat.codes` serve direto como chave de ordenação e
+    comparações com texto (`== 'SIM'`) rodam sobre os códigos.
+    """
+    codes, uniques = pd.factorize(values)
+    texts = [str(u) for u in uniques]
+    if (codes < 0).any():
+        # Nulos viram '', acrescentado no fim
+        codes = np.where(codes < 0, len(texts), codes)
+        texts.append('')
+    keys = np.array([collation_key(t) for t in texts], dtype=object)
+    # Textos diferentes podem ter a mesma chave ('São' e 'SAO')
+    key_codes, categories = pd.factorize(keys, sort=True)
+    return pd.Series(
+        pd.Categorical.from_codes(
+            key_codes.take(codes), categories=categories
+        ),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def collation_codes(values: pd.Series) -> np.ndarray:
+    """Códigos inteiros cuja ordem é a ordem alfabética das chaves."""
+    return collation_keys(values).cat.codes.to_numpy()
+
+
+def load_memo(path: Path = COLLATION_CACHE) -> int:
+    """Carrega o memo salvo por `store_memo`; devolve quantas chaves leu."""
+    if not path.exists():
+        return 0
+    try:
+        saved = pd.read_pickle(path)
+    except Exception as exc:
+        logging.warning('Memo de colação ilegível (%s), ignorando.', exc)
+        return 0
+    _MEMO.update(saved)
+    return len(saved)
+
+
+def store_memo(path: Path = COLLATION_CACHE) -> None:
+    """Salva o memo atual para a próxima execução."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    pd.to_pickle(dict(_MEMO), tmp)
+    tmp.replace(path)
@@ -1,48 +1,186 @@
-"""Módulo para tratamento de dados de consumo mensal."""
+"""Módulo para tratamento de dados de consumo mensal.
+
+As colunas MM/YYYY do cadastro viram uma única `ConsumptionMatrix`: um
+array 2-D contíguo (UCs × meses, int32) com os meses em ordem cronológica.
+Ela é montada uma vez e reaproveitada pelo consumo médio, pelo YoY e pelo
+mínimo da fase, que passam a ser operações vetorizadas sobre o array.
+"""
 from __future__ import annotations
 
 import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-_MONTH_COL_RE = re.compile(r'^\d{2}/\d{4}$')
+_MONTH_COL_RE = re.compile(r'^(\d{2})/(\d{4})$')
 
 
-def _is_month_col(col_name: object) -> bool:
-    """Retorna True se col_name corresponde ao padrão MM/YYYY (aceita quotes e espaços)."""
+def _month_label(col_name: object) -> Optional[str]:
+    """'MM/YYYY' da coluna (sem aspas e espaços) ou None se não for mês."""
     if col_name is None:
-        return False
+        return None
     s = str(col_name).strip().strip("'").strip()
-    return bool(_MONTH_COL_RE.match(s))
+    return s if _MONTH_COL_RE.match(s) else None
+
+
+def _is_month_col(col_name: object) -> bool:
+    """Retorna True se col_name corresponde ao padrão MM/YYYY (aceita quotes e espaços)."""
+    return _month_label(col_name) is not None
+
+
+def month_key(label: str) -> Tuple[int, int]:
+    """Chave de ordenação (ano, mes) a partir de 'MM/YYYY'."""
+    m = _MONTH_COL_RE.match(label)
+    return (int(m.group(2)), int(m.group(1)))
+
+
+def month_columns(df: pd.DataFrame) -> Dict[str, str]:
+    """Colunas de consumo do DataFrame: nome original -> 'MM/YYYY'."""
+    labels = {}
+    for col in df.columns:
+        label = _month_label(col)
+        if label is not None:
+            labels[col] = label
+    return labels
+
+
+def reference_date(df: pd.DataFrame) -> Optional[datetime]:
+    """Primeiro dia do último mês de consumo do DataFrame (None sem meses)."""
+    months = month_columns(df).values()
+    if not months:
+        return None
+    year, month = max(month_key(m) for m in months)
+    return datetime(year, month, 1)
+
+
+@dataclass(frozen=True)
+class ConsumptionMatrix:
+    """Consumo mensal da base como um único array 2-D.
+
+    - values: array C-contíguo int32 (UCs × meses); vazio/inválido vira 0.
+    - months: rótulos 'MM/YYYY' em ordem cronológica (colunas de `values`).
+    - columns: nome original de cada mês no DataFrame (mesma ordem).
+    - index: índice das linhas, alinhado com o DataFrame de origem.
+    """
+
+    values: np.ndarray
+    months: Tuple[str, ...]
+    columns: Tuple[object, ...]
+    index: pd.Index
 
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> ConsumptionMatrix:
+        """Detecta e converte as colunas MM/YYYY uma única vez."""
+        by_label: Dict[str, object] = {}
+        for col, label in month_columns(df).items():
+            # Mês repetido (com e sem aspas): vale a primeira coluna
+            by_label.setdefault(label, col)
+        months = sorted(by_label, key=month_key)
 
-def treat_monthly_consumption(df: pd.DataFrame) -> pd.DataFrame:
+        values = np.empty((len(df), len(months)), dtype=np.int32)
+        for j, label in enumerate(months):
+            col = pd.to_numeric(df[by_label[label]], errors='coerce')
+            # astype trunca decimais (2.9 -> 2), como o int() do Python
+            values[:, j] = col.fillna(0).to_numpy(dtype=np.float64)
+        return cls(
+            values=values,
+            months=tuple(months),
+            columns=tuple(by_label[label] for label in months),
+            index=df.index,
+        )
+
+    @classmethod
+    def for_frame(
+        cls, df: pd.DataFrame, matrix: Optional[ConsumptionMatrix] = None
+    ) -> ConsumptionMatrix:
+        """Reaproveita `matrix` se ela estiver alinhada com `df`; senão monta outra."""
+        if matrix is not None and matrix.index.equals(df.index):
+            return matrix
+        return cls.from_frame(df)
+
+    def reference_date(self) -> Optional[datetime]:
+        """Primeiro dia do último mês da matriz (None sem meses)."""
+        if not self.months:
+            return None
+        year, month = month_key(self.months[-1])
+        return datetime(year, month, 1)
+
+    def take(self, rows: np.ndarray) -> ConsumptionMatrix:
+        """Matriz só com as linhas nas posições `rows` (na mesma ordem)."""
+        return ConsumptionMatrix(
+            values=self.values[rows],
+            months=self.months,
+            columns=self.columns,
+            index=self.index[rows],
+        )
+
+    def year_ago_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Posições (mês, mesmo mês do ano anterior) para o YoY.
+
+        Só entram os meses completos (o último mês disponível fica de fora)
+        cujo mês do ano anterior também está na matriz.
+        """
+        ordinals = np.array(
+            [year * 12 + month for year, month in map(month_key, self.months)],
+            dtype=np.int64,
+        )
+        cur = np.arange(max(len(ordinals) - 1, 0))
+        target = ordinals[cur] - 12
+        prev = np.searchsorted(ordinals, target)
+        found = prev < len(ordinals)
+        found[found] = ordinals[prev[found]] == target[found]
+        return cur[found], prev[found]
+
+    def rename_map(self) -> Dict[object, str]:
+        """Nome original -> 'MM/YYYY' só das colunas com nome fora do padrão."""
+        return {
+            col: label
+            for col, label in zip(self.columns, self.months)
+            if col != label
+        }
+
+
+def consumo_medio(matrix: ConsumptionMatrix) -> np.ndarray:
+    """Média dos meses com consumo diferente de zero (NaN se não houver)."""
+    nonzero = np.count_nonzero(matrix.values, axis=1)
+    total = matrix.values.sum(axis=1, dtype=np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(nonzero > 0, total / nonzero, np.nan)
+
+
+def treat_monthly_consumption(
+    df: pd.DataFrame,
+    matrix: Optional[ConsumptionMatrix] = None,
+    keep_months: bool = True,
+) -> pd.DataFrame:
     """
     Substituir valores vazios por 0 nas colunas de meses de consumo (MM/YYYY).
 
     - Detecta colunas com padrão preciso MM/YYYY.
     - Converte os valores para numérico (coerce), preenche NaN por 0 e cast para int.
-    - Calcula a média de consumo mensal e armazena em CONSUMO_MEDIO.
+    - Calcula a média de consumo mensal e armazena em CONSUMO_MEDIO (float,
+      duas casas; a vírgula decimal só entra na exportação).
     - Não altera outras colunas.
-    """
-    df_copy = df.copy()
 
-    consumption_cols = [col for col in df_copy.columns if _is_month_col(col)]
+    `matrix` é a `ConsumptionMatrix` já montada para `df`, se houver. Com
+    `keep_months=False` as colunas de meses saem do DataFrame (os valores
+    continuam na matriz).
+    """
+    df_copy = df.copy(deep=False)
+    matrix = ConsumptionMatrix.for_frame(df_copy, matrix)
 
-    for col in consumption_cols:
-        df_copy[col] = (
-            pd.to_numeric(df_copy[col], errors='coerce').fillna(0).astype(int)
-        )
+    if keep_months:
+        for j, col in enumerate(matrix.columns):
+            df_copy[col] = matrix.values[:, j]
+    else:
+        df_copy = df_copy.drop(columns=list(month_columns(df_copy)))
 
-    if consumption_cols:
-        df_copy['CONSUMO_MEDIO'] = (
-            df_copy[consumption_cols]
-            .replace(0, pd.NA)
-            .mean(axis=1, skipna=True)
-            .round(2)
-            .apply(lambda x: f'{x:.2f}'.replace('.', ',') if pd.notna(x) else '')
-        )
+    if matrix.months:
+        df_copy['CONSUMO_MEDIO'] = np.round(consumo_medio(matrix), 2)
     else:
-        df_copy['CONSUMO_MEDIO'] = pd.NA
+        df_copy['CONSUMO_MEDIO'] = np.nan
 
     return df_copy
@@ -1,56 +1,54 @@
 """Módulo para enriquecimento de dados de bate caixa, seccional, latitude e longitude."""
 from __future__ import annotations
 
-from typing import Dict
+import logging
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-
-def enrich_with_new_bases(
-    df: pd.DataFrame, data: Dict[str, pd.DataFrame]
-) -> pd.DataFrame:
-    """Adiciona BATE_CAIXA, SECCIONAL, CLASSE_CONSUMO, LATITUDE e LONGITUDE ao DataFrame.
-
-    Mantém o comportamento original, apenas adiciona checagens e robustez em tipos.
-    """
-    out = df.copy()
-
-    # Valida presença das bases esperadas
-    for key in ('sinergia', 'seccional', 'localizacao'):
-        if key not in data:
-            raise KeyError(f"A chave '{key}' precisa existir no dict data.")
-
-    # 1. Bate Caixa (Sinergia)
-    sinergia = data['sinergia'].copy()
+from etl.extract.schemas import SCHEMAS
+from etl.transform.chaves import (
+    Lookup,
+    enrich_with_lookups,
+    latest_per_key,
+    uc_key,
+)
+
+# Maior valor absoluto aceito antes de recolocar a vírgula decimal
+_COORD_LIMITE = 180.0
+# Caixa da região atendida (RS), com folga; pontos fora viram vazio.
+# None desliga a validação.
+REGIAO_BBOX: Optional[Dict[str, Tuple[float, float]]] = {
+    'latitude': (-34.0, -27.0),
+    'longitude': (-58.0, -49.0),
+}
+
+
+def sinergia_lookup(sinergia_df: pd.DataFrame) -> Lookup:
+    """Monta a base de consulta do Bate Caixa (Sinergia): última data por UC."""
+    sinergia = sinergia_df.copy(deep=False)
     # Garante tipos coerentes
     if 'number' not in sinergia.columns or 'timestamp' not in sinergia.columns:
         raise KeyError(
             "A tabela 'sinergia' precisa ter as colunas 'number' e 'timestamp'."
         )
 
-    sinergia['number'] = pd.to_numeric(sinergia['number'], errors='coerce')
-    # Parse seguro da timestamp; keep apenas a data
-    sinergia['timestamp'] = pd.to_datetime(
-        sinergia['timestamp'], errors='coerce'
-    ).dt.date
+    sinergia['UC'] = uc_key(sinergia['number'])
+    # Formato do contrato da fonte; keep apenas a data (datetime64 à meia-noite)
+    sinergia['timestamp'] = (
+        SCHEMAS['sinergia'].dates['timestamp'].parse(sinergia['timestamp'])
+    ).dt.normalize()
     # Se houver duplicatas de UC no Sinergia, pegamos a data mais recente
-    sinergia = sinergia.sort_values('timestamp').drop_duplicates(
-        'number', keep='last'
+    sinergia = latest_per_key(sinergia, 'UC', 'timestamp')
+    return Lookup(
+        key='UC', table=sinergia, columns={'timestamp': 'BATE_CAIXA'}
     )
 
-    out = (
-        out.merge(
-            sinergia[['number', 'timestamp']],
-            left_on='UC',
-            right_on='number',
-            how='left',
-        )
-        .rename(columns={'timestamp': 'BATE_CAIXA'})
-        .drop(columns=['number'])
-    )
 
-    # 2. Seccional
-    seccional = data['seccional'].copy()
+def seccional_lookup(seccional_df: pd.DataFrame) -> Lookup:
+    """Monta a base de consulta de seccional por MUNICIPIO (primeira linha)."""
+    seccional = seccional_df.copy(deep=False)
     if 'MUNICIPIO' not in seccional.columns:
         raise KeyError(
             "A tabela 'seccional' precisa ter a coluna 'MUNICIPIO'."
@@ -61,57 +59,112 @@ def enrich_with_new_bases(
             "A tabela 'seccional' precisa ter a coluna 'SECCCIONAL' (origem)."
         )
 
-    out = out.merge(
-        seccional[['MUNICIPIO', 'SECCCIONAL']],
-        on='MUNICIPIO',
-        how='left',
-    ).rename(columns={'SECCCIONAL': 'SECCIONAL'})
+    # PROCV: um município repetido não duplica as UCs da base
+    seccional = seccional.drop_duplicates('MUNICIPIO', keep='first')
+    return Lookup(
+        key='MUNICIPIO',
+        table=seccional,
+        columns={'SECCCIONAL': 'SECCIONAL'},
+    )
+
+
+def _repair_coordinate(values: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """Coordenada numérica, com a vírgula recolocada onde ela se perdeu.
 
-    # 3. Localização e Tipo Cliente
-    loc = data['localizacao'].copy()
+    Valores acima de 180 em módulo (ex.: -31712345) são divididos pela
+    menor potência de 10 que os traz para [-180, 180], calculada de uma vez
+    por `log10`. Devolve também a máscara das linhas corrigidas.
+    """
+    if not pd.api.types.is_numeric_dtype(values):
+        # Texto PT-BR: troca vírgula por ponto (regex=False para evitar warning)
+        values = values.astype(str).str.replace(',', '.', regex=False)
+    values = pd.to_numeric(values, errors='coerce').astype(float)
+
+    magnitude = values.abs().to_numpy()
+    over = magnitude > _COORD_LIMITE
+    shift = np.zeros(len(values))
+    shift[over] = np.ceil(np.log10(magnitude[over] / _COORD_LIMITE))
+    # Ajuste do arredondamento do log10 nas fronteiras (ex.: 1800)
+    shift[over & (magnitude / 10**shift > _COORD_LIMITE)] += 1
+    shift[
+        over & (shift > 0) & (magnitude / 10 ** (shift - 1) <= _COORD_LIMITE)
+    ] -= 1
+    return values / 10**shift, over
+
+
+def _outside_region(loc: pd.DataFrame) -> np.ndarray:
+    """Linhas com latitude ou longitude fora de `REGIAO_BBOX`."""
+    outside = np.zeros(len(loc), dtype=bool)
+    if REGIAO_BBOX is None:
+        return outside
+    for col, (low, high) in REGIAO_BBOX.items():
+        values = loc[col]
+        outside |= (values.notna() & ~values.between(low, high)).to_numpy()
+    return outside
+
+
+def localizacao_lookup(localizacao_df: pd.DataFrame) -> Lookup:
+    """Monta a base de consulta de localização e tipo de cliente por UC."""
+    loc = localizacao_df.copy(deep=False)
     for required in ('uc', 'classe_consumo', 'latitude', 'longitude'):
         if required not in loc.columns:
             raise KeyError(
                 f"A tabela 'localizacao' precisa ter a coluna '{required}'."
             )
 
-    # Garante que UC seja tratado como número para o merge
-    loc['uc'] = pd.to_numeric(loc['uc'], errors='coerce')
-    out['UC'] = pd.to_numeric(out['UC'], errors='coerce')
+    # UC canônica (Int64), igual à da base principal
+    loc['UC'] = uc_key(loc['uc'])
 
     # --- TRATAMENTO DE LAT/LONG PARA EXCEL ---
+    repaired = np.zeros(len(loc), dtype=bool)
     for col in ('latitude', 'longitude'):
-        # 1. Converte para string e troca vírgula por ponto (regex=False para evitar warning)
-        loc[col] = loc[col].astype(str).str.replace(',', '.', regex=False)
-        # 2. Converte para numérico
-        loc[col] = pd.to_numeric(loc[col], errors='coerce')
-        # 3. Ajusta valores muito grandes (sem ponto decimal). Divide por 10 até cair em intervalo [-180, 180].
-        mask = loc[col].abs() > 180
-        # Evita erro se não houver valores que satisfaçam a máscara
-        if mask.any():
-            # Enquanto houver valores fora do intervalo, divide por 10
-            while True:
-                sub = loc.loc[mask, col].abs()
-                if sub.empty or sub.max() <= 180:
-                    break
-                loc.loc[mask, col] = loc.loc[mask, col] / 10
-                mask = loc[col].abs() > 180
-
-    out = (
-        out.merge(
-            loc[['uc', 'classe_consumo', 'latitude', 'longitude']],
-            left_on='UC',
-            right_on='uc',
-            how='left',
-        )
-        .rename(
-            columns={
-                'classe_consumo': 'CLASSE_CONSUMO',
-                'latitude': 'LATITUDE',
-                'longitude': 'LONGITUDE',
-            }
+        loc[col], shifted = _repair_coordinate(loc[col])
+        repaired |= shifted
+    rejected = _outside_region(loc)
+    loc.loc[rejected, ['latitude', 'longitude']] = np.nan
+    if repaired.any() or rejected.any():
+        logging.info(
+            'Localização: %d coordenadas sem vírgula corrigidas, '
+            '%d fora da região descartadas.',
+            repaired.sum(),
+            rejected.sum(),
         )
-        .drop(columns=['uc'])
+
+    # PROCV: uma UC repetida não duplica a linha da base
+    loc = loc.drop_duplicates('UC', keep='first')
+    return Lookup(
+        key='UC',
+        table=loc,
+        columns={
+            'classe_consumo': 'CLASSE_CONSUMO',
+            'latitude': 'LATITUDE',
+            'longitude': 'LONGITUDE',
+        },
     )
 
-    return out
+
+def new_bases_lookups(data: Dict[str, pd.DataFrame]) -> List[Lookup]:
+    """Bases de consulta de Sinergia, Seccional e Localização."""
+    # Valida presença das bases esperadas
+    for key in ('sinergia', 'seccional', 'localizacao'):
+        if key not in data:
+            raise KeyError(f"A chave '{key}' precisa existir no dict data.")
+
+    return [
+        sinergia_lookup(data['sinergia']),
+        seccional_lookup(data['seccional']),
+        localizacao_lookup(data['localizacao']),
+    ]
+
+
+def enrich_with_new_bases(
+    df: pd.DataFrame, data: Dict[str, pd.DataFrame]
+) -> pd.DataFrame:
+    """Adiciona BATE_CAIXA, SECCIONAL, CLASSE_CONSUMO, LATITUDE e LONGITUDE ao DataFrame.
+
+    Cada base vira uma consulta sem duplicatas (PROCV), então o número de
+    linhas da base principal nunca muda. Se a base já traz CLASSE_CONSUMO
+    (do cadastro), a classe da localização só a substitui nas UCs que
+    constam da localização; as demais mantêm a do cadastro.
+    """
+    return enrich_with_lookups(df, new_bases_lookups(data))
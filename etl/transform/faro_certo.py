@@ -1,12 +1,23 @@
 """Módulo para processamento de dados do bot Telegram (Faro Certo)."""
 
 import logging
+import os
+import shutil
 import sqlite3
+from contextlib import closing
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
+from etl.extract.datas import ISO, parse_dates
+from etl.transform.chaves import (
+    MEDIDOR_KEY,
+    Lookup,
+    enrich_with_lookups,
+    latest_per_key,
+)
+
 
 def _find_col(cols: List[str], candidates: List[str]) -> Optional[str]:
     """Encontra coluna em cols que contenha qualquer candidato (case-insensitive)."""
@@ -18,103 +29,354 @@ def _find_col(cols: List[str], candidates: List[str]) -> Optional[str]:
     return None
 
 
-def enrich_with_faro_certo(
-    df_cadastro: pd.DataFrame, sqlite_path: str
-) -> pd.DataFrame:
-    """Enriquece o cadastro com a data da última consulta no bot Faro Certo."""
-    sqlite_file = Path(sqlite_path)
-    if not sqlite_file.exists():
-        logging.error('Arquivo SQLite não encontrado: %s', sqlite_path)
-        df_cadastro['FARO_CERTO'] = pd.NaT
-        return df_cadastro
+# Espaços removidos pelo str.strip() do Python: espaço, \t, \n e \r
+_WS = 'char(32, 9, 10, 13)'
+
+# Cópia local indexada e estado da leitura incremental do bot
+FARO_COPY_DIR = Path('cache') / 'faro_certo'
+
+# Filtros de rowid da leitura incremental: tudo até o fim atual (primeira
+# leitura, sem limite inferior: rowids 0 e negativos entram) e só o que
+# passou da marca d'água
+_ROWID_ATE = 'rowid <= ?'
+_ROWID_DELTA = 'rowid > ? AND rowid <= ?'
+
+# Leitura do bot via mmap (o arquivo é aberto só para leitura)
+_MMAP_BYTES = 256 * 1024 * 1024
+
+
+def _quote(name: str) -> str:
+    """Identificador SQLite entre aspas (nomes vêm do PRAGMA)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Colunas da tabela via PRAGMA table_info (sem ler nenhuma linha)."""
+    rows = conn.execute(f'PRAGMA table_info({_quote(table)})').fetchall()
+    return [row[1] for row in rows]
+
+
+def _last_dados_sql(
+    conn: sqlite3.Connection, table: str, rowids: Optional[str] = None
+) -> Optional[Tuple[str, str, str, Optional[str]]]:
+    """Monta a consulta da última interação 'dados' por medidor.
+
+    Com `rowids` (`_ROWID_ATE` ou `_ROWID_DELTA`) a consulta recebe os
+    parâmetros desse filtro e só olha as interações no intervalo.
+
+    Retorna (sql, expressão do medidor, expressão do timestamp, expressão do
+    comando ou None), ou None se a tabela não tem medidor/timestamp.
+    """
+    cols = _table_columns(conn, table)
+    medidor_col = _find_col(
+        cols, ['input', 'medidor', 'meter', 'text', 'message']
+    )
+    ts_col = _find_col(
+        cols, ['timestamp', 'created_at', 'created', 'time', 'ts', 'date']
+    )
+    cmd_col = _find_col(cols, ['command', 'cmd', 'action', 'type', 'event'])
 
+    if not medidor_col or not ts_col:
+        return None
+
+    # Mesma normalização do pandas: str -> strip -> upper
+    medidor = f'UPPER(TRIM(CAST({_quote(medidor_col)} AS TEXT), {_WS}))'
+    # julianday devolve NULL para timestamp inválido (equivale ao coerce)
+    ts = f'julianday({_quote(ts_col)})'
+    cmd = (
+        f'LOWER(TRIM(CAST({_quote(cmd_col)} AS TEXT), {_WS}))'
+        if cmd_col
+        else None
+    )
+
+    where = [f'{medidor} IS NOT NULL', f'{ts} IS NOT NULL']
+    if cmd:
+        where.insert(0, f"{cmd} = 'dados'")
+    if rowids:
+        where.insert(0, rowids)
+
+    # Com MAX() o SQLite devolve as colunas "soltas" da linha do máximo
+    sql = (
+        f'SELECT {medidor} AS MEDIDOR_JOIN, '
+        f'date({ts}) AS FARO_CERTO, MAX({ts}) AS TS '
+        f'FROM {_quote(table)} WHERE {" AND ".join(where)} '
+        f'GROUP BY {medidor}'
+    )
+    return sql, medidor, ts, cmd
+
+
+def _find_table(conn: sqlite3.Connection) -> str:
+    # Verifica se a tabela 'interactions' existe, senão tenta 'bot_interactions'
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='interactions'"
+    )
+    return 'interactions' if cursor.fetchone() else 'bot_interactions'
+
+
+def indexed_copy(sqlite_path: str, copy_dir: Path = FARO_COPY_DIR) -> Path:
+    """Cópia local do bot com um índice para a consulta do Faro Certo.
+
+    O arquivo original nunca é alterado. A cópia só é refeita quando o
+    tamanho ou a data de modificação do original mudam.
+    """
+    src = Path(sqlite_path)
+    dst = copy_dir / src.name
+    src_stat = src.stat()
+    if dst.exists():
+        dst_stat = dst.stat()
+        if (dst_stat.st_size, dst_stat.st_mtime_ns) == (
+            src_stat.st_size,
+            src_stat.st_mtime_ns,
+        ):
+            return dst
+
+    copy_dir.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_suffix(dst.suffix + '.tmp')
+    shutil.copyfile(src, tmp)
+
+    with closing(sqlite3.connect(tmp)) as conn:
+        table = _find_table(conn)
+        query = _last_dados_sql(conn, table)
+        if query is not None:
+            _, medidor, ts, cmd = query
+            # Índice parcial nas mesmas expressões da consulta: o GROUP BY
+            # percorre o índice e o filtro 'dados' já está embutido nele
+            partial = f" WHERE {cmd} = 'dados'" if cmd else ''
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS ix_faro_certo_dados '
+                f'ON {_quote(table)} ({medidor}, {ts}){partial}'
+            )
+            conn.commit()
+
+    tmp.replace(dst)
+    # A cópia carrega a data do original para detectar quando refazê-la
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    logging.info('Cópia indexada do Faro Certo criada: %s', dst)
+    return dst
+
+
+def _connect_ro(path: Path, immutable: bool = True) -> sqlite3.Connection:
+    """Abre o SQLite só para leitura, com I/O mapeado em memória.
+
+    O arquivo em input/ é uma cópia do bot: com `immutable` o SQLite não
+    faz controle de travas nem confere o journal.
+    """
+    uri = f'{path.resolve().as_uri()}?mode=ro'
+    if immutable:
+        uri += '&immutable=1'
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute(f'PRAGMA mmap_size = {_MMAP_BYTES}')
+    return conn
+
+
+def _state_file(sqlite_file: Path, state_dir: Path) -> Path:
+    return state_dir / f'{sqlite_file.stem}.state.pkl'
+
+
+def _load_state(state_file: Path) -> Optional[Dict[str, object]]:
+    if not state_file.exists():
+        return None
     try:
-        with sqlite3.connect(sqlite_path) as conn:
-            with sqlite3.connect(sqlite_path) as conn:
-                # Verifica se a tabela 'interactions' existe, senão tenta 'bot_interactions'
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name='interactions'"
-                )
-                table_to_read = (
-                    'interactions' if cursor.fetchone() else 'bot_interactions'
-                )
+        return pd.read_pickle(state_file)
+    except Exception as exc:
+        logging.warning('Estado do Faro Certo ilegível (%s), relendo.', exc)
+        return None
+
+
+def _store_state(state_file: Path, state: Dict[str, object]) -> None:
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = state_file.with_suffix('.tmp')
+    pd.to_pickle(state, tmp)
+    tmp.replace(state_file)
 
-                df_bot = pd.read_sql_query(
-                    f'SELECT * FROM {table_to_read}', conn
-                )
 
-        if df_bot.empty:
-            df_cadastro['FARO_CERTO'] = pd.NaT
-            return df_cadastro
+def _prefix_check(
+    conn: sqlite3.Connection, table: str, watermark: int
+) -> Tuple[object, ...]:
+    """Resume as linhas até a marca d'água (contagem, maior rowid, linha).
 
-        cols = list(df_bot.columns)
-        medidor_col = _find_col(
-            cols, ['input', 'medidor', 'meter', 'text', 'message']
+    Usa só o índice de rowid (sem julianday nem agrupamento). Um banco
+    trocado por outro ou a linha da marca alterada mudam o resumo.
+    """
+    count, max_rowid = conn.execute(
+        f'SELECT COUNT(*), MAX(rowid) FROM {_quote(table)} WHERE rowid <= ?',
+        (watermark,),
+    ).fetchone()
+    edge = conn.execute(
+        f'SELECT * FROM {_quote(table)} WHERE rowid = ?', (watermark,)
+    ).fetchone()
+    return count, max_rowid, edge
+
+
+def _read_incremental(
+    conn: sqlite3.Connection, table: str, state_file: Path
+) -> Optional[pd.DataFrame]:
+    """Atualiza a tabela "última consulta por medidor" com o que é novo.
+
+    O estado guarda a consulta usada, a marca d'água (último rowid lido), o
+    resumo das linhas até ela (`_prefix_check`) e a tabela por medidor (com
+    o timestamp da interação). Se o resumo bate, só as interações com
+    rowid acima da marca são lidas e juntadas à tabela; senão (banco
+    trocado, linhas apagadas ou a linha da marca alterada) a tabela é
+    refeita do zero. Alterações no meio do histórico que não mudam a
+    contagem não são detectadas: o bot só acrescenta interações, e para
+    forçar a releitura basta apagar `cache/faro_certo/`.
+    """
+    query = _last_dados_sql(conn, table)
+    if query is None:
+        return None
+    key_sql = query[0]
+
+    try:
+        max_rowid = conn.execute(
+            f'SELECT MAX(rowid) FROM {_quote(table)}'
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        # Tabela WITHOUT ROWID: não há marca d'água possível
+        logging.info('Faro Certo sem rowid, lendo o histórico completo.')
+        return pd.read_sql_query(key_sql, conn)
+    if max_rowid is None:
+        # Tabela vazia: nada a ler nem a guardar
+        return pd.read_sql_query(key_sql, conn)
+
+    state = _load_state(state_file) or {}
+    watermark = state.get('rowid')
+    valid = (
+        state.get('sql') == key_sql
+        and watermark is not None
+        and watermark <= max_rowid
+        and state.get('check') == _prefix_check(conn, table, watermark)
+    )
+
+    if valid and watermark == max_rowid:
+        logging.info('Faro Certo: nenhuma interação nova.')
+        return state['last']
+
+    if valid:
+        new = pd.read_sql_query(
+            _last_dados_sql(conn, table, _ROWID_DELTA)[0],
+            conn,
+            params=(watermark, max_rowid),
         )
-        ts_col = _find_col(
-            cols, ['timestamp', 'created_at', 'created', 'time', 'ts', 'date']
+        logging.info(
+            'Faro Certo: interações novas até o rowid %d, '
+            '%d medidores atualizados.',
+            max_rowid,
+            len(new),
         )
-        cmd_col = _find_col(
-            cols, ['command', 'cmd', 'action', 'type', 'event']
+        # Empate no TS: vale a interação nova (última linha)
+        last = latest_per_key(
+            pd.concat([state['last'], new], ignore_index=True),
+            'MEDIDOR_JOIN',
+            'TS',
+        ).reset_index(drop=True)
+    else:
+        if state:
+            logging.info('Estado do Faro Certo não confere, refazendo.')
+        last = pd.read_sql_query(
+            _last_dados_sql(conn, table, _ROWID_ATE)[0],
+            conn,
+            params=(max_rowid,),
         )
 
-        if not medidor_col or not ts_col:
-            df_cadastro['FARO_CERTO'] = pd.NaT
-            return df_cadastro
+    _store_state(
+        state_file,
+        {
+            'sql': key_sql,
+            'rowid': max_rowid,
+            'check': _prefix_check(conn, table, max_rowid),
+            'last': last,
+        },
+    )
+    return last
 
-        # Filtra apenas comando 'dados'
-        if cmd_col:
-            df_bot = df_bot[
-                df_bot[cmd_col].astype(str).str.strip().str.lower() == 'dados'
-            ].copy()
 
-        # Converte timestamp para datetime (formato ISO, sem dayfirst)
-        df_bot['TS_PARSED'] = pd.to_datetime(df_bot[ts_col], errors='coerce')
+def read_faro_certo(
+    sqlite_path: str,
+    use_index: bool = False,
+    incremental: bool = False,
+    state_dir: Path = FARO_COPY_DIR,
+) -> Optional[pd.DataFrame]:
+    """Lê o bot e devolve a última consulta 'dados' por medidor.
 
-        # Remove linhas com timestamp inválido
-        df_bot = df_bot[df_bot['TS_PARSED'].notna()].copy()
+    Filtro, normalização do medidor e agregação rodam no SQLite: só uma
+    linha por medidor chega ao pandas. Com `use_index` a consulta roda numa
+    cópia local indexada (ver `indexed_copy`). Com `incremental` só as
+    interações novas desde a última execução são lidas e juntadas à tabela
+    guardada em `state_dir`.
 
-        # Extrai dia, mês e ano
-        df_bot['DIA'] = df_bot['TS_PARSED'].dt.day.astype(str).str.zfill(2)
-        df_bot['MES'] = df_bot['TS_PARSED'].dt.month.astype(str).str.zfill(2)
-        df_bot['ANO'] = df_bot['TS_PARSED'].dt.year.astype(str)
+    Retorna um DataFrame com MEDIDOR_JOIN e FARO_CERTO (datetime64), ou None
+    quando o arquivo não existe, está vazio ou não pôde ser lido.
+    """
+    sqlite_file = Path(sqlite_path)
+    if not sqlite_file.exists():
+        logging.error('Arquivo SQLite não encontrado: %s', sqlite_path)
+        return None
 
-        # Monta a data no formato dd/mm/yyyy
-        df_bot['FARO_CERTO'] = (
-            df_bot['DIA'] + '/' + df_bot['MES'] + '/' + df_bot['ANO']
-        )
+    try:
+        if use_index:
+            sqlite_file = indexed_copy(sqlite_path)
 
-        # Pega a última interação por medidor, usando a data original para ordenar
-        df_bot['MEDIDOR_BOT'] = (
-            df_bot[medidor_col].astype(str).str.strip().str.upper()
-        )
-        df_last = (
-            df_bot.sort_values('TS_PARSED')
-            .groupby('MEDIDOR_BOT')
-            .last()
-            .reset_index()
-        )
+        with closing(_connect_ro(sqlite_file)) as conn:
+            table = _find_table(conn)
+            if incremental:
+                df_last = _read_incremental(
+                    conn, table, _state_file(Path(sqlite_path), state_dir)
+                )
+            else:
+                query = _last_dados_sql(conn, table)
+                df_last = pd.read_sql_query(query[0], conn) if query else None
 
-        # Mantém só as colunas necessárias
-        df_last = df_last[['MEDIDOR_BOT', 'FARO_CERTO']]
-        df_last.columns = ['MEDIDOR_JOIN', 'FARO_CERTO']
+        if df_last is None or df_last.empty:
+            return None
 
-        # Merge com cadastro
-        df_cadastro['MEDIDOR_CLEAN'] = (
-            df_cadastro['MEDIDOR'].astype(str).str.strip().str.upper()
+        # Mantém só as colunas necessárias; o SQLite devolve aaaa-mm-dd
+        return df_last[['MEDIDOR_JOIN', 'FARO_CERTO']].assign(
+            FARO_CERTO=parse_dates(df_last['FARO_CERTO'], ISO)
         )
-        out = pd.merge(
-            df_cadastro,
-            df_last,
-            left_on='MEDIDOR_CLEAN',
-            right_on='MEDIDOR_JOIN',
-            how='left',
+
+    except Exception as exc:
+        logging.error('Erro Faro Certo: %s', exc)
+        return None
+
+
+def faro_certo_lookup(df_last: Optional[pd.DataFrame]) -> Lookup:
+    """Monta a base de consulta do Faro Certo pela chave canônica do medidor.
+
+    Sem leitura do bot (`df_last` None), FARO_CERTO fica vazio para todos.
+    """
+    if df_last is None:
+        df_last = pd.DataFrame(
+            {
+                'MEDIDOR_JOIN': pd.Series(dtype='str'),
+                'FARO_CERTO': pd.Series(dtype='datetime64[ns]'),
+            }
         )
+    return Lookup(
+        key=MEDIDOR_KEY,
+        table=df_last.rename(columns={'MEDIDOR_JOIN': MEDIDOR_KEY}),
+        columns={'FARO_CERTO': 'FARO_CERTO'},
+    )
+
 
-        return out.drop(columns=['MEDIDOR_JOIN', 'MEDIDOR_CLEAN'])
+def merge_faro_certo(
+    df_cadastro: pd.DataFrame, df_last: Optional[pd.DataFrame]
+) -> pd.DataFrame:
+    """Junta ao cadastro a última consulta por medidor lida do bot."""
+    if df_last is None:
+        return df_cadastro.assign(FARO_CERTO=pd.NaT)
+
+    try:
+        # Busca posicional pela chave canônica do medidor
+        return enrich_with_lookups(df_cadastro, [faro_certo_lookup(df_last)])
 
     except Exception as exc:
         logging.error('Erro Faro Certo: %s', exc)
-        df_cadastro['FARO_CERTO'] = pd.NaT
-        return df_cadastro
+        return df_cadastro.assign(FARO_CERTO=pd.NaT)
+
+
+def enrich_with_faro_certo(
+    df_cadastro: pd.DataFrame, sqlite_path: str
+) -> pd.DataFrame:
+    """Enriquece o cadastro com a data da última consulta no bot Faro Certo."""
+    return merge_faro_certo(df_cadastro, read_faro_certo(sqlite_path))
@@ -0,0 +1,211 @@
+"""Base local das features por UC, refeita só a partir das fontes que mudaram.
+
+Cada base de consulta (medidores, inspeções, ocorrências, prospecção,
+Sinergia, seccional, localização, apontamento) já reduzida a uma linha por
+chave fica guardada em `cache/features/`, junto das impressões digitais dos
+arquivos de input/ de que ela depende. Numa nova execução as bases cujos
+arquivos não mudaram são lidas direto daqui, e esses arquivos nem chegam a
+ser carregados; só as fontes alteradas são lidas e reduzidas de novo. O
+Faro Certo fica de fora: guarda o último rowid lido do bot e só consulta as
+interações novas (ver `faro_certo`).
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import pandas as pd
+
+from etl.extract.cache import Fingerprint, fingerprint
+from etl.extract.schemas import SCHEMAS
+from etl.transform.chaves import Lookup
+
+FEATURE_STORE_DIR = Path('cache') / 'features'
+
+
+@dataclass(frozen=True)
+class FeatureSource:
+    """Uma base de consulta e os arquivos de input/ de que ela depende.
+
+    - name: nome do registro na base de features.
+    - inputs: chaves dos arquivos (as mesmas de `load_all_files`).
+    - build: monta a base de consulta a partir dos dados extraídos.
+    """
+
+    name: str
+    inputs: Tuple[str, ...]
+    build: Callable[[Mapping[str, object]], Optional[Lookup]]
+
+
+@dataclass(frozen=True)
+class StoredFeature:
+    """Registro gravado: a base de consulta pronta e a versão das entradas."""
+
+    fingerprints: Mapping[str, Fingerprint]
+    tag: str
+    lookup: Optional[Lookup]
+
+
+def _feature_file(name: str, store_dir: Path) -> Path:
+    return store_dir / f'{name}.pkl'
+
+
+def _source_tag(source: FeatureSource, tag: str) -> str:
+    # O contrato das fontes entra na chave, como no cache de extração
+    return repr((tag, [SCHEMAS.get(key) for key in source.inputs]))
+
+
+def load_feature(
+    source: FeatureSource,
+    paths: Mapping[str, Path],
+    tag: str = '',
+    store_dir: Path = FEATURE_STORE_DIR,
+) -> Tuple[Optional[StoredFeature], Dict[str, Fingerprint]]:
+    """Busca a base de `source` na base de features.
+
+    Retorna (registro, impressões digitais atuais). O registro é None
+    quando não existe, está ilegível ou algum arquivo de entrada mudou.
+    Arquivos inalterados (mesmo tamanho e mtime) não são relidos para o
+    hash.
+    """
+    feature_file = _feature_file(source.name, store_dir)
+    stored: Optional[StoredFeature] = None
+    if feature_file.exists():
+        try:
+            stored = pd.read_pickle(feature_file)
+        except Exception as exc:
+            logging.warning(
+                'Features de %s ilegíveis (%s), refazendo.', source.name, exc
+            )
+
+    previous = stored.fingerprints if stored is not None else {}
+    current: Dict[str, Fingerprint] = {}
+    for key in source.inputs:
+        try:
+            current[key] = fingerprint(paths[key], previous.get(key))
+        except (KeyError, OSError):
+            # Arquivo ausente: a extração acusa o erro
+            return None, {}
+
+    if (
+        stored is None
+        or dict(stored.fingerprints) != current
+        or stored.tag != _source_tag(source, tag)
+    ):
+        return None, current
+    return stored, current
+
+
+def store_feature(
+    source: FeatureSource,
+    fingerprints: Mapping[str, Fingerprint],
+    lookup: Optional[Lookup],
+    tag: str = '',
+    store_dir: Path = FEATURE_STORE_DIR,
+) -> None:
+    """Grava a base de `source` para as versões `fingerprints` das entradas."""
+    store_dir.mkdir(parents=True, exist_ok=True)
+    feature_file = _feature_file(source.name, store_dir)
+    tmp = feature_file.with_suffix('.tmp')
+    pd.to_pickle(
+        StoredFeature(
+            fingerprints=dict(fingerprints),
+            tag=_source_tag(source, tag),
+            lookup=lookup,
+        ),
+        tmp,
+    )
+    tmp.replace(feature_file)
+
+
+class FeatureStore:
+    """Bases de consulta por fonte, reaproveitadas entre execuções.
+
+    Consultada antes da extração: `skip()` diz quais arquivos não precisam
+    ser carregados e `lookups()` devolve as bases, refazendo (e gravando)
+    só as das fontes que mudaram.
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[FeatureSource],
+        paths: Mapping[str, Path],
+        tag: str = '',
+        store_dir: Path = FEATURE_STORE_DIR,
+    ) -> None:
+        """Confere cada fonte contra a base de features em `store_dir`.
+
+        - sources: bases de consulta, na ordem em que `lookups()` as devolve.
+        - paths: caminho de cada arquivo de entrada (chave de `inputs`).
+        - tag: versão da preparação (ex.: a projeção de colunas); mudou,
+          as bases guardadas são refeitas.
+        """
+        self.sources = list(sources)
+        self.tag = tag
+        self.store_dir = store_dir
+        self._stored: Dict[str, StoredFeature] = {}
+        self._fingerprints: Dict[str, Dict[str, Fingerprint]] = {}
+        for source in self.sources:
+            stored, current = load_feature(source, paths, tag, store_dir)
+            self._fingerprints[source.name] = current
+            if stored is not None:
+                self._stored[source.name] = stored
+
+    @property
+    def stale(self) -> List[str]:
+        """Fontes que serão lidas e reduzidas de novo."""
+        return [s.name for s in self.sources if s.name not in self._stored]
+
+    def skip(self) -> Set[str]:
+        """Arquivos usados só por bases que vêm da base de features."""
+        fresh = {
+            key
+            for source in self.sources
+            if source.name in self._stored
+            for key in source.inputs
+        }
+        needed = {
+            key
+            for source in self.sources
+            if source.name not in self._stored
+            for key in source.inputs
+        }
+        return fresh - needed
+
+    def lookups(
+        self,
+        data: Mapping[str, object],
+        prepare: Callable[[Optional[Lookup]], Optional[Lookup]],
+    ) -> List[Optional[Lookup]]:
+        """Bases de consulta na ordem das fontes.
+
+        As fontes alteradas passam por `build` e `prepare` (projeção e
+        dtypes) e o resultado é gravado; as demais saem da base de features
+        já preparadas.
+        """
+        out: List[Optional[Lookup]] = []
+        for source in self.sources:
+            stored = self._stored.get(source.name)
+            if stored is not None:
+                out.append(stored.lookup)
+                continue
+            lookup = prepare(source.build(data))
+            fingerprints = self._fingerprints[source.name]
+            if len(fingerprints) == len(source.inputs):
+                store_feature(
+                    source, fingerprints, lookup, self.tag, self.store_dir
+                )
+            out.append(lookup)
+        return out
@@ -5,17 +5,23 @@ from typing import Dict
 
 import pandas as pd
 
+from etl.extract.schemas import SCHEMAS
+from etl.transform.chaves import (
+    Lookup,
+    enrich_with_lookups,
+    latest_per_key,
+    uc_key,
+)
 
-def enrich_with_inspections(
-    base_df: pd.DataFrame, inspections_df: pd.DataFrame
-) -> pd.DataFrame:
-    """Enriquecer a base com data de fiscalização e código de inspeção.
+
+def inspections_lookup(inspections_df: pd.DataFrame) -> Lookup:
+    """Monta a base de consulta de inspeções: a última por UC.
 
     Regras:
     - Mantém apenas a última inspeção por UC (mais recente por DATA_EXECUCAO).
     - Retorna a coluna FISCALIZACAO (datetime) e COD (Int64) no resultado.
     """
-    inspections = inspections_df.copy()
+    inspections = inspections_df.copy(deep=False)
 
     # Valida colunas esperadas
     if 'UC / MD' not in inspections.columns:
@@ -32,30 +38,33 @@ def enrich_with_inspections(
         columns={'UC / MD': 'UC', 'DATA_EXECUCAO': 'FISCALIZACAO'}
     )
 
-    # Parse seguro da data (coerce para NaT em valores inválidos)
-    inspections['FISCALIZACAO'] = pd.to_datetime(
-        inspections['FISCALIZACAO'], errors='coerce'
-    )
-
-    # Ordena e mantém apenas a última ocorrência por UC
-    inspections = inspections.sort_values('FISCALIZACAO').drop_duplicates(
-        'UC', keep='last'
+    # Formato do contrato da fonte (NaT em valores inválidos); já vem
+    # convertida da extração e aqui só é convertida quando chega como texto
+    inspections['FISCALIZACAO'] = (
+        SCHEMAS['inspecoes']
+        .dates['DATA_EXECUCAO']
+        .parse(inspections['FISCALIZACAO'])
     )
 
-    # Normaliza tipos: UC e COD numéricos (UC como Int64 para permitir NA)
-    inspections['UC'] = pd.to_numeric(
-        inspections['UC'], errors='coerce'
-    ).astype('Int64')
+    # UC canônica (Int64) e COD numérico
+    inspections['UC'] = uc_key(inspections['UC'])
     inspections['COD'] = pd.to_numeric(
         inspections['COD'], errors='coerce'
     ).astype('Int64')
 
-    # Merge com validação m:1 (muitos da base -> 1 inspeção)
-    df = base_df.merge(
-        inspections[['UC', 'FISCALIZACAO', 'COD']],
-        on='UC',
-        how='left',
-        validate='m:1',
+    # Mantém apenas a última inspeção por UC (sem ordenar o histórico)
+    inspections = latest_per_key(inspections, 'UC', 'FISCALIZACAO')
+
+    # m:1 (muitos da base -> 1 inspeção)
+    return Lookup(
+        key='UC',
+        table=inspections,
+        columns={'FISCALIZACAO': 'FISCALIZACAO', 'COD': 'COD'},
     )
 
-    return df
+
+def enrich_with_inspections(
+    base_df: pd.DataFrame, inspections_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Enriquecer a base com data de fiscalização e código de inspeção."""
+    return enrich_with_lookups(base_df, [inspections_lookup(inspections_df)])
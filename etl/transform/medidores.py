@@ -3,15 +3,20 @@ from __future__ import annotations
 
 import pandas as pd
 
+from etl.transform.chaves import (
+    MEDIDOR_KEY,
+    Lookup,
+    enrich_with_lookups,
+    medidor_key,
+)
 
-def enrich_with_medidores(
-    base_df: pd.DataFrame, medidores_df: pd.DataFrame
-) -> pd.DataFrame:
-    """Enriquecer a base com ANO e FABRICANTE a partir do MEDIDOR.
+
+def medidores_lookup(medidores_df: pd.DataFrame) -> Lookup:
+    """Monta a base de consulta de medidores (ANO e FABRICANTE) por medidor.
 
     Mantém a lógica de comparação por string (case-insensitive e sem espaços).
     """
-    medidores = medidores_df.copy()
+    medidores = medidores_df.copy(deep=False)
 
     # Validação da coluna de origem
     if 'medidor' not in medidores.columns:
@@ -20,9 +25,7 @@ def enrich_with_medidores(
         )
 
     # Converter MEDIDOR pra string e normalizar
-    medidores['MEDIDOR_JOIN'] = (
-        medidores['medidor'].astype(str).str.strip().str.upper()
-    )
+    medidores[MEDIDOR_KEY] = medidor_key(medidores['medidor'])
 
     # Garantir que ANO é numérico (Int64 permite NA)
     medidores['ANO'] = pd.to_numeric(medidores['ANO'], errors='coerce').astype(
@@ -36,23 +39,17 @@ def enrich_with_medidores(
         )
 
     # Garantir 1 linha por medidor (PROCV)
-    medidores = medidores.drop_duplicates(
-        subset=['MEDIDOR_JOIN'], keep='first'
-    )
+    medidores = medidores.drop_duplicates(subset=[MEDIDOR_KEY], keep='first')
 
-    # Preparar a base principal para o merge
-    base_df_copy = base_df.copy()
-    base_df_copy['MEDIDOR_JOIN'] = (
-        base_df_copy['MEDIDOR'].astype(str).str.strip().str.upper()
+    return Lookup(
+        key=MEDIDOR_KEY,
+        table=medidores,
+        columns={'ANO': 'ANO', 'FABRICANTE': 'FABRICANTE'},
     )
 
-    # Merge
-    df = base_df_copy.merge(
-        medidores[['MEDIDOR_JOIN', 'ANO', 'FABRICANTE']],
-        on='MEDIDOR_JOIN',
-        how='left',
-        validate='m:1',
-    )
 
-    # Remove a coluna auxiliar de join
-    return df.drop(columns=['MEDIDOR_JOIN'])
+def enrich_with_medidores(
+    base_df: pd.DataFrame, medidores_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Enriquecer a base com ANO e FABRICANTE a partir do MEDIDOR."""
+    return enrich_with_lookups(base_df, [medidores_lookup(medidores_df)])
@@ -1,53 +1,56 @@
 """Módulo para enriquecimento de dados de ocorrências."""
 import pandas as pd
 
+from etl.extract.schemas import SCHEMAS
+from etl.transform.chaves import (
+    Lookup,
+    enrich_with_lookups,
+    latest_per_key,
+    uc_key,
+)
 
-def enrich_with_occurrences(
-    base_df: pd.DataFrame, occurrences_df: pd.DataFrame
-) -> pd.DataFrame:
-    """Enriquecer a base com data de ocorrência e flag de NRT."""
+
+def occurrences_lookup(occurrences_df: pd.DataFrame) -> Lookup:
+    """Monta a base de consulta de ocorrências (reclamação e flag de NRT)."""
     # 1. Limpeza da base de ocorrências
-    occ = occurrences_df.copy()
+    occ = occurrences_df.copy(deep=False)
 
     # Renomeia se os nomes originais forem diferentes
     occ = occ.rename(
         columns={'CR_NUMERO': 'UC', 'DT_OCO_INCLUSAO': 'NOTA DE RECLAMACAO'}
     )
 
-    # Garante que UC seja string limpa (sem .0 e sem espaços)
-    occ['UC'] = (
-        occ['UC'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-    )
-
-    # Remove duplicadas (PROCV: pega a primeira ocorrência)
-    occ = occ.drop_duplicates(subset=['UC'], keep='first')
+    # UC canônica (Int64), igual à da base principal
+    occ['UC'] = uc_key(occ['UC'])
 
-    # 2. Limpeza da base principal
-    df = base_df.copy()
-    df['UC'] = (
-        df['UC'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    # 2. Tratamento da Data e Flag
+    # Formato do contrato da fonte: 30/01/2026 primeiro, depois 2026-01-30
+    occ['NOTA DE RECLAMACAO'] = (
+        SCHEMAS['ocorrencias']
+        .dates['DT_OCO_INCLUSAO']
+        .parse(occ['NOTA DE RECLAMACAO'])
     )
 
-    # 3. O MERGE (O PROCV propriamente dito)
-    df = df.merge(occ[['UC', 'NOTA DE RECLAMACAO']], on='UC', how='left')
-
-    # 4. Tratamento da Data e Flag
-    # O pandas é inteligente: se vier 2026-01-30 ou 30/01/2026, o dayfirst=True ajuda
-    df['NOTA DE RECLAMACAO'] = pd.to_datetime(
-        df['NOTA DE RECLAMACAO'], errors='coerce', dayfirst=True
-    )
+    # Uma linha por UC (PROCV): a reclamação mais recente
+    occ = latest_per_key(occ, 'UC', 'NOTA DE RECLAMACAO')
 
     # Cria a flag HAS_NRT (Se tem data, tem reclamação)
-    df['HAS_NRT'] = df['NOTA DE RECLAMACAO'].notna()
-
-    # --- Compatibilidade com os testes: cria coluna underscore como string 'dd/mm/YYYY' ---
-    # Mantemos a coluna datetime original ("NOTA DE RECLAMACAO") e criamos a versão formatada.
-    formatted = df['NOTA DE RECLAMACAO'].dt.strftime('%d/%m/%Y')
-    # Garante que valores NaT virem NaN/pd.NA na coluna string
-    formatted.loc[df['NOTA DE RECLAMACAO'].isna()] = pd.NA
-    df['NOTA_DE_RECLAMACAO'] = formatted
+    occ['HAS_NRT'] = occ['NOTA DE RECLAMACAO'].notna()
+
+    return Lookup(
+        key='UC',
+        table=occ,
+        columns={
+            'NOTA DE RECLAMACAO': 'NOTA DE RECLAMACAO',
+            'HAS_NRT': 'HAS_NRT',
+        },
+        # UC sem ocorrência não tem reclamação
+        fill={'HAS_NRT': False},
+    )
 
-    # Volta a UC para numérico no final para manter o padrão da base
-    df['UC'] = pd.to_numeric(df['UC'], errors='coerce').astype('Int64')
 
-    return df
+def enrich_with_occurrences(
+    base_df: pd.DataFrame, occurrences_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Enriquecer a base com data de ocorrência e flag de NRT."""
+    return enrich_with_lookups(base_df, [occurrences_lookup(occurrences_df)])
@@ -2,57 +2,78 @@
 
 from __future__ import annotations
 
-import re
-import unicodedata
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 import numpy as np
 import pandas as pd
 
-_MONTH_RE = re.compile(r"^'?(\d{2})/(\d{4})'?$")
+from etl.extract.datas import DIA_PRIMEIRO, ISO, DateSpec, parse_dates
+from etl.extract.schemas import SCHEMAS
+from etl.transform.categorias import normalized
+from etl.transform.colacao import collation_keys
+from etl.transform.consumo import ConsumptionMatrix, reference_date
 
+# Formato de cada coluna de data lida pelas regras. No pipeline todas já
+# chegam como datetime64 e não são convertidas de novo; os formatos só valem
+# para bases montadas à mão (texto).
+_DATAS: Dict[str, DateSpec] = {
+    **SCHEMAS['cadastro_consumo'].dates,
+    'FISCALIZACAO': ISO,
+    'BATE_CAIXA': ISO,
+    'FARO_CERTO': ISO,
+    'DATA_PROSPECTOR': DIA_PRIMEIRO,
+    'NOTA DE RECLAMACAO': DIA_PRIMEIRO,
+}
 
-def _get_consumption_month_cols(df: pd.DataFrame) -> List[str]:
-    """Retorna colunas de consumo no formato MM/YYYY."""
-    return [c for c in df.columns if _MONTH_RE.match(str(c).strip())]
 
+def _dates(out: pd.DataFrame, col: str) -> pd.Series:
+    """Coluna de data de `out` como datetime64 (toda NaT se não existir)."""
+    if col not in out.columns:
+        return pd.Series(pd.NaT, index=out.index, dtype='datetime64[us]')
+    return parse_dates(out[col], _DATAS[col])
 
-def _month_key(col: str) -> Tuple[int, int]:
-    """Chave de ordenação (ano, mes) a partir de 'MM/YYYY'."""
-    m = _MONTH_RE.match(str(col).strip())
-    if not m:
-        return (0, 0)
-    mm = int(m.group(1))
-    yyyy = int(m.group(2))
-    return (yyyy, mm)
 
+def _get_reference_date(df: pd.DataFrame) -> datetime:
+    """Retorna a data de referência (último mês disponível)."""
+    return reference_date(df) or datetime.now()
 
-def _normalize_month_col_name(col: str) -> str:
-    """Remove aspas simples do nome, se tiver."""
-    m = _MONTH_RE.match(str(col).strip())
-    if not m:
-        return str(col)
-    return f'{m.group(1)}/{m.group(2)}'
 
+def _days(dates: pd.Series) -> np.ndarray:
+    """Datas como dias desde 1970 (int64); NaT vira _SEM_ESFORCO."""
+    return (
+        pd.to_datetime(dates, errors='coerce')
+        .to_numpy()
+        .astype('datetime64[D]')
+        .view(np.int64)
+    )
 
-def _get_reference_date(df: pd.DataFrame) -> datetime:
-    """Retorna a data de referência (último mês disponível)."""
-    month_cols = _get_consumption_month_cols(df)
-    if not month_cols:
-        return datetime.now()
 
-    latest = max(month_cols, key=_month_key)
-    year, month = _month_key(latest)
-    return datetime(year, month, 1)
+def _day(date: datetime) -> int:
+    """Uma data como dias desde 1970."""
+    return int(np.datetime64(date, 'D').astype(np.int64))
 
 
-def _fiscalizacao_recente(
-    fisc_date: pd.Series, ref_date: datetime, months: int
-) -> pd.Series:
-    """Verifica se houve fiscalização nos últimos N meses."""
-    cutoff = ref_date - timedelta(days=months * 30)
-    return fisc_date.notna() & (fisc_date >= cutoff)
+def _esforco_recente(
+    ultimo: np.ndarray, ref_date: datetime, months: int
+) -> np.ndarray:
+    """Verifica se houve esforço nos últimos N meses."""
+    return ultimo >= _day(ref_date - timedelta(days=months * 30))
+
+
+def _mask(values: pd.Series) -> np.ndarray:
+    """Série booleana como array numpy; nulo conta como False."""
+    return values.to_numpy(dtype=bool, na_value=False)
 
 
 def _has_fraude_historica(codigo: pd.Series) -> pd.Series:
@@ -60,472 +81,685 @@ def _has_fraude_historica(codigo: pd.Series) -> pd.Series:
     return codigo.notna() & (codigo.astype(str).str.strip().str[0] == '1')
 
 
-def _strip_accents_series(s: pd.Series) -> pd.Series:
-    """Remove acentos e normaliza caixa de uma Series de strings."""
-    s = s.fillna('').astype(str)
+def _prospec_conclusao(out: pd.DataFrame) -> pd.Series:
+    """CONCLUSAO_PROSPECTOR sem acentos e em caixa alta (categórica)."""
+    return collation_keys(
+        out.get('CONCLUSAO_PROSPECTOR', pd.Series('', index=out.index))
+    )
 
-    def _normalize_text(x: str) -> str:
-        x = unicodedata.normalize('NFKD', x)
-        x = x.encode('ASCII', 'ignore').decode('ASCII')
-        return x.upper().strip()
 
-    return s.apply(_normalize_text)
+def _effort_dates(
+    out: pd.DataFrame, prospec_concl: pd.Series
+) -> List[pd.Series]:
+    """Datas de esforço: fiscalização, bate caixa, Faro Certo e prospecção.
 
+    A prospecção só conta como esforço quando a conclusão é "SEM INDÍCIO".
+    """
+    fisc_date = _dates(out, 'FISCALIZACAO')
+    bate_caixa = _dates(out, 'BATE_CAIXA')
+    faro_certo = _dates(out, 'FARO_CERTO')
+    prospec_date = _dates(out, 'DATA_PROSPECTOR')
+    prospec_effort_date = prospec_date.where(
+        prospec_concl == 'SEM INDICIO DE IRREGULARIDADE', pd.NaT
+    )
+    return [fisc_date, bate_caixa, faro_certo, prospec_effort_date]
 
-def calculate_yoy(df: pd.DataFrame) -> pd.DataFrame:
-    """Calcula YoY em decimal e a média dos YoYs."""
-    out = df.copy()
-    month_cols_raw = _get_consumption_month_cols(out)
 
-    if not month_cols_raw:
-        out['MEDIA_YOY'] = pd.NA
-        return out
+# Data mais recente entre fiscalização, bate caixa, Faro Certo e prospecção
+ULTIMO_ESFORCO = 'ULTIMO_ESFORCO'
 
-    rename_map = {c: _normalize_month_col_name(c) for c in month_cols_raw}
-    out = out.rename(columns=rename_map)
-    month_cols = sorted(
-        {rename_map[c] for c in month_cols_raw}, key=_month_key
+# Sem nenhum esforço: NaT, que em int64 é o menor valor possível
+_SEM_ESFORCO = np.iinfo(np.int64).min
+
+
+def _last_effort_days(
+    out: pd.DataFrame, prospec_concl: Optional[pd.Series] = None
+) -> np.ndarray:
+    """ULTIMO_ESFORCO em dias (int64), lido da coluna ou calculado na hora."""
+    if ULTIMO_ESFORCO in out.columns:
+        return _days(out[ULTIMO_ESFORCO])
+    if prospec_concl is None:
+        prospec_concl = _prospec_conclusao(out)
+    return np.maximum.reduce(
+        [_days(dates) for dates in _effort_dates(out, prospec_concl)]
     )
 
-    latest = max(month_cols, key=_month_key)
-    usable = [c for c in month_cols if c != latest]
 
-    for c in month_cols:
-        out[c] = pd.to_numeric(out[c], errors='coerce')
+def add_last_effort(df: pd.DataFrame) -> pd.DataFrame:
+    """Adiciona ULTIMO_ESFORCO: a data do esforço mais recente da UC.
+
+    É o máximo, por linha, das quatro datas de esforço (NaT sem nenhum).
+    "Teve esforço nos últimos N meses" e "teve esforço depois do
+    MOVE_OUT" viram uma única comparação contra essa coluna.
+    """
+    out = df.copy(deep=False)
+    days = np.maximum.reduce(
+        [_days(dates) for dates in _effort_dates(out, _prospec_conclusao(out))]
+    )
+    out[ULTIMO_ESFORCO] = days.view('datetime64[D]').astype('datetime64[s]')
+    return out
 
-    yoy_cols: List[str] = []
-    for c in usable:
-        year, month = _month_key(c)
-        prev = f'{month:02d}/{year-1}'
 
-        if prev in out.columns:
-            yoy_name = f"yoy_{c.replace('/', '_')}"
-            yoy_cols.append(yoy_name)
-            out[yoy_name] = np.where(
-                out[prev] > 0, (out[c] - out[prev]) / out[prev], np.nan
-            )
+def _status_series(out: pd.DataFrame) -> pd.Series:
+    """STATUS_COMERCIAL normalizado (strip + upper, categórico)."""
+    return normalized(
+        out.get('STATUS_COMERCIAL', pd.Series('', index=out.index))
+    )
 
-    if yoy_cols:
-        out['MEDIA_YOY'] = out[yoy_cols].mean(axis=1, skipna=True)
 
-        mask_grande = out['MEDIA_YOY'].abs() > 2
-        out.loc[mask_grande, 'MEDIA_YOY'] = (
-            out.loc[mask_grande, 'MEDIA_YOY'] / 100
-        )
+def _building_key(out: pd.DataFrame) -> Optional[pd.Series]:
+    """Chave do prédio (LOGRADOURO|NUMERO), ou None sem essas colunas."""
+    if not {'LOGRADOURO', 'NUMERO'}.issubset(out.columns):
+        return None
+    log = out['LOGRADOURO'].fillna('').astype(str).str.upper().str.strip()
+    num = out['NUMERO'].fillna('').astype(str).str.upper().str.strip()
+    return log + '|' + num
 
-        out['MEDIA_YOY'] = out['MEDIA_YOY'].round(4)
-    else:
-        out['MEDIA_YOY'] = pd.NA
 
-    return out
+def _building_stats(
+    build_key: pd.Series, status: pd.Series, esforco_6m: pd.Series
+) -> Tuple[pd.Series, Set[str]]:
+    ds_counts = build_key[status == 'DS'].value_counts()
+    return ds_counts, set(build_key[esforco_6m].unique())
 
 
-def flag_minimum_by_phase(df: pd.DataFrame) -> pd.DataFrame:
-    """Marca UCs que estão no mínimo nos últimos 4 meses (todos os meses)."""
-    out = df.copy()
-    month_cols_raw = _get_consumption_month_cols(out)
+def building_stats(
+    df: pd.DataFrame, ref_date: Optional[datetime] = None
+) -> Tuple[pd.Series, Set[str]]:
+    """Estatísticas por prédio usadas no P3-5 (condomínio com alto DS).
 
-    if not month_cols_raw:
-        out['NO_MINIMO_4M'] = pd.NA
-        return out
+    Retorna a contagem de UCs em DS por prédio e o conjunto de prédios com
+    qualquer esforço nos últimos 6 meses. Os dois resultados podem ser
+    somados/unidos entre pedaços da base (ver `etl.main`). Sem `ref_date`
+    a referência é o último mês de consumo de `df`.
+    """
+    build_key = _building_key(df)
+    if build_key is None:
+        return pd.Series(dtype='int64'), set()
 
-    rename_map = {c: _normalize_month_col_name(c) for c in month_cols_raw}
-    out = out.rename(columns=rename_map)
-    month_cols = sorted(
-        {rename_map[c] for c in month_cols_raw}, key=_month_key
+    esforco_6m = _esforco_recente(
+        _last_effort_days(df), ref_date or _get_reference_date(df), 6
     )
 
-    latest = max(month_cols, key=_month_key)
-    usable = [c for c in month_cols if c != latest]
-    last_4 = usable[-4:] if len(usable) >= 4 else usable
+    return _building_stats(build_key, _status_series(df), esforco_6m)
 
-    for c in month_cols:
-        out[c] = pd.to_numeric(out[c], errors='coerce')
 
-    status = (
-        out.get('STATUS_COMERCIAL', pd.Series('', index=out.index))
+def critical_buildings(
+    ds_counts: pd.Series, predios_com_esforco: Set[str]
+) -> pd.Index:
+    """Prédios com >= 5 UCs em DS e sem esforço nos últimos 6 meses."""
+    return ds_counts[
+        (ds_counts >= 5) & (~ds_counts.index.isin(list(predios_com_esforco)))
+    ].index
+
+
+def _condominio_mask(
+    out: pd.DataFrame, status: Optional[pd.Series] = None
+) -> pd.Series:
+    """Máscara das UCs que podem receber o P3-5 (DS, condomínio, sem prioridade)."""
+    if status is None:
+        status = _status_series(out)
+    cond_col = (
+        out.get('CONDOMINIO', pd.Series('', index=out.index))
+        .fillna('')
         .astype(str)
-        .str.strip()
         .str.upper()
-    )
-    fase = (
-        out.get('FASE', pd.Series('', index=out.index))
-        .astype(str)
         .str.strip()
-        .str.upper()
     )
+    return (cond_col == 'SIM') & (status == 'DS') & out['PRIORIDADE'].isna()
 
-    out['NO_MINIMO_4M'] = pd.NA
 
-    limits = {'MO': 40, 'BI': 60, 'TR': 110}
+def condominio_candidates(df: pd.DataFrame) -> pd.Series:
+    """Máscara das UCs que ainda podem ser marcadas pelo P3-5."""
+    if _building_key(df) is None:
+        return pd.Series(False, index=df.index)
+    return _condominio_mask(df)
 
-    for f, limit in limits.items():
-        cond_fase = (status == 'LG') & (fase == f)
-        count_below = (out[last_4] <= limit).sum(axis=1)
-        out.loc[
-            cond_fase & (count_below == len(last_4)), 'NO_MINIMO_4M'
-        ] = 'SIM'
 
+def flag_condominio_alto_ds(
+    df: pd.DataFrame, crit_builds: pd.Index
+) -> pd.DataFrame:
+    """Marca P3-5 nas UCs DS de condomínio em prédio crítico sem prioridade."""
+    out = df.copy(deep=False)
+    build_key = _building_key(out)
+    if build_key is not None:
+        _mark_condominio(out, build_key, crit_builds)
     return out
 
 
-def apply_priority_rules(df: pd.DataFrame) -> pd.DataFrame:
-    """Aplica todas as regras de priorização (P1, P2, P3) com hierarquia e filtro de esforço."""
-    out = df.copy()
-    ref_date = _get_reference_date(out)
+def _mark_condominio(
+    out: pd.DataFrame,
+    build_key: pd.Series,
+    crit_builds: pd.Index,
+    status: Optional[pd.Series] = None,
+    rows: Optional[np.ndarray] = None,
+) -> None:
+    # `build_key` pode cobrir só as posições `rows` (as UCs DS estão nelas)
+    in_crit = np.zeros(len(out), dtype=bool)
+    in_crit[slice(None) if rows is None else rows] = build_key.isin(
+        crit_builds
+    ).to_numpy()
+    # Marca como P3 apenas as UCs DS, que são condomínio, no prédio crítico e sem prioridade
+    cond_p3_5 = _mask(_condominio_mask(out, status)) & in_crit
+    out.loc[cond_p3_5, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+        'P3',
+        'P3-CONDOMÍNIO COM ALTO ÍNDICE DE DS',
+    ]
 
-    # Inicializa colunas
-    out['PRIORIDADE'] = pd.NA
-    out['MOTIVO_PRIORIDADE'] = pd.NA
 
-    # --- PREPARAÇÃO DE DADOS ---
-    status = (
-        out.get('STATUS_COMERCIAL', pd.Series('', index=out.index))
-        .astype(str)
-        .str.strip()
-        .str.upper()
-    )
+def calculate_yoy(
+    df: pd.DataFrame,
+    matrix: Optional[ConsumptionMatrix] = None,
+    monthly_columns: bool = False,
+) -> pd.DataFrame:
+    """Calcula YoY em decimal e a média dos YoYs (MEDIA_YOY).
+
+    O YoY de todos os meses sai de uma única operação sobre a matriz de
+    consumo (bloco do ano corrente contra o bloco do ano anterior). As
+    colunas `yoy_MM_YYYY` de cada mês só são criadas com
+    `monthly_columns=True`. `matrix` é a `ConsumptionMatrix` já montada
+    para `df`, se houver.
+    """
+    out = df.copy(deep=False)
+    matrix = ConsumptionMatrix.for_frame(out, matrix)
+    cur_idx, prev_idx = matrix.year_ago_pairs()
+
+    if not matrix.months:
+        out['MEDIA_YOY'] = pd.NA
+        return out
 
-    # Datas de Esforço (Fiscalização, Bate Caixa e Faro Certo)
-    fisc_date = pd.to_datetime(
-        out.get('FISCALIZACAO', pd.Series(index=out.index)), errors='coerce'
-    )
-    bate_caixa = pd.to_datetime(
-        out.get('BATE_CAIXA', pd.Series(index=out.index)), errors='coerce'
-    )
-    faro_certo = pd.to_datetime(
-        out.get('FARO_CERTO', pd.Series(index=out.index)),
-        errors='coerce',
-        dayfirst=True,
-    )
+    rename_map = matrix.rename_map()
+    if rename_map:
+        out = out.rename(columns=rename_map)
 
-    # Prospecção: data e conclusão
-    prospec_date = pd.to_datetime(
-        out.get('DATA_PROSPECTOR', pd.Series(index=out.index)),
-        errors='coerce',
-        dayfirst=True,
-    )
-    prospec_concl_raw = out.get(
-        'CONCLUSAO_PROSPECTOR', pd.Series('', index=out.index)
+    if not len(cur_idx):
+        out['MEDIA_YOY'] = pd.NA
+        return out
+
+    # (atual - anterior) / anterior, só onde o ano anterior teve consumo
+    base = matrix.values[:, prev_idx]
+    yoy = matrix.values[:, cur_idx].astype(np.float64)
+    yoy -= base
+    has_base = base > 0
+    np.divide(yoy, base, out=yoy, where=has_base)
+    yoy[~has_base] = np.nan
+
+    if monthly_columns:
+        for k, j in enumerate(cur_idx):
+            label = matrix.months[j]
+            out[f"yoy_{label.replace('/', '_')}"] = yoy[:, k]
+
+    # Média ignorando os meses sem base (NaN); sem nenhum mês válido, NaN
+    valid = has_base.sum(axis=1)
+    total = np.where(has_base, yoy, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(valid > 0, total / valid, np.nan)
+
+    mask_grande = np.abs(media) > 2
+    media[mask_grande] = media[mask_grande] / 100
+    out['MEDIA_YOY'] = np.round(media, 4)
+
+    return out
+
+
+# Consumo máximo (kWh) para considerar a UC no mínimo, por fase
+_MINIMO_POR_FASE = {'MO': 40, 'BI': 60, 'TR': 110}
+
+
+def flag_minimum_by_phase(
+    df: pd.DataFrame, matrix: Optional[ConsumptionMatrix] = None
+) -> pd.DataFrame:
+    """Marca UCs que estão no mínimo nos últimos 4 meses (todos os meses).
+
+    `matrix` é a `ConsumptionMatrix` já montada para `df`, se houver.
+    """
+    out = df.copy(deep=False)
+    matrix = ConsumptionMatrix.for_frame(out, matrix)
+
+    if not matrix.months:
+        out['NO_MINIMO_4M'] = pd.NA
+        return out
+
+    rename_map = matrix.rename_map()
+    if rename_map:
+        out = out.rename(columns=rename_map)
+
+    # Últimos 4 meses completos (o último mês disponível fica de fora)
+    last_4 = matrix.values[:, max(len(matrix.months) - 5, 0) : -1]
+
+    status = _status_series(out)
+    fase = normalized(out.get('FASE', pd.Series('', index=out.index)))
+
+    # Limite por fase calculado nas categorias e levado às linhas pelo código
+    por_fase = fase.cat.categories.map(_MINIMO_POR_FASE).to_numpy(
+        dtype=np.float64
     )
-    prospec_concl = _strip_accents_series(prospec_concl_raw)
+    limit = np.append(por_fase, np.nan).take(fase.cat.codes.to_numpy())
+    # Fase sem limite: NaN nunca é >= consumo, então a UC não é marcada
+    no_minimo = (last_4 <= limit[:, None]).all(axis=1) & ~np.isnan(limit)
+    no_minimo &= (status == 'LG').to_numpy()
+
+    flag = np.full(len(out), pd.NA, dtype=object)
+    flag[no_minimo] = 'SIM'
+    out['NO_MINIMO_4M'] = pd.Series(flag, index=out.index, dtype=object)
+
+    return out
+
+
+# Apontamentos do leiturista que indicam possível irregularidade
+_APONTAMENTOS_RELEVANTES = [
+    'VESTIGIO DE IRREGULARIDADE',
+    'VESTIGIO DE LIGACAO IRREGULAR',
+    'PROB DISPLAY MEDIDOR ELETRONICO',
+    'MEDIDOR COM VIDRO QUEBRADO',
+    'MEDIDOR PARADO DESCONTROLADO OU EMBACADO',
+    'MEDIDOR GIRANDO AO CONTRARIO',
+    'MEDIDOR NAO LOCALIZADO',
+    'MEDIDOR RETIRADO DA CAIXA DE MEDICAO',
+    'NUMERO DO MEDIDOR NAO CONFERE',
+    'MEDIDOR COM VIDRO EMBACADO (NAO PERMITE LEITURA)',
+    'MEDIDOR DESENERGIZADO (NAO EXIBE LEITURA)',
+    'IMPEDIMENTO DE LEITURA POR SINISTRO',
+    'EQUIPAMENTO COM PERDA DE PARAMETRO',
+    'ERRO DE CADASTRO',
+    'TROCA DE EQUIPAMENTO POR ENCHENTE',
+]
 
-    # Identifica conclusões normalizadas
-    prospec_is_sem_indicio = prospec_concl == 'SEM INDICIO DE IRREGULARIDADE'
-    prospec_is_confirmada = prospec_concl == 'IRREGULARIDADE CONFIRMADA'
-    prospec_is_indicio = prospec_concl == 'INDICIO DE IRREGULARIDADE'
+Features = Mapping[str, np.ndarray]
 
+
+@dataclass(frozen=True)
+class PriorityRule:
+    """Uma linha da tabela de priorização.
+
+    - prioridade: 'P1', 'P2' ou 'P3'.
+    - motivo: texto gravado em MOTIVO_PRIORIDADE.
+    - condicao: recebe as máscaras de `rule_features` e devolve a máscara
+      (array booleano) das UCs que atendem à regra.
+    """
+
+    prioridade: str
+    motivo: str
+    condicao: Callable[[Features], np.ndarray]
+
+
+def _nota_reclamacao(out: pd.DataFrame) -> pd.Series:
+    """Devolve a data (sem hora) da nota de reclamação."""
+    return _dates(out, 'NOTA DE RECLAMACAO').dt.normalize()
+
+
+def rule_features(
+    out: pd.DataFrame, ref_date: datetime
+) -> Dict[str, np.ndarray]:
+    """Máscaras e valores compartilhados pelas regras, calculados uma vez.
+
+    Todas as entradas são arrays numpy alinhados com as linhas de `out`.
+    """
+    status = _status_series(out)
+
+    # Prospecção: conclusão normalizada
+    prospec_concl = _prospec_conclusao(out)
+
+    # Data do último esforço (Fiscalização, Bate Caixa, Faro Certo e Prospecção)
     # Quando a conclusão for "SEM INDÍCIO", ela passa a contar como esforço na data do prospector
-    prospec_effort_date = prospec_date.where(prospec_is_sem_indicio, pd.NaT)
-
-    # Função interna para checar esforço em N meses (agora incluindo prospecção com 'sem indício')
-    def tem_esforco_recente(meses: int) -> pd.Series:
-        f_rec = _fiscalizacao_recente(fisc_date, ref_date, meses)
-        b_rec = _fiscalizacao_recente(bate_caixa, ref_date, meses)
-        fc_rec = _fiscalizacao_recente(faro_certo, ref_date, meses)
-        p_rec = _fiscalizacao_recente(prospec_effort_date, ref_date, meses)
-        return f_rec | b_rec | fc_rec | p_rec
-
-    # Outros campos
-    move_out = pd.to_datetime(
-        out.get('MOVE_OUT', pd.Series(index=out.index)), errors='coerce'
-    )
-    move_in = pd.to_datetime(
-        out.get('MOVE_IN', pd.Series(index=out.index)), errors='coerce'
-    )
+    ultimo = _last_effort_days(out, prospec_concl)
 
-    # Filtra UCs com MOVE_IN há pelo menos 4 meses (evita falso positivo no mínimo)
-    move_in_ok = move_in.notna() & (
-        move_in <= (ref_date - timedelta(days=4 * 30))
-    )
+    move_out = _dates(out, 'MOVE_OUT')
+    move_in = _dates(out, 'MOVE_IN')
+    nota_reclamacao = _nota_reclamacao(out)
+
+    # Algum esforço depois do desligamento (MOVE_OUT é uma data, sem hora)
+    tem_move_out = _mask(move_out.notna())
+    esforco_apos_ds = tem_move_out & (ultimo >= _days(move_out))
 
-    has_nrt = out.get('HAS_NRT', pd.Series(False, index=out.index))
-    has_fraude = _has_fraude_historica(
-        out.get('COD', pd.Series(index=out.index))
-    )
-    no_minimo = out.get('NO_MINIMO_4M', pd.Series(index=out.index)) == 'SIM'
     media_yoy = pd.to_numeric(
         out.get('MEDIA_YOY', pd.Series(index=out.index)), errors='coerce'
     )
-    fabricante = (
-        out.get('FABRICANTE', pd.Series('', index=out.index))
-        .fillna('')
-        .astype(str)
-        .str.upper()
+    fabricante = normalized(
+        out.get('FABRICANTE', pd.Series('', index=out.index)), strip=False
     )
-    ano_medidor = pd.to_numeric(
-        out.get('ANO', pd.Series(0, index=out.index)), errors='coerce'
+    # Garantimos que MICRO_GERADOR seja tratado como número (1 para sim, 0 para não)
+    micro = pd.to_numeric(
+        out.get('MICRO_GERADOR', pd.Series(0, index=out.index)),
+        errors='coerce',
     ).fillna(0)
 
-    # Apontamentos
-    apontamentos_relevantes = [
-        'VESTIGIO DE IRREGULARIDADE',
-        'VESTIGIO DE LIGACAO IRREGULAR',
-        'PROB DISPLAY MEDIDOR ELETRONICO',
-        'MEDIDOR COM VIDRO QUEBRADO',
-        'MEDIDOR PARADO DESCONTROLADO OU EMBACADO',
-        'MEDIDOR GIRANDO AO CONTRARIO',
-        'MEDIDOR NAO LOCALIZADO',
-        'MEDIDOR RETIRADO DA CAIXA DE MEDICAO',
-        'NUMERO DO MEDIDOR NAO CONFERE',
-        'MEDIDOR COM VIDRO EMBACADO (NAO PERMITE LEITURA)',
-        'MEDIDOR DESENERGIZADO (NAO EXIBE LEITURA)',
-        'IMPEDIMENTO DE LEITURA POR SINISTRO',
-        'EQUIPAMENTO COM PERDA DE PARAMETRO',
-        'ERRO DE CADASTRO',
-        'TROCA DE EQUIPAMENTO POR ENCHENTE',
-    ]
-    has_apontamento = (
-        out.get('LEITURISTA', pd.Series('', index=out.index))
-        .fillna('')
-        .astype(str)
-        .str.upper()
-        .isin(apontamentos_relevantes)
-    )
-
-    # ========== P1 (ALERTAS) ==========
-    # P1: Prospecção motoqueiro irregularidade confirmada
-    no_esforco_any = (
-        fisc_date.isna()
-        & bate_caixa.isna()
-        & faro_certo.isna()
-        & prospec_effort_date.isna()
-    )
-    cond_prosp_p1 = (
-        prospec_is_confirmada & no_esforco_any & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_prosp_p1, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
-        'P1',
-        'P1-PROSPECCAO IRREGULARIDADE CONFIRMADA',
-    ]
+    lg = _mask(status == 'LG')
+    esforco_4m = _esforco_recente(ultimo, ref_date, 4)
+    # Filtra UCs com MOVE_IN há pelo menos 4 meses (evita falso positivo no mínimo)
+    move_in_ok = _mask(
+        move_in.notna() & (move_in <= (ref_date - timedelta(days=4 * 30)))
+    )
+    no_minimo = _mask(
+        out.get('NO_MINIMO_4M', pd.Series(index=out.index)) == 'SIM'
+    )
+
+    return {
+        'lg': lg,
+        'ds': _mask(status == 'DS'),
+        'prospec_confirmada': _mask(
+            prospec_concl == 'IRREGULARIDADE CONFIRMADA'
+        ),
+        'prospec_indicio': _mask(prospec_concl == 'INDICIO DE IRREGULARIDADE'),
+        'sem_esforco': ultimo == _SEM_ESFORCO,
+        'esforco_6m': _esforco_recente(ultimo, ref_date, 6),
+        'esforco_apos_ds': esforco_apos_ds,
+        'tem_move_out': tem_move_out,
+        'ds_recente': _mask(move_out >= (ref_date - timedelta(days=180))),
+        'nrt_apos_ds': _mask(
+            nota_reclamacao.notna() & (nota_reclamacao >= move_out)
+        ),
+        # LG no mínimo da fase, MOVE_IN antigo e sem esforço em 4 meses:
+        # base comum das regras de consumo no mínimo
+        'minimo': lg & no_minimo & move_in_ok & ~esforco_4m,
+        'nrt': _mask(out.get('HAS_NRT', pd.Series(False, index=out.index))),
+        'fraude': _mask(
+            _has_fraude_historica(out.get('COD', pd.Series(index=out.index)))
+        ),
+        'apontamento': _mask(
+            normalized(
+                out.get('LEITURISTA', pd.Series('', index=out.index)),
+                strip=False,
+            ).isin(_APONTAMENTOS_RELEVANTES)
+        ),
+        'queda': _mask(media_yoy <= -0.4),
+        'dowertech': _mask(fabricante.str.contains('DOWERTECH', na=False)),
+        'ano_medidor': pd.to_numeric(
+            out.get('ANO', pd.Series(0, index=out.index)), errors='coerce'
+        )
+        .fillna(0)
+        .to_numpy(dtype=np.float64),
+        'micro': _mask(micro == 1),
+    }
 
-    tem_move_out = move_out.notna()
 
-    nota_reclamacao = pd.to_datetime(
-        out.get('NOTA_DE_RECLAMACAO', pd.Series(index=out.index)),
-        errors='coerce',
+def _dowertech(ano: int) -> PriorityRule:
+    """P2: medidor DOWERTECH do ano `ano` no mínimo da fase."""
+    return PriorityRule(
+        'P2',
+        f'P2-MEDIDOR DOWERTECH {ano} NO MÍNIMO',
+        lambda f: f['minimo'] & f['dowertech'] & (f['ano_medidor'] == ano),
     )
-    nrt_apos_ds = nota_reclamacao.notna() & (nota_reclamacao >= move_out)
 
-    esforco_apos_ds = (
-        (fisc_date.notna() & (fisc_date >= move_out))
-        | (bate_caixa.notna() & (bate_caixa >= move_out))
-        | (faro_certo.notna() & (faro_certo >= move_out))
-        | (prospec_effort_date.notna() & (prospec_effort_date >= move_out))
-    )
 
-    # P1-1: Desligado com reclamação
-    cond_p1_1 = (
-        (status == 'DS') & tem_move_out & nrt_apos_ds & ~esforco_apos_ds
-    )
-    out.loc[cond_p1_1, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+# Tabela de priorização: vale a PRIMEIRA regra que a UC atender.
+# O P3-5 (condomínio com alto DS) depende de contagens por prédio e é
+# aplicado depois, só nas UCs que ficaram sem prioridade.
+PRIORITY_RULES: List[PriorityRule] = [
+    # ========== P1 (ALERTAS) ==========
+    # P1-1: Desligado com reclamação (prevalece até sobre a prospecção)
+    PriorityRule(
         'P1',
         'P1-DESLIGADO COM RECLAMAÇÃO',
-    ]
-
+        lambda f: f['ds']
+        & f['tem_move_out']
+        & f['nrt_apos_ds']
+        & ~f['esforco_apos_ds'],
+    ),
+    # P1: Prospecção motoqueiro irregularidade confirmada
+    PriorityRule(
+        'P1',
+        'P1-PROSPECCAO IRREGULARIDADE CONFIRMADA',
+        lambda f: f['prospec_confirmada'] & f['sem_esforco'],
+    ),
     # P1-2: Cliente no mínimo da fase com nota de reclamação
-    cond_p1_2 = (
-        (status == 'LG')
-        & no_minimo
-        & move_in_ok
-        & has_nrt
-        & ~tem_esforco_recente(4)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p1_2, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P1',
         'P1-MÍNIMO DA FASE COM RECLAMAÇÃO',
-    ]
-
+        lambda f: f['minimo'] & f['nrt'],
+    ),
     # ========== P2 (REGRAS) ==========
     # P2: Prospecção motoqueiro com indício de irregularidade
-    cond_prosp_p2 = (
-        prospec_is_indicio & no_esforco_any & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_prosp_p2, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P2',
         'P2-PROSPECCAO INDICIO DE IRREGULARIDADE',
-    ]
-
+        lambda f: f['prospec_indicio'] & f['sem_esforco'],
+    ),
     # P2-1: Cliente reincidente com queda de consumo
-    cond_p2_1 = (
-        (status == 'LG')
-        & has_fraude
-        & (media_yoy <= -0.4)
-        & ~tem_esforco_recente(6)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p2_1, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P2',
         'P2-REINCIDENTE COM QUEDA DE CONSUMO',
-    ]
-
+        lambda f: f['lg'] & f['fraude'] & f['queda'] & ~f['esforco_6m'],
+    ),
     # P2-2: UC no mínimo da fase com apontamento suspeito do leiturista
-    cond_p2_2 = (
-        (status == 'LG')
-        & no_minimo
-        & move_in_ok
-        & has_apontamento
-        & ~tem_esforco_recente(4)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p2_2, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P2',
         'P2-MÍNIMO COM APONTAMENTO SUSPEITO',
-    ]
-
-    # P2-3: Medidor dowertech 2013 no mínimo
-    cond_p2_3 = (
-        fabricante.str.contains('DOWERTECH', na=False)
-        & (ano_medidor == 2013)
-        & (status == 'LG')
-        & no_minimo
-        & move_in_ok
-        & ~tem_esforco_recente(4)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p2_3, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
-        'P2',
-        'P2-MEDIDOR DOWERTECH 2013 NO MÍNIMO',
-    ]
-
-    # P2-4: Medidor dowertech 2014 no mínimo
-    cond_p2_4 = (
-        fabricante.str.contains('DOWERTECH', na=False)
-        & (ano_medidor == 2014)
-        & (status == 'LG')
-        & no_minimo
-        & move_in_ok
-        & ~tem_esforco_recente(4)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p2_4, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
-        'P2',
-        'P2-MEDIDOR DOWERTECH 2014 NO MÍNIMO',
-    ]
-
-    # P2-5: Medidor dowertech 2015 no mínimo
-    cond_p2_5 = (
-        fabricante.str.contains('DOWERTECH', na=False)
-        & (ano_medidor == 2015)
-        & (status == 'LG')
-        & no_minimo
-        & move_in_ok
-        & ~tem_esforco_recente(4)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p2_5, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
-        'P2',
-        'P2-MEDIDOR DOWERTECH 2015 NO MÍNIMO',
-    ]
-
+        lambda f: f['minimo'] & f['apontamento'],
+    ),
+    # P2-3 a P2-5: Medidor dowertech 2013, 2014 e 2015 no mínimo
+    *(_dowertech(ano) for ano in (2013, 2014, 2015)),
     # ========== P3 (SINAIS) ==========
     # P3-1: Medidor antigo no mínimo da fase
-    cond_p3_1 = (
-        (ano_medidor >= 1900)
-        & (ano_medidor <= 2000)
-        & (status == 'LG')
-        & no_minimo
-        & move_in_ok
-        & ~tem_esforco_recente(4)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p3_1, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P3',
         'P3-MEDIDOR ANTIGO NO MÍNIMO',
-    ]
-
+        lambda f: f['minimo']
+        & (f['ano_medidor'] >= 1900)
+        & (f['ano_medidor'] <= 2000),
+    ),
     # P3-2: Desligado recente com histórico de fraude
-    ds_recente = move_out >= (ref_date - timedelta(days=180))
-    cond_p3_2 = (
-        (status == 'DS')
-        & ds_recente
-        & has_fraude
-        & ~esforco_apos_ds
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p3_2, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P3',
         'P3-DESLIGADO RECENTE COM HISTÓRICO DE FRAUDE',
-    ]
-
+        lambda f: f['ds']
+        & f['ds_recente']
+        & f['fraude']
+        & ~f['esforco_apos_ds'],
+    ),
     # P3-3: Consumo no mínimo da fase
-    cond_p3_3 = (
-        (status == 'LG')
-        & no_minimo
-        & move_in_ok
-        & ~tem_esforco_recente(4)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p3_3, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P3',
         'P3-CONSUMO NO MÍNIMO DA FASE',
-    ]
-
+        lambda f: f['minimo'],
+    ),
     # P3-4: Queda acentuada, mas IGNORANDO microgeradores
-    # Garantimos que MICRO_GERADOR seja tratado como número (1 para sim, 0 para não)
-    is_micro = (
-        pd.to_numeric(out.get('MICRO_GERADOR', 0), errors='coerce').fillna(0)
-        == 1
-    )
-
-    cond_p3_4 = (
-        (status == 'LG')
-        & (media_yoy <= -0.4)
-        & (~is_micro)
-        & ~tem_esforco_recente(6)
-        & out['PRIORIDADE'].isna()
-    )
-    out.loc[cond_p3_4, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
+    PriorityRule(
         'P3',
         'P3-QUEDA ACENTUADA DE CONSUMO',
-    ]
+        lambda f: f['lg'] & f['queda'] & ~f['micro'] & ~f['esforco_6m'],
+    ),
+]
+
+
+# Colunas lidas por `rule_features` (as demais não entram na avaliação)
+RULE_COLUMNS = [
+    'STATUS_COMERCIAL',
+    'CONCLUSAO_PROSPECTOR',
+    ULTIMO_ESFORCO,
+    'FISCALIZACAO',
+    'BATE_CAIXA',
+    'FARO_CERTO',
+    'DATA_PROSPECTOR',
+    'MOVE_OUT',
+    'MOVE_IN',
+    'NOTA DE RECLAMACAO',
+    'MEDIA_YOY',
+    'FABRICANTE',
+    'MICRO_GERADOR',
+    'NO_MINIMO_4M',
+    'HAS_NRT',
+    'COD',
+    'LEITURISTA',
+    'ANO',
+]
+
+
+def rule_candidates(out: pd.DataFrame, status: pd.Series) -> np.ndarray:
+    """Pré-filtro barato: UCs que podem atender alguma regra da tabela.
+
+    Toda regra exige DS, LG no mínimo da fase, LG com queda de consumo ou
+    uma conclusão de prospecção. O resto nunca recebe prioridade pela
+    tabela e não precisa das features caras (texto e datas). Uma regra
+    nova que fuja desses casos precisa entrar aqui.
+    """
+    no_minimo = out.get('NO_MINIMO_4M', pd.Series(index=out.index)) == 'SIM'
+    queda = (
+        pd.to_numeric(
+            out.get('MEDIA_YOY', pd.Series(index=out.index)), errors='coerce'
+        )
+        <= -0.4
+    )
+    conclusao = normalized(
+        out.get('CONCLUSAO_PROSPECTOR', pd.Series('', index=out.index))
+    )
+    conclusao = conclusao.notna() & (conclusao != '')
+    return _mask(
+        (status == 'DS') | ((status == 'LG') & (no_minimo | queda)) | conclusao
+    )
 
-    # P3-5: Condomínio com alto índice de DS (agrupa por LOGRADOURO + NUMERO)
-    cond_col = (
-        out.get('CONDOMINIO', pd.Series('', index=out.index))
-        .fillna('')
-        .astype(str)
-        .str.upper()
-        .str.strip()
+
+def export_candidates(
+    df: pd.DataFrame,
+    matrix: Optional[ConsumptionMatrix] = None,
+    prospectadas: Optional[pd.Series] = None,
+) -> np.ndarray:
+    """Plano de poda: UCs do cadastro que ainda podem sair priorizadas.
+
+    Usa só o que existe antes das junções: STATUS_COMERCIAL, FASE, MOVE_IN,
+    consumo, endereço e a lista de UCs prospectadas. É conservador: mantém
+    toda UC DS, toda UC LG no mínimo da fase (com MOVE_IN antigo) ou com
+    queda de consumo, toda UC prospectada e toda UC de prédio com 5 ou
+    mais DS, porque o esforço de qualquer UC do prédio decide o P3-5.
+    """
+    matrix = ConsumptionMatrix.for_frame(df, matrix)
+    ref_date = _get_reference_date(df)
+    status = _status_series(df)
+
+    no_minimo = flag_minimum_by_phase(df, matrix)['NO_MINIMO_4M'] == 'SIM'
+    queda = calculate_yoy(df, matrix)['MEDIA_YOY'] <= -0.4
+    move_in = _dates(df, 'MOVE_IN')
+    move_in_ok = move_in.notna() & (
+        move_in <= (ref_date - timedelta(days=4 * 30))
     )
 
-    if {'LOGRADOURO', 'NUMERO'}.issubset(out.columns):
-        # Normaliza logradouro e número para criar a chave do prédio
-        log = out['LOGRADOURO'].fillna('').astype(str).str.upper().str.strip()
-        num = out['NUMERO'].fillna('').astype(str).str.upper().str.strip()
-        out['_BUILD_KEY'] = log + '|' + num
-
-        # 1. Identifica prédios que tiveram QUALQUER esforço nos últimos 6 meses
-        # (Seja inspeção ou bate caixa em qualquer UC do prédio)
-        predios_com_esforco = out.loc[
-            tem_esforco_recente(6), '_BUILD_KEY'
-        ].unique()
-
-        # 2. Conta UCs com STATUS 'DS' por prédio
-        ds_build_counts = out.loc[status == 'DS'].groupby('_BUILD_KEY').size()
-
-        # 3. Define prédios críticos: >= 5 DS E que NÃO tiveram esforço recente
-        crit_builds = ds_build_counts[
-            (ds_build_counts >= 5)
-            & (~ds_build_counts.index.isin(predios_com_esforco))
-        ].index
-
-        # 4. Marca como P3 apenas as UCs DS, que são condomínio, no prédio crítico e sem prioridade
-        cond_p3_5 = (
-            (cond_col == 'SIM')
-            & (status == 'DS')
-            & out['_BUILD_KEY'].isin(crit_builds)
-            & out['PRIORIDADE'].isna()
+    ds = _mask(status == 'DS')
+    keep = ds | _mask((status == 'LG') & ((no_minimo & move_in_ok) | queda))
+    if prospectadas is not None and 'UC' in df.columns:
+        keep |= _mask(df['UC'].isin(prospectadas))
+
+    # Prédios que podem ser críticos no P3-5 (>= 5 UCs DS)
+    if ds.sum() >= 5 and {'LOGRADOURO', 'NUMERO'}.issubset(df.columns):
+        address = df[['LOGRADOURO', 'NUMERO']]
+        ds_counts = _building_key(address[ds]).value_counts()
+        predios = ds_counts.index[ds_counts >= 5]
+        if len(predios):
+            rest = np.flatnonzero(~keep)
+            keep[rest] = _mask(_building_key(address.take(rest)).isin(predios))
+
+    return keep
+
+
+class _Rows(Mapping[str, np.ndarray]):
+    """Features restritas às linhas `rows`, recortadas sob demanda."""
+
+    def __init__(self, features: Features, rows: np.ndarray) -> None:
+        self._features = features
+        self._rows = rows
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        if key not in self._cache:
+            self._cache[key] = self._features[key][self._rows]
+        return self._cache[key]
+
+    def __iter__(self):
+        return iter(self._features)
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+
+def first_match(
+    rules: Sequence[PriorityRule], features: Features, n_rows: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Prioridade e motivo da primeira regra atendida por cada UC.
+
+    Cada regra só avalia as UCs que ainda estão sem prioridade: as que
+    casam saem do conjunto de candidatas antes da regra seguinte. O
+    resultado é o de um `np.select` (vale a primeira regra) e é gravado
+    uma única vez. UCs sem nenhuma regra ficam com <NA>.
+    """
+    first = np.full(n_rows, len(rules))
+    remaining = np.arange(n_rows)
+    for i, rule in enumerate(rules):
+        if not len(remaining):
+            break
+        rows = (
+            features
+            if len(remaining) == n_rows
+            else _Rows(features, remaining)
         )
+        hit = rule.condicao(rows)
+        first[remaining[hit]] = i
+        remaining = remaining[~hit]
+
+    prioridades = np.array(
+        [r.prioridade for r in rules] + [pd.NA], dtype=object
+    )
+    motivos = np.array([r.motivo for r in rules] + [pd.NA], dtype=object)
+    return prioridades[first], motivos[first]
 
-        out.loc[cond_p3_5, ['PRIORIDADE', 'MOTIVO_PRIORIDADE']] = [
-            'P3',
-            'P3-CONDOMÍNIO COM ALTO ÍNDICE DE DS',
-        ]
 
-        # Limpa a coluna temporária de chave do prédio
-        out.drop(columns=['_BUILD_KEY'], inplace=True)
+def apply_priority_rules(
+    df: pd.DataFrame,
+    condominio: bool = True,
+    ref_date: Optional[datetime] = None,
+) -> pd.DataFrame:
+    """Aplica todas as regras de priorização (P1, P2, P3) com hierarquia e filtro de esforço.
+
+    As regras estão em `PRIORITY_RULES`, em ordem de precedência; a
+    PRIORIDADE e o MOTIVO_PRIORIDADE são gravados uma única vez. As
+    features só são calculadas para as UCs que passam no pré-filtro
+    (`rule_candidates`), então o custo acompanha o número de candidatas e
+    não o tamanho da base.
+
+    Com `condominio=False` a regra P3-5 (que depende de contagens por prédio
+    na base inteira) não é aplicada; use `building_stats`,
+    `critical_buildings` e `flag_condominio_alto_ds` para aplicá-la depois.
+
+    Sem `ref_date` a referência é o último mês de consumo de `df`.
+    """
+    out = df.copy(deep=False)
+    ref_date = ref_date or _get_reference_date(out)
+    status = _status_series(out)
+
+    candidates = np.flatnonzero(rule_candidates(out, status))
+    subset = out[[c for c in RULE_COLUMNS if c in out.columns]].take(
+        candidates
+    )
+    features = rule_features(subset, ref_date)
+    prioridade_cand, motivo_cand = first_match(
+        PRIORITY_RULES, features, len(candidates)
+    )
+
+    prioridade = np.full(len(out), pd.NA, dtype=object)
+    motivo = np.full(len(out), pd.NA, dtype=object)
+    prioridade[candidates] = prioridade_cand
+    motivo[candidates] = motivo_cand
+    out['PRIORIDADE'] = pd.Series(prioridade, index=out.index, dtype=object)
+    out['MOTIVO_PRIORIDADE'] = pd.Series(motivo, index=out.index, dtype=object)
+
+    # P3-5: Condomínio com alto índice de DS (agrupa por LOGRADOURO + NUMERO)
+    # Com condominio=False a regra fica para uma segunda passada sobre a base
+    # inteira (modo em pedaços do pipeline).
+    if condominio and {'LOGRADOURO', 'NUMERO'}.issubset(out.columns):
+        # Prédios com esforço recente (em qualquer UC, candidata ou não)
+        esforco_6m = _esforco_recente(_last_effort_days(out), ref_date, 6)
+        # Só as UCs DS (contagem e marcação) e as com esforço recente
+        # (prédios com esforço) precisam da chave do prédio
+        rows = np.flatnonzero(_mask(status == 'DS') | esforco_6m)
+        build_key = _building_key(out[['LOGRADOURO', 'NUMERO']].take(rows))
+        ds_counts, predios_com_esforco = _building_stats(
+            build_key, status.take(rows), esforco_6m[rows]
+        )
+        _mark_condominio(
+            out,
+            build_key,
+            critical_buildings(ds_counts, predios_com_esforco),
+            status,
+            rows,
+        )
 
     # Retorno final da função apply_priority_rules
     return out
@@ -2,6 +2,7 @@ import pandas as pd
 import pytest
 
 from etl.extract.extract import load_all_files
+from etl.load.load import save_to_csv
 
 
 def test_load_all_files_returns_dict():
@@ -34,3 +35,133 @@ def test_check_if_dataframes_are_not_empty():
         if not isinstance(value, pd.DataFrame):
             continue  # ignora valores que não são DataFrames
         assert not value.empty, f'O DataFrame {key} está vazio!'
+
+
+@pytest.fixture
+def input_dir(tmp_path, monkeypatch):
+    """Cria uma pasta input/ mínima com CSVs e o SQLite do Faro Certo."""
+    import etl.extract.extract as extract
+
+    input_path = tmp_path / 'input'
+    input_path.mkdir()
+    (input_path / 'A.csv').write_text(
+        'UC;VALOR\n1;10\n2;20\n', encoding='latin-1'
+    )
+    (input_path / 'B.csv').write_text('uc,lat\n1,-31.7\n', encoding='latin-1')
+    (input_path / 'bot_interactions.sqlite').write_bytes(b'')
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(extract, '_FILES', {'a': 'A.csv', 'b': 'B.csv'})
+    return input_path
+
+
+@pytest.mark.parametrize('use_processes', [True, False])
+def test_load_all_files_parallel_matches_sequential(input_dir, use_processes):
+    seq = load_all_files(parallel=False)
+    par = load_all_files(parallel=True, use_processes=use_processes)
+
+    assert list(par.keys()) == ['a', 'b', 'faro_sqlite']
+    pd.testing.assert_frame_equal(par['a'], seq['a'])
+    pd.testing.assert_frame_equal(par['b'], seq['b'])
+    assert list(par['b'].columns) == ['uc', 'lat']
+
+
+def test_load_all_files_missing_file_fails_fast(input_dir):
+    (input_dir / 'B.csv').unlink()
+    with pytest.raises(FileNotFoundError, match='B.csv'):
+        load_all_files()
+
+
+def test_load_all_files_reuses_cache(input_dir):
+    first = load_all_files(parallel=False)
+    assert (input_dir.parent / 'cache' / 'extract' / 'a.json').exists()
+
+    second = load_all_files(parallel=False)
+    pd.testing.assert_frame_equal(first['a'], second['a'])
+
+
+def test_load_all_files_applies_source_schema(input_dir, monkeypatch):
+    import etl.extract.extract as extract
+
+    (input_dir / 'OCO.csv').write_text(
+        'CR_NUMERO;DT_OCO_INCLUSAO;OBS\n10;05/02/2026;x\n20;;y\n',
+        encoding='latin-1',
+    )
+    pd.DataFrame(
+        {'medidor': [1], 'ANO': [2013], 'FABRICANTE': ['ELO'], 'X': [0]}
+    ).to_excel(input_dir / 'MED.xlsx', index=False)
+    monkeypatch.setattr(
+        extract, '_FILES', {'ocorrencias': 'OCO.csv', 'medidores': 'MED.xlsx'}
+    )
+
+    data = load_all_files(parallel=False, use_cache=False)
+
+    occ = data['ocorrencias']
+    assert list(occ.columns) == ['CR_NUMERO', 'DT_OCO_INCLUSAO']
+    assert occ['DT_OCO_INCLUSAO'].iloc[0] == pd.Timestamp('2026-02-05')
+    assert pd.isna(occ['DT_OCO_INCLUSAO'].iloc[1])
+    assert list(data['medidores'].columns) == ['medidor', 'ANO', 'FABRICANTE']
+
+
+def test_load_all_files_reports_missing_columns(input_dir, monkeypatch):
+    import etl.extract.extract as extract
+
+    (input_dir / 'SEC.csv').write_text('MUNICIPIO;OUTRA\nPELOTAS;1\n')
+    monkeypatch.setattr(extract, '_FILES', {'seccional': 'SEC.csv'})
+
+    with pytest.raises(KeyError, match='SECCCIONAL'):
+        load_all_files(parallel=False, use_cache=False)
+
+
+def test_sniff_csv_detects_separator_and_encoding(tmp_path):
+    from etl.extract.extract import _sniff_csv
+
+    semi = tmp_path / 'semi.csv'
+    semi.write_bytes('UC;MUNICÍPIO\n1;SÃO LOURENÇO\n'.encode('latin-1'))
+    comma = tmp_path / 'comma.csv'
+    comma.write_bytes('uc,municipio\n1,São Lourenço\n'.encode('utf-8'))
+
+    assert _sniff_csv(semi) == {'sep': ';', 'encoding': 'latin-1'}
+    assert _sniff_csv(comma) == {'sep': ',', 'encoding': 'utf-8'}
+
+
+def test_csv_dialect_is_cached_per_fingerprint(input_dir, monkeypatch):
+    import etl.extract.extract as extract
+
+    load_all_files(parallel=False)
+
+    def _fail(path):
+        raise AssertionError('arquivo não deveria ser amostrado de novo')
+
+    monkeypatch.setattr(extract, '_sniff_csv', _fail)
+    # Força a releitura do arquivo (tag diferente), mantendo a impressão digital
+    monkeypatch.setattr(
+        extract, 'SCHEMAS', {'a': extract.SourceSchema(required=('UC',))}
+    )
+    data = load_all_files(parallel=False)
+    assert list(data['a'].columns) == ['UC']
+
+
+def test_cadastro_micro_gerador_numerico_em_todo_pedaco(
+    input_dir, monkeypatch
+):
+    import etl.extract.extract as extract
+
+    (input_dir / 'CAD.csv').write_text(
+        'UC;MEDIDOR;MUNICIPIO;MICRO_GERADOR\n1;10;PELOTAS;0\n2;20;BAGÉ;\n',
+        encoding='latin-1',
+    )
+    monkeypatch.setattr(extract, '_FILES', {'cadastro_consumo': 'CAD.csv'})
+
+    full = load_all_files(parallel=False, use_cache=False)['cadastro_consumo']
+    first = next(extract.iter_csv_chunks('cadastro_consumo', 1))
+
+    # Mesmo dtype da leitura completa, mesmo num pedaço sem vazios
+    assert full['MICRO_GERADOR'].dtype == 'float64'
+    assert first['MICRO_GERADOR'].dtype == 'float64'
+    # Sai no CSV como na leitura original: '0,0'
+    out = save_to_csv(full[['UC', 'MICRO_GERADOR']], str(input_dir.parent))
+    assert out.read_text(encoding='utf-8-sig').splitlines()[1:] == [
+        '1;0,0',
+        '2;',
+    ]
@@ -0,0 +1,60 @@
+"""Testes para o cache de extração."""
+import os
+
+import pandas as pd
+import pytest
+
+from etl.extract.cache import clear_cache, fingerprint, load_cached, store
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'SECCIONAL.csv'
+    path.write_text('MUNICIPIO;SECCCIONAL\nPELOTAS;SUL\n', encoding='latin-1')
+    return path
+
+
+def test_cache_hit_after_store(source, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    df = pd.DataFrame({'MUNICIPIO': ['PELOTAS'], 'SECCCIONAL': ['SUL']})
+
+    cached, fp = load_cached('seccional', source, cache_dir)
+    assert cached is None
+
+    store('seccional', fp, df, cache_dir)
+    cached, fp_again = load_cached('seccional', source, cache_dir)
+
+    assert fp_again == fp
+    pd.testing.assert_frame_equal(cached, df)
+
+
+def test_cache_evicts_stale_entry(source, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    _, fp = load_cached('seccional', source, cache_dir)
+    store('seccional', fp, pd.DataFrame({'A': [1]}), cache_dir)
+
+    source.write_text('MUNICIPIO;SECCCIONAL\nBAGE;CAMPANHA\n')
+    cached, fp_new = load_cached('seccional', source, cache_dir)
+
+    assert cached is None
+    assert fp_new.content_hash != fp.content_hash
+    assert not any(cache_dir.iterdir())
+
+
+def test_fingerprint_reuses_hash_when_stat_matches(source):
+    fp = fingerprint(source)
+    forged = fp.__class__(fp.path, fp.size, fp.mtime_ns, 'hash-anterior')
+    assert fingerprint(source, previous=forged).content_hash == 'hash-anterior'
+
+    os.utime(source, ns=(fp.mtime_ns + 10**9, fp.mtime_ns + 10**9))
+    assert fingerprint(source, previous=forged).content_hash == fp.content_hash
+
+
+def test_clear_cache(source, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    _, fp = load_cached('seccional', source, cache_dir)
+    store('seccional', fp, pd.DataFrame({'A': [1]}), cache_dir)
+
+    clear_cache(cache_dir)
+
+    assert not cache_dir.exists()
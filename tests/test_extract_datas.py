@@ -0,0 +1,34 @@
+import datetime
+
+import pandas as pd
+
+from etl.extract.datas import DIA_PRIMEIRO, ISO, parse_dates
+
+
+def test_parse_dates_uses_format_chain():
+    values = pd.Series(
+        ['2024-03-05', '05/03/2024', '2024-03-05 10:30:00', None, 'x', '']
+    )
+    out = parse_dates(values, ISO)
+
+    assert out.iloc[0] == pd.Timestamp('2024-03-05')
+    # dd/mm/aaaa é o segundo formato da cadeia: 05/03 é 5 de março
+    assert out.iloc[1] == pd.Timestamp('2024-03-05')
+    assert out.iloc[2] == pd.Timestamp('2024-03-05 10:30:00')
+    assert out.iloc[3:].isna().all()
+
+
+def test_parse_dates_maps_unique_values_back_to_rows():
+    values = pd.Series(['01/02/2024', '03/04/2024'] * 3, index=range(10, 16))
+    out = parse_dates(values, DIA_PRIMEIRO)
+
+    assert list(out.index) == list(values.index)
+    assert list(out.dt.month) == [2, 4] * 3
+
+
+def test_parse_dates_accepts_date_objects_and_skips_datetime():
+    dates = pd.Series([datetime.date(2024, 1, 2), None], dtype=object)
+    assert parse_dates(dates, ISO).iloc[0] == pd.Timestamp('2024-01-02')
+
+    typed = pd.to_datetime(pd.Series(['2024-01-02']))
+    assert parse_dates(typed, ISO) is typed
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from etl.load.load import format_ptbr, save_to_csv
+
+
+def test_format_ptbr_datas_e_decimais():
+    df = pd.DataFrame(
+        {
+            'FISCALIZACAO': pd.to_datetime(['2024-03-05', None, '2024-03-05']),
+            'CONSUMO_MEDIO': [7.5, np.nan, 1234.567],
+            'MEDIA_YOY': [0.1, -0.25, np.nan],
+        }
+    )
+
+    out = format_ptbr(df)
+
+    assert out['FISCALIZACAO'].tolist() == ['05/03/2024', '', '05/03/2024']
+    assert out['CONSUMO_MEDIO'].tolist() == ['7,50', '', '1234,57']
+    # Demais floats continuam numéricos (a vírgula vem do to_csv)
+    assert out['MEDIA_YOY'].dtype == float
+    # O DataFrame original não é alterado
+    assert df['CONSUMO_MEDIO'].dtype == float
+
+
+def test_save_to_csv_excel_ptbr(tmp_path):
+    df = pd.DataFrame(
+        {
+            'UC': [1],
+            'BATE_CAIXA': pd.to_datetime(['2025-01-31']),
+            'MEDIA_YOY': [0.5],
+        }
+    )
+
+    file_name = save_to_csv(df, str(tmp_path))
+
+    text = file_name.read_text(encoding='utf-8-sig')
+    assert text.splitlines() == ['UC;BATE_CAIXA;MEDIA_YOY', '1;31/01/2025;0,5']
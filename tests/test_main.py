@@ -0,0 +1,119 @@
+"""Testes para o modo em pedaços do pipeline (etl.main)."""
+
+import pandas as pd
+
+from etl import main
+
+
+def _cadastro() -> pd.DataFrame:
+    """12 UCs: um prédio com 6 DS em condomínio (P3-5) e UCs com reclamação."""
+    n = 12
+    return pd.DataFrame(
+        {
+            'UC': list(range(1, n + 1)),
+            'STATUS_COMERCIAL': ['DS'] * 8 + ['LG'] * 4,
+            'MOVE_IN': ['2020-01-01'] * n,
+            'MOVE_OUT': ['2024-01-01'] * 8 + [None] * 4,
+            'MEDIDOR': [str(1000 + i) for i in range(n)],
+            'FASE': ['MO'] * n,
+            'MICRO_GERADOR': ['0'] * n,
+            'ENDERECO': [f'RUA A, {i}' for i in range(n)],
+            'LOGRADOURO': ['RUA A'] * 6 + ['RUA B'] * 6,
+            'NUMERO': ['10'] * 6 + ['20'] * 6,
+            'CONDOMINIO': ['SIM'] * 6 + ['NAO'] * 6,
+            'BAIRRO': ['CENTRO', 'AREAL'] * 6,
+            'MUNICIPIO': ['PELOTAS', 'BAGÉ', 'ÁGUA SANTA'] * 4,
+            '11/2025': [30] * n,
+            '12/2025': [30] * n,
+            '01/2026': [30] * n,
+            '02/2026': [30] * n,
+        }
+    )
+
+
+def _data() -> dict:
+    return {
+        'alvos': pd.DataFrame({'UC': [12]}),
+        'medidores': pd.DataFrame(
+            {
+                'medidor': [1000, 1001],
+                'ANO': [2010, 2011],
+                'FABRICANTE': ['ELO'] * 2,
+            }
+        ),
+        'inspecoes': pd.DataFrame(
+            {
+                'UC / MD': [9],
+                'DATA_EXECUCAO': [pd.Timestamp('2025-12-01')],
+                'COD': ['101'],
+            }
+        ),
+        'ocorrencias': pd.DataFrame(
+            {
+                'CR_NUMERO': [7, 8],
+                'DT_OCO_INCLUSAO': ['25/01/2026', '05/02/2026'],
+            }
+        ),
+        'prospeccao': None,
+        'sinergia': pd.DataFrame(
+            {'number': [10], 'timestamp': [pd.Timestamp('2026-01-10')]}
+        ),
+        'seccional': pd.DataFrame(
+            {
+                'MUNICIPIO': ['PELOTAS', 'BAGÉ'],
+                'SECCCIONAL': ['SUL', 'CAMPANHA'],
+            }
+        ),
+        'localizacao': pd.DataFrame(
+            {
+                'uc': [1, 2],
+                'classe_consumo': ['RESIDENCIAL'] * 2,
+                'latitude': [-31.7, -31.3],
+                'longitude': [-52.3, -54.1],
+            }
+        ),
+        'apontamento': pd.DataFrame({'INSTALACAO': [11], 'COD_MENS_LEF': [5]}),
+        'codigos_leitura': pd.DataFrame(
+            {'Apontamento': [5], 'Descricao': ['MEDIDOR NAO LOCALIZADO']}
+        ),
+        'faro_sqlite': 'inexistente.sqlite',
+    }
+
+
+def test_chunked_matches_in_memory():
+    """O modo em pedaços gera a mesma saída que o processamento completo."""
+    data = _data()
+    lookups = main._prepare_lookups(data)
+
+    expected = main._sort_output(
+        main._select_output(main._transform(_cadastro(), data, lookups))
+    )
+
+    cadastro = _cadastro()
+    chunks = (cadastro.iloc[i : i + 5].copy() for i in range(0, 12, 5))
+    result = main._sort_output(main._run_chunked(data, lookups, chunks))
+
+    assert (
+        expected['MOTIVO_PRIORIDADE'] == 'P3-CONDOMÍNIO COM ALTO ÍNDICE DE DS'
+    ).any()
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_pruning_before_joins_keeps_output():
+    """A poda antes das junções não muda o relatório de UCs priorizadas."""
+    data = _data()
+    lookups = main._prepare_lookups(data)
+    cadastro = _cadastro()
+    # UC LG fora do mínimo e sem queda: não tem como ser priorizada
+    cadastro.loc[10, ['11/2025', '12/2025', '01/2026']] = 500
+
+    expected = main._sort_output(
+        main._select_output(main._transform(cadastro, data, lookups))
+    )
+    result = main._sort_output(
+        main._select_output(
+            main._transform(cadastro, data, lookups, prune=True)
+        )
+    )
+
+    pd.testing.assert_frame_equal(result, expected)
@@ -4,9 +4,13 @@ import pandas as pd
 import pytest
 
 from etl.transform.apontamento import (
+    apontamento_codes_lookup,
+    code_descriptions,
     enrich_with_apontamento,
+    resolve_codes,
     treat_apontamento_codes,
 )
+from etl.transform.chaves import enrich_with_lookups
 
 
 def test_treat_apontamento_codes_ok():
@@ -71,3 +75,66 @@ def test_enrich_with_apontamento_ok():
     assert pd.isna(result.loc[result['UC'] == 30, 'LEITURISTA']).iloc[0]
     # UC 40 não tem apontamento -> NaN
     assert pd.isna(result.loc[result['UC'] == 40, 'LEITURISTA']).iloc[0]
+
+
+def test_resolve_codes_por_posicao():
+    """Códigos fora do dicionário, negativos ou nulos viram nulo."""
+    table = code_descriptions(
+        pd.DataFrame(
+            {
+                'Apontamento': [3, 1, 3, None],
+                'Descricao': ['Desc3', 'Desc1', 'Repetido', 'Sem código'],
+            }
+        )
+    )
+
+    result = resolve_codes(pd.Series([1, 3, 2, 99, -1, None, 'a']), table)
+
+    assert result.iloc[:2].tolist() == ['Desc1', 'Desc3']
+    assert result.iloc[2:].isna().all()
+
+
+def test_resolve_codes_codigo_esparso():
+    """Código muito grande não aloca o array posicional."""
+    table = code_descriptions(
+        pd.DataFrame(
+            {
+                'Apontamento': [3, 999999999, 1, 3],
+                'Descricao': ['Desc3', 'Grande', 'Desc1', 'Repetido'],
+            }
+        )
+    )
+
+    assert len(table) == 3
+    result = resolve_codes(
+        pd.Series([1, 999999999, 3, 2, -1, None, 'a']), table
+    )
+    assert result.iloc[:3].tolist() == ['Desc1', 'Grande', 'Desc3']
+    assert result.iloc[3:].isna().all()
+
+
+def test_apontamento_codes_lookup_reduz_antes_de_resolver():
+    """Mesmo LEITURISTA do caminho com o histórico inteiro tratado."""
+    base_df = pd.DataFrame({'UC': [10, 20, 30]})
+    apontamento_df = pd.DataFrame(
+        {
+            'INSTALACAO': ['10', '20.0', '20', '50'],
+            'COD_MENS_LEF': [1, 2, 1, 9],
+        }
+    )
+    codigos_df = pd.DataFrame(
+        {'Apontamento': [1, 2], 'Descricao': ['Leit1', 'Leit2']}
+    )
+
+    lookup = apontamento_codes_lookup(apontamento_df, codigos_df)
+    result = enrich_with_lookups(base_df, [lookup])
+    expected = enrich_with_apontamento(
+        base_df, treat_apontamento_codes(apontamento_df, codigos_df)
+    )
+
+    assert len(lookup.table) == 3
+    assert result['LEITURISTA'].tolist()[:2] == ['Leit1', 'Leit2']
+    assert pd.isna(result['LEITURISTA'].iloc[2])
+    assert result['LEITURISTA'].tolist()[:2] == (
+        expected['LEITURISTA'].tolist()[:2]
+    )
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from etl.transform.categorias import (
+    categorize_lookup,
+    compact_categories,
+    normalized,
+    to_categorical,
+)
+from etl.transform.chaves import Lookup, enrich_with_lookups
+
+
+def test_normalized_compara_nas_categorias():
+    status = pd.Series([' lg ', 'LG', 'ds', None], dtype='category')
+
+    out = normalized(status)
+
+    assert list(out.cat.categories) == ['LG', 'DS']
+    assert (out == 'LG').tolist() == [True, True, False, False]
+    assert out.isna().tolist() == [False, False, False, True]
+
+
+def test_to_categorical_mantem_os_valores():
+    df = pd.DataFrame({'MUNICIPIO': ['PELOTAS', 'BAGÉ', 'PELOTAS'], 'X': 1})
+
+    out = to_categorical(df)
+
+    assert isinstance(out['MUNICIPIO'].dtype, pd.CategoricalDtype)
+    assert out['MUNICIPIO'].tolist() == df['MUNICIPIO'].tolist()
+    assert out['X'].dtype == df['X'].dtype
+
+
+def test_lookup_categorico_por_codigos_com_fill():
+    base = to_categorical(
+        pd.DataFrame({'UC': [1, 2, 3], 'MUNICIPIO': ['PELOTAS', 'RIO', None]})
+    )
+    seccional = categorize_lookup(
+        Lookup(
+            key='MUNICIPIO',
+            table=pd.DataFrame(
+                {'MUNICIPIO': ['PELOTAS'], 'SECCCIONAL': ['SUL']}
+            ),
+            columns={'SECCCIONAL': 'SECCIONAL'},
+            fill={'SECCIONAL': ''},
+        )
+    )
+
+    out = enrich_with_lookups(base, [seccional])
+
+    assert out['SECCIONAL'].tolist() == ['SUL', '', '']
+    assert isinstance(out['SECCIONAL'].dtype, pd.CategoricalDtype)
+
+
+def test_compact_categories_remove_sem_uso():
+    df = to_categorical(pd.DataFrame({'FASE': ['MO', 'TR', 'BI']}))
+
+    out = compact_categories(df.iloc[[0, 1]])
+
+    assert list(out['FASE'].cat.categories) == ['MO', 'TR']
@@ -0,0 +1,137 @@
+"""Testes para o módulo de chaves canônicas de junção."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.transform.chaves import (
+    MEDIDOR_KEY,
+    Lookup,
+    add_join_keys,
+    attach_columns,
+    enrich_with_lookups,
+    latest_per_key,
+    lookup_positions,
+    project_lookup,
+    uc_key,
+)
+
+
+def test_uc_key_normaliza_formatos():
+    """'123', ' 123 ', '123.0' e 123.0 viram a mesma UC; lixo vira <NA>."""
+    values = pd.Series(['123', ' 123 ', '123.0', 123.0, 'abc', 12.5, None])
+    result = uc_key(values)
+
+    assert str(result.dtype) == 'Int64'
+    assert result.iloc[:4].tolist() == [123] * 4
+    assert result.iloc[4:].isna().all()
+
+
+def test_add_join_keys_calcula_uma_vez():
+    base = pd.DataFrame({'UC': ['1', '2'], 'MEDIDOR': [' ab1', 'Cd2 ']})
+    result = add_join_keys(base)
+
+    assert result['UC'].tolist() == [1, 2]
+    assert result[MEDIDOR_KEY].tolist() == ['AB1', 'CD2']
+    # A base original não é alterada
+    assert base['UC'].tolist() == ['1', '2']
+
+
+def test_lookup_positions_e_attach_como_procv():
+    base = add_join_keys(pd.DataFrame({'UC': [3, 1, 2, 3]}))
+    lookup = pd.DataFrame({'UC': uc_key(pd.Series([1, 3])), 'V': [10, 30]})
+
+    positions = lookup_positions(base['UC'], lookup['UC'])
+    result = attach_columns(base, positions, lookup, {'V': 'VALOR'})
+
+    assert positions.tolist() == [1, 0, -1, 1]
+    assert result['VALOR'].tolist()[:2] == [30, 10]
+    assert pd.isna(result['VALOR'].iloc[2])
+
+
+def test_attach_columns_mantem_destino_existente_sem_match():
+    """Coluna que já existe na base só é trocada nas linhas com match."""
+    base = pd.DataFrame(
+        {
+            'UC': uc_key(pd.Series([1, 2, 3])),
+            'CLASSE': pd.Categorical(['RES', 'COM', None]),
+        }
+    )
+    lookup = pd.DataFrame(
+        {'UC': uc_key(pd.Series([2])), 'classe': pd.Categorical(['IND'])}
+    )
+
+    positions = lookup_positions(base['UC'], lookup['UC'])
+    result = attach_columns(base, positions, lookup, {'classe': 'CLASSE'})
+
+    assert result['CLASSE'].tolist()[:2] == ['RES', 'IND']
+    assert pd.isna(result['CLASSE'].iloc[2])
+
+
+def test_lookup_positions_exige_chave_unica():
+    with pytest.raises(ValueError):
+        lookup_positions(pd.Series([1]), pd.Series([1, 1]))
+
+
+def test_enrich_with_lookups_nao_copia_nem_altera_a_base():
+    """Colunas não tocadas continuam compartilhando memória com a entrada."""
+    base = pd.DataFrame({'UC': uc_key(pd.Series([1, 2])), 'X': [1.0, 2.0]})
+    lookup = Lookup(
+        key='UC',
+        table=pd.DataFrame({'UC': uc_key(pd.Series([2])), 'V': [20]}),
+        columns={'V': 'VALOR'},
+    )
+    result = enrich_with_lookups(base, [lookup])
+
+    assert 'VALOR' not in base.columns
+    assert np.shares_memory(result['X'].to_numpy(), base['X'].to_numpy())
+
+
+def test_project_lookup_mantem_so_colunas_usadas():
+    lookup = Lookup(
+        key='UC',
+        table=pd.DataFrame({'UC': [1], 'A': [1], 'B': [2], 'LIXO': ['x']}),
+        columns={'A': 'COL_A', 'B': 'COL_B'},
+        fill={'COL_B': 0},
+    )
+
+    projected = project_lookup(lookup, {'COL_A'})
+
+    assert projected.columns == {'A': 'COL_A'}
+    assert list(projected.table.columns) == ['UC', 'A']
+    assert projected.fill == {}
+    assert project_lookup(lookup, {'OUTRA'}) is None
+
+
+def test_latest_per_key_data_mais_recente_e_desempate():
+    df = pd.DataFrame(
+        {
+            'UC': [1, 2, 1, 1, 2, 3, None],
+            'DATA': pd.to_datetime(
+                [
+                    '2024-01-05',
+                    '2024-02-01',
+                    '2024-03-01',
+                    '2024-03-01',
+                    None,
+                    None,
+                    '2025-01-01',
+                ]
+            ),
+            'ID': ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+        }
+    )
+
+    last = latest_per_key(df, 'UC', 'DATA')
+    first = latest_per_key(df, 'UC', 'DATA', keep='first')
+
+    # Empate da UC 1 em 2024-03-01; NaT só vence sem outra data (UC 3)
+    assert last['ID'].tolist() == ['b', 'd', 'f']
+    assert first['ID'].tolist() == ['b', 'c', 'f']
+
+
+def test_latest_per_key_sem_data_usa_a_ordem_do_arquivo():
+    df = pd.DataFrame({'UC': [10, 20, 20, 10], 'ID': ['a', 'b', 'c', 'd']})
+
+    assert latest_per_key(df, 'UC', keep='first')['ID'].tolist() == ['a', 'b']
+    assert latest_per_key(df, 'UC')['ID'].tolist() == ['c', 'd']
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from etl.transform import colacao
+from etl.transform.colacao import collation_codes, collation_keys
+
+
+def test_collation_keys_sem_acento_e_caixa_alta():
+    values = pd.Series([' São Paulo', 'sao paulo ', None, 'Áreal'])
+
+    keys = collation_keys(values)
+
+    assert keys.tolist() == ['SAO PAULO', 'SAO PAULO', '', 'AREAL']
+    assert (keys == 'SAO PAULO').tolist() == [True, True, False, False]
+
+
+def test_collation_codes_seguem_a_ordem_alfabetica():
+    values = pd.Series(['Pelotas', 'Áreal', 'bagé', 'Areal', 'Pelotas'])
+
+    codes = collation_codes(values)
+
+    assert codes.tolist() == [2, 0, 1, 0, 2]
+
+
+def test_memo_persistido_entre_execucoes(tmp_path, monkeypatch):
+    monkeypatch.setattr(colacao, '_MEMO', {})
+    colacao.collation_key('Canguçu')
+    colacao.store_memo(tmp_path / 'colacao.pkl')
+
+    monkeypatch.setattr(colacao, '_MEMO', {})
+    assert colacao.load_memo(tmp_path / 'colacao.pkl') == 1
+    assert colacao._MEMO == {'Canguçu': 'CANGUCU'}
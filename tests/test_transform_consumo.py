@@ -1,8 +1,12 @@
 """Testes para o módulo de consumo mensal."""
+import numpy as np
 import pandas as pd
 import pandas.api.types as ptypes
 
-from etl.transform.consumo import treat_monthly_consumption
+from etl.transform.consumo import (
+    ConsumptionMatrix,
+    treat_monthly_consumption,
+)
 
 
 def test_treat_monthly_consumption_basic():
@@ -75,3 +79,36 @@ def test_treat_monthly_consumption_handles_decimals_and_invalids():
 
     # '2.9' -> 2 (astype(int) trunca), 'abc' -> NaN -> 0, None -> 0, 5.7 -> 5
     assert list(out['01/2024']) == [2, 0, 0, 5]
+
+
+def test_consumption_matrix_ordena_meses_e_e_contigua():
+    df = pd.DataFrame(
+        {
+            '02/2025': ['5', None],
+            "'01/2025'": [1.9, 'x'],
+            '12/2024': [7, 8],
+            'OUTRA': ['a', 'b'],
+        },
+        index=[10, 20],
+    )
+
+    matrix = ConsumptionMatrix.from_frame(df)
+
+    assert matrix.months == ('12/2024', '01/2025', '02/2025')
+    assert matrix.columns == ('12/2024', "'01/2025'", '02/2025')
+    assert matrix.values.dtype == np.int32
+    assert matrix.values.flags.c_contiguous
+    assert matrix.values.tolist() == [[7, 1, 5], [8, 0, 0]]
+    assert matrix.index.tolist() == [10, 20]
+    assert ConsumptionMatrix.for_frame(df, matrix) is matrix
+
+
+def test_treat_monthly_consumption_consumo_medio_ignora_zeros():
+    df = pd.DataFrame(
+        {'01/2024': [10, 0], '02/2024': [0, 0], '03/2024': [5, 0]}
+    )
+
+    out = treat_monthly_consumption(df)
+
+    assert out['CONSUMO_MEDIO'].iloc[0] == 7.5
+    assert pd.isna(out['CONSUMO_MEDIO'].iloc[1])
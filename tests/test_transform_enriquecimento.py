@@ -1,7 +1,10 @@
 """Testes para o módulo de enriquecimento de dados."""
 import pandas as pd
 
-from etl.transform.enriquecimento import enrich_with_new_bases
+from etl.transform.enriquecimento import (
+    enrich_with_new_bases,
+    localizacao_lookup,
+)
 
 
 def test_enrich_new_bases():
@@ -28,3 +31,79 @@ def test_enrich_new_bases():
     assert result.iloc[0]['SECCIONAL'] == 'SUL'
     assert result.iloc[0]['CLASSE_CONSUMO'] == 'RESIDENCIAL'
     print('Teste de Enriquecimento: OK!')
+
+
+def test_enrich_new_bases_nao_duplica_linhas():
+    """Município/UC repetidos nas bases de consulta não duplicam a base."""
+    df_mock = pd.DataFrame({'UC': [1, 2], 'MUNICIPIO': ['PELOTAS', 'BAGÉ']})
+    data_mock = {
+        'sinergia': pd.DataFrame({'number': [], 'timestamp': []}),
+        'seccional': pd.DataFrame(
+            {'MUNICIPIO': ['PELOTAS', 'PELOTAS'], 'SECCCIONAL': ['SUL', 'X']}
+        ),
+        'localizacao': pd.DataFrame(
+            {
+                'uc': ['1', 1.0],
+                'classe_consumo': ['RESIDENCIAL', 'COMERCIAL'],
+                'latitude': ['-31,7', '-31,8'],
+                'longitude': ['-52,3', '-52,4'],
+            }
+        ),
+    }
+
+    result = enrich_with_new_bases(df_mock, data_mock)
+
+    assert len(result) == 2
+    assert result['SECCIONAL'].iloc[0] == 'SUL'
+    assert result['CLASSE_CONSUMO'].iloc[0] == 'RESIDENCIAL'
+    assert result['LATITUDE'].iloc[0] == -31.7
+    assert pd.isna(result['SECCIONAL'].iloc[1])
+
+
+def test_enrich_new_bases_mantem_classe_do_cadastro_sem_match():
+    """UC fora da localização fica com a CLASSE_CONSUMO do cadastro."""
+    df_mock = pd.DataFrame(
+        {
+            'UC': [1, 2],
+            'MUNICIPIO': ['PELOTAS', 'PELOTAS'],
+            'CLASSE_CONSUMO': ['COMERCIAL', 'RURAL'],
+        }
+    )
+    data_mock = {
+        'sinergia': pd.DataFrame({'number': [], 'timestamp': []}),
+        'seccional': pd.DataFrame(
+            {'MUNICIPIO': ['PELOTAS'], 'SECCCIONAL': ['SUL']}
+        ),
+        'localizacao': pd.DataFrame(
+            {
+                'uc': [1],
+                'classe_consumo': ['RESIDENCIAL'],
+                'latitude': [-31.7],
+                'longitude': [-52.3],
+            }
+        ),
+    }
+
+    result = enrich_with_new_bases(df_mock, data_mock)
+
+    assert result['CLASSE_CONSUMO'].tolist() == ['RESIDENCIAL', 'RURAL']
+    assert df_mock['CLASSE_CONSUMO'].tolist() == ['COMERCIAL', 'RURAL']
+
+
+def test_localizacao_corrige_virgula_e_descarta_fora_da_regiao():
+    """Vírgula perdida volta numa passada; pontos fora da região viram vazio."""
+    loc = localizacao_lookup(
+        pd.DataFrame(
+            {
+                'uc': [1, 2, 3, 4, 5],
+                'classe_consumo': 'RESIDENCIAL',
+                'latitude': [-31712345, -3170, -317.0, -1800, -31.7],
+                'longitude': [-52.3, -52.3, -5230, -52.3, 12.0],
+            }
+        )
+    ).table
+
+    assert loc['latitude'].tolist()[:3] == [-31.712345, -31.7, -31.7]
+    assert loc['longitude'].tolist()[:3] == [-52.3, -52.3, -52.3]
+    # -1800 vira -180 (fora da região) e longitude 12 está fora da região
+    assert loc[['latitude', 'longitude']].iloc[3:].isna().all().all()
@@ -5,7 +5,7 @@ import sqlite3
 import pandas as pd
 import pytest
 
-from etl.transform.faro_certo import enrich_with_faro_certo
+from etl.transform.faro_certo import enrich_with_faro_certo, read_faro_certo
 
 
 @pytest.fixture
@@ -39,12 +39,161 @@ def test_enrich_with_faro_certo(mock_sqlite):
 
     result = enrich_with_faro_certo(df_cad, mock_sqlite)
 
-    # Verificações ajustadas para validar a STRING dd/mm/yyyy
+    # FARO_CERTO é datetime (a formatação dd/mm/yyyy fica para a exportação)
     # UC 1 (Medidor 12345) -> 05/01/2026
-    assert result.loc[result['UC'] == 1, 'FARO_CERTO'].iloc[0] == '05/01/2026'
+    assert result.loc[result['UC'] == 1, 'FARO_CERTO'].iloc[0] == pd.Timestamp(
+        '2026-01-05'
+    )
 
     # UC 2 (Medidor 67890) -> 03/01/2026
-    assert result.loc[result['UC'] == 2, 'FARO_CERTO'].iloc[0] == '03/01/2026'
+    assert result.loc[result['UC'] == 2, 'FARO_CERTO'].iloc[0] == pd.Timestamp(
+        '2026-01-03'
+    )
 
     # UC 3 (Medidor 11111) -> Deve ser NaT ou NaN (como o script define no erro/vazio)
     assert pd.isna(result.loc[result['UC'] == 3, 'FARO_CERTO'].iloc[0])
+
+
+def test_read_faro_certo_normaliza_no_sqlite(tmp_path):
+    """Medidor e comando são normalizados como no pandas (strip/upper)."""
+    db_path = tmp_path / 'bot.sqlite'
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        'CREATE TABLE interactions (id INTEGER, input TEXT, timestamp TEXT, command TEXT)'
+    )
+    conn.executemany(
+        'INSERT INTO interactions VALUES (?, ?, ?, ?)',
+        [
+            (1, ' ab1 ', '2026-01-01 10:00:00', 'Dados '),
+            (2, 'AB1', '2026-02-01 09:00:00', 'dados'),
+            (3, 'ab1', 'invalido', 'dados'),
+            (4, 'cd2', '2026-03-01 09:00:00', 'farejar'),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    result = read_faro_certo(str(db_path))
+
+    assert result.to_dict('records') == [
+        {'MEDIDOR_JOIN': 'AB1', 'FARO_CERTO': pd.Timestamp('2026-02-01')}
+    ]
+
+
+def test_read_faro_certo_copia_indexada(mock_sqlite, tmp_path, monkeypatch):
+    """A cópia indexada dá o mesmo resultado e não altera o original."""
+    monkeypatch.chdir(tmp_path)
+    expected = read_faro_certo(mock_sqlite)
+
+    result = read_faro_certo(mock_sqlite, use_index=True)
+
+    pd.testing.assert_frame_equal(result, expected)
+    copy = tmp_path / 'cache' / 'faro_certo' / 'test_bot.sqlite'
+    with sqlite3.connect(copy) as conn:
+        indexes = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        ).fetchall()
+    assert indexes == [('ix_faro_certo_dados',)]
+    with sqlite3.connect(mock_sqlite) as conn:
+        assert not conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        ).fetchall()
+
+
+def test_read_faro_certo_incremental(mock_sqlite, tmp_path):
+    """Com estado, o resultado acompanha o banco e bate com a leitura completa."""
+    state_dir = tmp_path / 'estado'
+    first = read_faro_certo(mock_sqlite, incremental=True, state_dir=state_dir)
+    assert sorted(first['FARO_CERTO']) == [
+        pd.Timestamp('2026-01-03'),
+        pd.Timestamp('2026-01-05'),
+    ]
+
+    with sqlite3.connect(mock_sqlite) as conn:
+        conn.executemany(
+            'INSERT INTO bot_interactions VALUES (?, ?, ?)',
+            [
+                ('12345', '2026-01-04 10:00:00', 'dados'),  # mais antiga
+                ('67890', '2026-02-10 08:00:00', 'dados'),
+                ('55555', '2026-02-11 08:00:00', 'dados'),
+            ],
+        )
+
+    result = read_faro_certo(
+        mock_sqlite, incremental=True, state_dir=state_dir
+    )
+    expected = read_faro_certo(mock_sqlite)
+
+    def _by_meter(df):
+        return df.sort_values('MEDIDOR_JOIN').reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(
+        _by_meter(result), _by_meter(expected), check_dtype=False
+    )
+    state = pd.read_pickle(state_dir / 'test_bot.state.pkl')
+    assert state['rowid'] == 7
+
+
+def test_read_faro_certo_incremental_le_rowid_zero(tmp_path):
+    """Interações com rowid 0 (ou negativo) entram já na primeira leitura."""
+    db_path = tmp_path / 'bot.sqlite'
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            'CREATE TABLE bot_interactions '
+            '(id INTEGER PRIMARY KEY, input TEXT, timestamp TEXT, command TEXT)'
+        )
+        conn.executemany(
+            'INSERT INTO bot_interactions VALUES (?, ?, ?, ?)',
+            [
+                (-1, 'AB1', '2026-01-01 10:00:00', 'dados'),
+                (0, 'CD2', '2026-01-02 10:00:00', 'dados'),
+                (1, 'AB1', '2026-01-03 10:00:00', 'dados'),
+            ],
+        )
+
+    result = read_faro_certo(
+        str(db_path), incremental=True, state_dir=tmp_path / 'estado'
+    )
+
+    assert result.sort_values('MEDIDOR_JOIN').to_dict('records') == [
+        {'MEDIDOR_JOIN': 'AB1', 'FARO_CERTO': pd.Timestamp('2026-01-03')},
+        {'MEDIDOR_JOIN': 'CD2', 'FARO_CERTO': pd.Timestamp('2026-01-02')},
+    ]
+
+
+def test_read_faro_certo_incremental_banco_trocado(mock_sqlite, tmp_path):
+    """Banco trocado por outro com as mesmas linhas não reaproveita o estado."""
+    state_dir = tmp_path / 'estado'
+    read_faro_certo(mock_sqlite, incremental=True, state_dir=state_dir)
+
+    # Mesmo número de linhas, conteúdo diferente (UPDATE no lugar)
+    with sqlite3.connect(mock_sqlite) as conn:
+        conn.execute(
+            "UPDATE bot_interactions SET input = '77777' "
+            "WHERE input = '67890'"
+        )
+
+    result = read_faro_certo(
+        mock_sqlite, incremental=True, state_dir=state_dir
+    )
+
+    assert sorted(result['MEDIDOR_JOIN']) == ['12345', '77777']
+
+
+def test_read_faro_certo_incremental_linhas_apagadas(mock_sqlite, tmp_path):
+    """Linhas apagadas abaixo da marca d'água refazem a tabela do zero."""
+    state_dir = tmp_path / 'estado'
+    read_faro_certo(mock_sqlite, incremental=True, state_dir=state_dir)
+
+    with sqlite3.connect(mock_sqlite) as conn:
+        conn.execute("DELETE FROM bot_interactions WHERE input = '12345'")
+        conn.execute(
+            'INSERT INTO bot_interactions VALUES (?, ?, ?)',
+            ('55555', '2026-02-11 08:00:00', 'dados'),
+        )
+
+    result = read_faro_certo(
+        mock_sqlite, incremental=True, state_dir=state_dir
+    )
+
+    assert sorted(result['MEDIDOR_JOIN']) == ['55555', '67890']
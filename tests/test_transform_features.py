@@ -0,0 +1,54 @@
+import pandas as pd
+
+from etl.transform.chaves import Lookup
+from etl.transform.features import FeatureSource, FeatureStore
+
+
+def _source(calls: list) -> FeatureSource:
+    def build(data):
+        calls.append(1)
+        table = data['sinergia'].rename(columns={'number': 'UC'})
+        return Lookup(key='UC', table=table, columns={'ts': 'BATE_CAIXA'})
+
+    return FeatureSource('sinergia', ('sinergia',), build)
+
+
+def test_fonte_inalterada_vem_da_base_de_features(tmp_path):
+    csv = tmp_path / 'SINERGIA.csv'
+    csv.write_text('number,ts\n1,2026-01-10\n')
+    paths = {'sinergia': csv}
+    data = {'sinergia': pd.DataFrame({'number': [1], 'ts': ['2026-01-10']})}
+    calls: list = []
+
+    first = FeatureStore([_source(calls)], paths, store_dir=tmp_path / 'f')
+    assert first.stale == ['sinergia']
+    assert first.skip() == set()
+    first.lookups(data, lambda lookup: lookup)
+
+    second = FeatureStore([_source(calls)], paths, store_dir=tmp_path / 'f')
+    assert second.stale == []
+    assert second.skip() == {'sinergia'}
+    (lookup,) = second.lookups({}, lambda lookup: lookup)
+
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(
+        lookup.table, data['sinergia'].rename(columns={'number': 'UC'})
+    )
+
+
+def test_fonte_alterada_e_refeita(tmp_path):
+    csv = tmp_path / 'SINERGIA.csv'
+    csv.write_text('number,ts\n1,2026-01-10\n')
+    paths = {'sinergia': csv}
+    data = {'sinergia': pd.DataFrame({'number': [1], 'ts': ['2026-01-10']})}
+    calls: list = []
+    FeatureStore([_source(calls)], paths, store_dir=tmp_path / 'f').lookups(
+        data, lambda lookup: lookup
+    )
+
+    csv.write_text('number,ts\n1,2026-01-10\n2,2026-02-01\n')
+    store = FeatureStore([_source(calls)], paths, store_dir=tmp_path / 'f')
+
+    assert store.stale == ['sinergia']
+    store.lookups(data, lambda lookup: lookup)
+    assert len(calls) == 2
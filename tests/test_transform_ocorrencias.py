@@ -10,20 +10,19 @@ def test_enrich_with_occurrences_ok():
     occurrences = pd.DataFrame(
         {
             'CR_NUMERO': [67187897, 1006523798],
-            'OCO_DATA_NR': ['30/01/2026', '30/01/2026'],
+            'DT_OCO_INCLUSAO': ['30/01/2026', '30/01/2026'],
         }
     )
 
     result = enrich_with_occurrences(base, occurrences)
 
     # UC 67187897 tem ocorrência
-    assert (
-        result.loc[result['UC'] == 67187897, 'NOTA_DE_RECLAMACAO'].iloc[0]
-        == '30/01/2026'
-    )
+    assert result.loc[result['UC'] == 67187897, 'NOTA DE RECLAMACAO'].iloc[
+        0
+    ] == pd.Timestamp('2026-01-30')
     # UC 62248723 não tem ocorrência
     assert pd.isna(
-        result.loc[result['UC'] == 62248723, 'NOTA_DE_RECLAMACAO'].iloc[0]
+        result.loc[result['UC'] == 62248723, 'NOTA DE RECLAMACAO'].iloc[0]
     )
     # Não perdeu linhas
     assert len(result) == len(base)
@@ -5,9 +5,11 @@ from datetime import datetime, timedelta
 import pandas as pd
 
 from etl.transform.regras_negocio import (
+    add_last_effort,
     apply_priority_rules,
     calculate_yoy,
     flag_minimum_by_phase,
+    rule_candidates,
 )
 
 
@@ -22,11 +24,30 @@ def test_calculate_yoy_ok():
         '03/2025': [999],  # Mês atual ignorado
     }
     df = pd.DataFrame(data)
-    result = calculate_yoy(df)
+    result = calculate_yoy(df, monthly_columns=True)
     assert result['yoy_01_2025'].iloc[0] == 0.5
     assert abs(result['MEDIA_YOY'].iloc[0] - 0.2) < 1e-6
 
 
+def test_calculate_yoy_sem_colunas_mensais_por_padrao():
+    """Sem pedido explícito só MEDIA_YOY é criada."""
+    df = pd.DataFrame(
+        {
+            '01/2024': [100, 0],
+            '02/2024': [200, 10],
+            '01/2025': [150, 5],
+            '02/2025': [180, 20],
+            '03/2025': [999, 999],
+        }
+    )
+    result = calculate_yoy(df)
+
+    assert not [c for c in result.columns if c.startswith('yoy_')]
+    assert abs(result['MEDIA_YOY'].iloc[0] - 0.2) < 1e-6
+    # Janeiro sem base no ano anterior não entra na média
+    assert result['MEDIA_YOY'].iloc[1] == 1.0
+
+
 def test_flag_minimum_by_phase_ok():
     """Testa se a marcação de mínimo por fase respeita os limites."""
     data = {
@@ -59,6 +80,7 @@ def _create_base_df_with_priority(
     cod=None,
     leiturista='',
     move_out=None,
+    move_in=datetime.now() - timedelta(days=365),
 ):
     """Helper para criar DataFrame base para testes de prioridade."""
     data = {
@@ -77,6 +99,7 @@ def _create_base_df_with_priority(
         'COD': [cod],
         'LEITURISTA': [leiturista],
         'MOVE_OUT': [move_out],
+        'MOVE_IN': [move_in],
     }
     return pd.DataFrame(data)
 
@@ -106,7 +129,7 @@ def test_priority_desligado_com_reclamacao():
         data_prospector=None,
         conclusao_prospector='',
     )
-    df['NOTA_DE_RECLAMACAO'] = [nota_reclamacao_date]
+    df['NOTA DE RECLAMACAO'] = [nota_reclamacao_date]
 
     result = apply_priority_rules(df)
     assert result['PRIORIDADE'].iloc[0] == 'P1'
@@ -176,6 +199,8 @@ def test_priority_condominio_alto_ds():
     df = pd.concat([df] * 5, ignore_index=True)  # cria 5 linhas
     df['CONDOMINIO'] = ['SIM'] * 5
     df['ENDERECO'] = ['Rua A'] * 5
+    df['LOGRADOURO'] = ['Rua A'] * 5
+    df['NUMERO'] = ['10'] * 5
     result = apply_priority_rules(df)
     # Pelo menos uma linha deve ter prioridade P3
     assert 'P3' in result['PRIORIDADE'].values
@@ -191,3 +216,64 @@ def test_priority_queda_acentuada():
     result = apply_priority_rules(df)
     assert result['PRIORIDADE'].iloc[0] == 'P3'
     assert 'QUEDA ACENTUADA' in result['MOTIVO_PRIORIDADE'].iloc[0]
+
+
+def test_priority_primeira_regra_atendida_prevalece():
+    """DS com reclamação e prospecção confirmada fica com o P1-1."""
+    move_out_date = datetime.now() - timedelta(days=10)
+    df = _create_base_df_with_priority(
+        status='DS',
+        move_out=move_out_date,
+        conclusao_prospector='IRREGULARIDADE CONFIRMADA',
+    )
+    df['NOTA DE RECLAMACAO'] = [move_out_date + timedelta(days=1)]
+
+    result = apply_priority_rules(df)
+    assert result['MOTIVO_PRIORIDADE'].iloc[0] == 'P1-DESLIGADO COM RECLAMAÇÃO'
+
+
+def test_add_last_effort_maximo_das_datas_de_esforco():
+    """ULTIMO_ESFORCO é a data mais recente entre os esforços da UC."""
+    df = pd.DataFrame(
+        {
+            'FISCALIZACAO': ['2024-01-10', None, None],
+            'BATE_CAIXA': ['2024-03-05', None, None],
+            'FARO_CERTO': ['01/02/2024', None, None],
+            'DATA_PROSPECTOR': ['20/04/2024', '20/04/2024', None],
+            # Prospecção só conta como esforço quando "SEM INDÍCIO"
+            'CONCLUSAO_PROSPECTOR': [
+                'INDICIO DE IRREGULARIDADE',
+                'SEM INDÍCIO DE IRREGULARIDADE',
+                '',
+            ],
+        }
+    )
+    result = add_last_effort(df)
+
+    assert result['ULTIMO_ESFORCO'].tolist()[:2] == [
+        pd.Timestamp('2024-03-05'),
+        pd.Timestamp('2024-04-20'),
+    ]
+    assert pd.isna(result['ULTIMO_ESFORCO'].iloc[2])
+
+
+def test_rule_candidates_descarta_quem_nao_atende_regra_alguma():
+    """Só DS, LG no mínimo/com queda e UCs prospectadas são avaliadas."""
+    df = pd.DataFrame(
+        {
+            'STATUS_COMERCIAL': ['DS', 'LG', 'LG', 'LG', 'LG', 'CR'],
+            'NO_MINIMO_4M': [pd.NA, 'SIM', pd.NA, pd.NA, pd.NA, 'SIM'],
+            'MEDIA_YOY': [0.0, 0.0, -0.5, 0.1, 0.1, -0.9],
+            'CONCLUSAO_PROSPECTOR': ['', '', '', 'INDICIO', ' ', ''],
+        }
+    )
+    status = df['STATUS_COMERCIAL']
+
+    assert rule_candidates(df, status).tolist() == [
+        True,
+        True,
+        True,
+        True,
+        False,
+        False,
+    ]